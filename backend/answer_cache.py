@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+
+from models.schemas import ChatResponse
+
+
+class SemanticAnswerCache:
+    """
+    Cache of chat answers scoped per folder and provider.
+
+    A question matches a stored answer when the cosine similarity of their
+    query embeddings is at least the configured threshold, so rephrasings
+    and repeats of the same question share one LLM round trip. Entries expire
+    after a TTL, are evicted least-recently-used beyond max_entries, and are
+    dropped whenever the folder's vectors change: directly through
+    invalidate_folders in the indexing process, and through the folder
+    version passed by callers when indexing happens in another process.
+    """
+    
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_folder: Dict[str, set] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            folder_entries = self._by_folder.get(entry["folder_id"])
+            if folder_entries is not None:
+                folder_entries.discard(entry_id)
+                if not folder_entries:
+                    del self._by_folder[entry["folder_id"]]
+    
+    def lookup(self, folder_id: str, provider: str, embedding: List[float], version: Optional[str] = None) -> Optional[ChatResponse]:
+        """Best stored answer for a near-duplicate question, or None"""
+        query = self._unit(embedding)
+        now = time.monotonic()
+        
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in list(self._by_folder.get(folder_id, ())):
+                entry = self._entries[entry_id]
+                if entry["expires_at"] < now or (version is not None and entry["version"] != version):
+                    self._remove(entry_id)
+                    continue
+                if entry["provider"] != provider:
+                    continue
+                score = float(np.dot(query, entry["embedding"]))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            
+            if best_id is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id]["response"].model_copy(deep=True)
+    
+    def store(self, folder_id: str, provider: str, embedding: List[float], response: ChatResponse, version: Optional[str] = None) -> None:
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "folder_id": folder_id,
+                "provider": provider,
+                "embedding": self._unit(embedding),
+                "response": response.model_copy(deep=True),
+                "version": version,
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            self._by_folder.setdefault(folder_id, set()).add(entry_id)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+    
+    def invalidate_folders(self, folder_ids: Optional[Iterable[str]]) -> None:
+        """Drop answers for the given folders; None means the folders are unknown, so drop everything"""
+        with self._lock:
+            self.invalidations += 1
+            if folder_ids is None:
+                self._entries.clear()
+                self._by_folder.clear()
+                return
+            for folder_id in folder_ids:
+                for entry_id in list(self._by_folder.get(str(folder_id), ())):
+                    self._remove(entry_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "folders": len(self._by_folder),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "similarity_threshold": self.similarity_threshold
+        }
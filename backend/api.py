@@ -0,0 +1,85 @@
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from config import config
+from dependencies import get_provider_registry, get_ollama_client, get_ingestion_queue, get_async_qdrant_client
+from executors import shutdown_executors
+from pdf_extraction import shutdown_extraction_pool
+from ingestion_worker import create_worker_pool
+from warmup import run_warmup, mark_ready_without_warmup
+
+# Import routers
+from routers import folders, files, chat, health, sessions, debug, jobs
+from routers.debug import router as debug_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up models and connections in the background; /api/ready reports 503 until it is done"""
+    app.state.warmup_task = None
+    if config.WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(run_warmup())
+    else:
+        mark_ready_without_warmup()
+    
+    provider_registry = get_provider_registry()
+    if config.PROVIDER_HEALTH_BACKGROUND_REFRESH:
+        provider_registry.start()
+    
+    # Ingestion runs from the durable queue, either here or in separate worker processes
+    app.state.ingestion_workers = None
+    if config.INGESTION_WORKERS_IN_PROCESS:
+        app.state.ingestion_workers = create_worker_pool(get_ingestion_queue())
+        app.state.ingestion_workers.start()
+    
+    yield
+    
+    if app.state.warmup_task is not None and not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
+        await asyncio.gather(app.state.warmup_task, return_exceptions=True)
+    if app.state.ingestion_workers is not None:
+        await app.state.ingestion_workers.stop()
+    await provider_registry.stop()
+    await get_ollama_client().aclose()
+    if get_async_qdrant_client() is not None:
+        await get_async_qdrant_client().close()
+    shutdown_executors()
+    shutdown_extraction_pool()
+
+
+# Initialize FastAPI app
+app = FastAPI(title="Folder File Management API", lifespan=lifespan)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],  # Your Next.js frontend
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Root endpoint
+@app.get("/")
+async def root():
+    return {"message": "Folder File Management API"}
+
+# Include routers
+app.include_router(folders.router)
+app.include_router(files.router)
+app.include_router(chat.router)
+app.include_router(health.router)
+app.include_router(sessions.router)
+app.include_router(jobs.router)
+app.include_router(debug_router)
+
+
+@app.get("/")
+async def root():
+    return {"message": "AI Chat PDF API is running"}
+
+@app.get("/api/health")
+async def health_check():
+    return {"status": "healthy", "message": "API is running"}
@@ -22,6 +22,55 @@ class Config:
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
     QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)  # Fixed: Added this line
     QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "pdf_documents")
+    # Transport: the async client serves searches and writes natively (no thread pool hop);
+    # gRPC avoids JSON encoding of vectors and is much cheaper for bulk upserts
+    QDRANT_ASYNC_CLIENT = os.getenv("QDRANT_ASYNC_CLIENT", "false").lower() == "true"
+    QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    QDRANT_MAX_CONNECTIONS = int(os.getenv("QDRANT_MAX_CONNECTIONS", "32"))
+    # Per-call deadlines for reads (search, scroll, counts) and writes (upserts, deletes)
+    QDRANT_TIMEOUT_SECONDS = float(os.getenv("QDRANT_TIMEOUT_SECONDS", "10"))
+    QDRANT_WRITE_TIMEOUT_SECONDS = float(os.getenv("QDRANT_WRITE_TIMEOUT_SECONDS", "60"))
+    # Keyword payload indexes (on metadata.<field>) created with the collection and added to existing ones
+    QDRANT_PAYLOAD_INDEXES = [
+        field.strip() for field in os.getenv("QDRANT_PAYLOAD_INDEXES", "folder_id,file_id,chunk_hash,content_hash").split(",")
+        if field.strip()
+    ]
+    QDRANT_CREATE_PAYLOAD_INDEXES = os.getenv("QDRANT_CREATE_PAYLOAD_INDEXES", "true").lower() == "true"
+    # How folders are kept apart in Qdrant: "none" (one collection, filtered by folder),
+    # "tenant" (one collection with folder_id as a tenant index, so each folder's vectors are stored
+    # and graphed together) or "collection" (one collection per folder, created on first write)
+    QDRANT_PARTITIONING_MODES = ("none", "tenant", "collection")
+    QDRANT_PARTITIONING = os.getenv("QDRANT_PARTITIONING", "none").strip().lower()
+    if QDRANT_PARTITIONING not in QDRANT_PARTITIONING_MODES:
+        # A typo must not silently fall back to the shared collection once data is partitioned
+        raise ValueError(
+            f"Invalid QDRANT_PARTITIONING '{QDRANT_PARTITIONING}'. Use one of: {', '.join(QDRANT_PARTITIONING_MODES)}"
+        )
+    
+    # Collection profile: vector storage, quantization and HNSW settings used when the collection is
+    # created; existing collections are changed with `python qdrant_admin.py migrate`
+    QDRANT_COLLECTION_PROFILE = os.getenv("QDRANT_COLLECTION_PROFILE", "default")
+    QDRANT_COLLECTION_PROFILES = {
+        # float32 vectors and the HNSW graph in RAM, Qdrant's defaults
+        "default": {},
+        # int8 quantized vectors in RAM drive the search; the originals re-score the top candidates
+        "balanced": {
+            "quantization": "int8", "quantization_always_ram": True, "rescore": True, "oversampling": 2.0,
+            "hnsw_m": 16, "hnsw_ef_construct": 100, "hnsw_ef": 128
+        },
+        # Millions of chunks per node: float16 originals on disk, only the int8 copies and the graph in RAM
+        "compact": {
+            "datatype": "float16", "on_disk": True,
+            "quantization": "int8", "quantization_always_ram": True, "rescore": True, "oversampling": 3.0,
+            "hnsw_m": 16, "hnsw_ef_construct": 100, "hnsw_ef": 128,
+            "indexing_threshold": 20000, "memmap_threshold": 20000
+        }
+    }
+    # Optional overrides of the active profile's HNSW settings (hnsw_ef is the per-query search width)
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M")) if os.getenv("QDRANT_HNSW_M") else None
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT")) if os.getenv("QDRANT_HNSW_EF_CONSTRUCT") else None
+    QDRANT_SEARCH_HNSW_EF = int(os.getenv("QDRANT_SEARCH_HNSW_EF")) if os.getenv("QDRANT_SEARCH_HNSW_EF") else None
     
     # OpenAI API (for LLM, not embeddings)
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -29,24 +78,92 @@ class Config:
     # Google Gemini
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+    GEMINI_CHECK_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CHECK_TIMEOUT_SECONDS", "10"))
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
     
     # Local LLM (Ollama)
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+    OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+    OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+    OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
     
     # Embeddings (HuggingFace only)
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
     EMBEDDING_DIMENSION = 384  # Fixed dimension for HuggingFace all-MiniLM-L6-v2
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+    
+    # Thread pools that keep embedding and vector I/O off the event loop
+    EMBEDDING_EXECUTOR_WORKERS = int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", "2"))
+    VECTOR_IO_EXECUTOR_WORKERS = int(os.getenv("VECTOR_IO_EXECUTOR_WORKERS", "8"))
+    EXECUTOR_MAX_QUEUE = int(os.getenv("EXECUTOR_MAX_QUEUE", "256"))
+    
+    # Micro-batching of concurrent embedding calls
+    EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true"
+    EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
     
     # LLM
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
     
+    # Semantic answer cache
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    
+    # Provider availability cache (seconds before a provider is probed again)
+    PROVIDER_HEALTH_TTL_SECONDS = int(os.getenv("PROVIDER_HEALTH_TTL_SECONDS", "300"))
+    PROVIDER_HEALTH_BACKGROUND_REFRESH = os.getenv("PROVIDER_HEALTH_BACKGROUND_REFRESH", "true").lower() == "true"
+    
     # Document Processing
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    # Process pool for PDF page extraction (1 disables it); only used for PDFs with at least PDF_PARALLEL_MIN_PAGES pages
+    PDF_EXTRACTION_PROCESSES = int(os.getenv("PDF_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+    # Pages with less extracted text than this are flagged as low-text (likely scanned)
+    PDF_MIN_PAGE_TEXT_CHARS = int(os.getenv("PDF_MIN_PAGE_TEXT_CHARS", "20"))
+    # Default extraction profile (fast / standard / full); uploads and folders can override it
+    PDF_EXTRACTION_PROFILE = os.getenv("PDF_EXTRACTION_PROFILE", "standard")
+    # Re-processing a file only writes the chunks that changed (compared by chunk hash and position)
+    INCREMENTAL_REINDEX_ENABLED = os.getenv("INCREMENTAL_REINDEX_ENABLED", "true").lower() == "true"
+    
+    # Startup warm-up
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_CHECK_PROVIDERS = os.getenv("WARMUP_CHECK_PROVIDERS", "true").lower() == "true"
+    
+    # Index manifest (per-file indexing state)
+    INDEX_STALE_SECONDS = int(os.getenv("INDEX_STALE_SECONDS", "1800"))
+    
+    # Folder processing status polled by the frontend
+    FOLDER_STATUS_CACHE_TTL_SECONDS = float(os.getenv("FOLDER_STATUS_CACHE_TTL_SECONDS", "3"))
     
     # Paths
     TEMP_DIR = Path("temp")
     TEMP_DIR.mkdir(exist_ok=True)
+    DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
+    DATA_DIR.mkdir(exist_ok=True)
+    # PDFs larger than this are streamed to PDF_SPOOL_DIR instead of being opened from memory
+    PDF_STREAM_TO_DISK_BYTES = int(os.getenv("PDF_STREAM_TO_DISK_BYTES", str(32 * 1024 * 1024)))
+    PDF_SPOOL_DIR = Path(os.getenv("PDF_SPOOL_DIR", str(TEMP_DIR)))
+    PDF_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    INDEX_MANIFEST_PATH = Path(os.getenv("INDEX_MANIFEST_PATH", str(DATA_DIR / "index_manifest.db")))
+    # Persistent document chunk embeddings, so unchanged chunks are never embedded twice
+    CHUNK_EMBEDDING_CACHE_ENABLED = os.getenv("CHUNK_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    CHUNK_EMBEDDING_CACHE_PATH = Path(os.getenv("CHUNK_EMBEDDING_CACHE_PATH", str(DATA_DIR / "chunk_embeddings.db")))
+    
+    # Durable ingestion queue and its worker pool
+    INGESTION_QUEUE_PATH = Path(os.getenv("INGESTION_QUEUE_PATH", str(DATA_DIR / "ingestion_queue.db")))
+    # Run workers inside the API process; set to false when running `python ingestion_worker.py` separately
+    INGESTION_WORKERS_IN_PROCESS = os.getenv("INGESTION_WORKERS_IN_PROCESS", "true").lower() == "true"
+    INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+    INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+    INGESTION_RETRY_BASE_SECONDS = float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "10"))
+    INGESTION_RETRY_MAX_SECONDS = float(os.getenv("INGESTION_RETRY_MAX_SECONDS", "600"))
+    INGESTION_LEASE_SECONDS = float(os.getenv("INGESTION_LEASE_SECONDS", "300"))
+    INGESTION_POLL_INTERVAL_SECONDS = float(os.getenv("INGESTION_POLL_INTERVAL_SECONDS", "1"))
 
 config = Config()
\ No newline at end of file
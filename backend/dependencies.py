@@ -1,10 +1,9 @@
 from supabase import create_client, Client
 from langchain_openai import ChatOpenAI
 from langchain_huggingface import HuggingFaceEmbeddings
-from qdrant_client import QdrantClient
 import google.generativeai as genai
 from openai import OpenAI
-import requests
+import threading
 from config import config
 
 # Global variables for lazy loading
@@ -14,6 +13,19 @@ _llm = None
 _qdrant_client = None
 _sentence_model = None
 _gemini_model = None
+_vector_store = None
+_provider_registry = None
+_index_manifest = None
+_answer_cache = None
+_ollama_client = None
+_gemini_client = None
+_ingestion_queue = None
+_chunk_embedding_cache = None
+_async_qdrant_client = None
+
+# Guards construction of the shared, app-lifetime resources. Sync dependencies
+# run in FastAPI's threadpool, so two requests can race to build the same model.
+_registry_lock = threading.RLock()
 
 
 def _get_supabase():
@@ -26,15 +38,34 @@ def _get_supabase():
 def _get_embeddings():
     global _embeddings
     if _embeddings is None:
-        try:
-            _embeddings = HuggingFaceEmbeddings(
-                model_name=config.EMBEDDING_MODEL,
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
-        except Exception as e:
-            print(f"Warning: Failed to initialize HuggingFace embeddings: {e}")
-            return None
+        with _registry_lock:
+            if _embeddings is None:
+                try:
+                    from embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+                    from embedding_batcher import EmbeddingBatcher
+                    model = HuggingFaceEmbeddings(
+                        model_name=config.EMBEDDING_MODEL,
+                        model_kwargs={'device': 'cpu'},
+                        encode_kwargs={'normalize_embeddings': True}
+                    )
+                    # Concurrent requests share batched forward passes on the CPU model
+                    batcher = None
+                    if config.EMBEDDING_BATCHING_ENABLED:
+                        batcher = EmbeddingBatcher(
+                            model.embed_documents,
+                            window_ms=config.EMBEDDING_BATCH_WINDOW_MS,
+                            max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE
+                        )
+                    # Repeated and retried queries are served from an LRU instead of the model
+                    _embeddings = CachedEmbeddings(
+                        model,
+                        model_name=config.EMBEDDING_MODEL,
+                        query_cache=QueryEmbeddingCache(max_size=config.QUERY_EMBEDDING_CACHE_SIZE),
+                        batcher=batcher
+                    )
+                except Exception as e:
+                    print(f"Warning: Failed to initialize HuggingFace embeddings: {e}")
+                    return None
     return _embeddings
 
 
@@ -56,10 +87,59 @@ def _get_llm():
 def _get_qdrant_client():
     global _qdrant_client
     if _qdrant_client is None:
-        _qdrant_client = QdrantClient(host=config.QDRANT_HOST, port=config.QDRANT_PORT)
+        with _registry_lock:
+            if _qdrant_client is None:
+                import qdrant_admin
+                _qdrant_client = qdrant_admin.create_client()
     return _qdrant_client
 
 
+def _get_async_qdrant_client():
+    """Process-wide async Qdrant client (REST pool or gRPC channel), or None when QDRANT_ASYNC_CLIENT is off"""
+    global _async_qdrant_client
+    if _async_qdrant_client is None and config.QDRANT_ASYNC_CLIENT:
+        with _registry_lock:
+            if _async_qdrant_client is None:
+                import qdrant_admin
+                _async_qdrant_client = qdrant_admin.create_async_client()
+    return _async_qdrant_client
+
+
+def _get_vector_store():
+    """Build the process-wide VectorStore once, sharing the embedding model and Qdrant client"""
+    global _vector_store
+    if _vector_store is None:
+        with _registry_lock:
+            if _vector_store is None:
+                from vector_store import VectorStore
+                # Not cached on failure so the next caller retries once the backends are up
+                vector_store = VectorStore(
+                    supabase_client=_get_supabase(),
+                    embeddings=_get_embeddings(),
+                    qdrant_client=_get_qdrant_client(),
+                    chunk_cache=_get_chunk_embedding_cache(),
+                    async_qdrant_client=_get_async_qdrant_client()
+                )
+                # Cached answers for a folder are dropped as soon as its vectors change
+                vector_store.add_change_listener(_get_answer_cache().invalidate_folders)
+                _vector_store = vector_store
+    return _vector_store
+
+
+def _get_answer_cache():
+    global _answer_cache
+    if _answer_cache is None:
+        with _registry_lock:
+            if _answer_cache is None:
+                from answer_cache import SemanticAnswerCache
+                _answer_cache = SemanticAnswerCache(
+                    similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                    ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+                    max_entries=config.ANSWER_CACHE_MAX_ENTRIES
+                )
+    return _answer_cache
+
+
 def _get_gemini_model():
     global _gemini_model
     if _gemini_model is None:
@@ -77,20 +157,18 @@ def _get_gemini_model():
 
 
 def check_openai_api_key() -> bool:
-    """Check if OpenAI API key is valid and has quota"""
+    """
+    Check if the OpenAI API key is valid and the API answers.
+    Lists models, which is free; running out of quota shows up through the
+    failures of real chat calls instead.
+    """
     try:
         if not config.OPENAI_API_KEY:
             return False
         
-        client = OpenAI(api_key=config.OPENAI_API_KEY)
-        # Try a minimal API call to test the key
+        client = OpenAI(api_key=config.OPENAI_API_KEY, timeout=10.0)
         try:
-            # Use a very small prompt to minimize cost
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=1
-            )
+            client.models.list()
             return True
         except Exception as e:
             error_str = str(e).lower()
@@ -106,101 +184,88 @@ def check_openai_api_key() -> bool:
         return False
 
 
-def check_gemini_api_key() -> bool:
+async def check_gemini_api_key() -> bool:
     """Check if Gemini API key is valid"""
-    try:
-        if not config.GEMINI_API_KEY:
-            return False
-        
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        # List available models to verify API key and find supported models
-        try:
-            models = genai.list_models()
-            available_models = [m.name for m in models if 'generateContent' in m.supported_generation_methods]
-            print(f"Available Gemini models: {available_models}")
-            
-            # Check if our configured model is available
-            model_name = f"models/{config.GEMINI_MODEL}"
-            if model_name not in available_models:
-                print(f"Warning: Configured model {config.GEMINI_MODEL} not available.")
-                print(f"Available models: {', '.join([m.replace('models/', '') for m in available_models])}")
-                # Try with the first available model
-                if available_models:
-                    first_model = available_models[0].replace('models/', '')
-                    print(f"Trying with {first_model}")
-                    model = genai.GenerativeModel(first_model)
-                    response = model.generate_content("Hello")
-                    return True
-                return False
-            
-            # Test the configured model
-            model = genai.GenerativeModel(config.GEMINI_MODEL)
-            response = model.generate_content("Hello")
-            return True
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return False
-    except Exception as e:
-        print(f"Gemini API key invalid or error: {e}")
-        return False
+    from llm_clients import check_gemini_availability
+    return await check_gemini_availability(
+        config.GEMINI_API_KEY, config.GEMINI_MODEL, config.GEMINI_CHECK_TIMEOUT_SECONDS
+    )
+
+
+def _get_gemini_client():
+    global _gemini_client
+    if _gemini_client is None:
+        model = _get_gemini_model()
+        if model is None:
+            return None
+        with _registry_lock:
+            if _gemini_client is None:
+                from llm_clients import create_gemini_client
+                _gemini_client = create_gemini_client(model)
+    return _gemini_client
+
+
+def _get_ollama_client():
+    global _ollama_client
+    if _ollama_client is None:
+        with _registry_lock:
+            if _ollama_client is None:
+                from llm_clients import create_ollama_client
+                _ollama_client = create_ollama_client()
+    return _ollama_client
 
 
-def check_ollama_availability() -> bool:
+async def check_ollama_availability() -> bool:
     """Check if Ollama is running and model is available"""
-    try:
-        # First check if Ollama is running
-        response = requests.get(f"{config.OLLAMA_BASE_URL}/api/version", timeout=5)
-        if response.status_code != 200:
-            print("Ollama is not running")
-            return False
-        
-        # Check if the specific model is available
-        response = requests.get(f"{config.OLLAMA_BASE_URL}/api/tags", timeout=5)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            model_names = [model.get('name', '') for model in models]
-            
-            # Check for exact match or base model match
-            requested_model = config.OLLAMA_MODEL
-            if ':' in requested_model:
-                base_model = requested_model.split(':')[0]
-            else:
-                base_model = requested_model
-            
-            # Check if model exists (either exact or any version)
-            model_exists = any(
-                name == requested_model or name.startswith(f"{base_model}:")
-                for name in model_names
-            )
-            
-            if not model_exists:
-                print(f"Ollama model {requested_model} is not pulled. Available models: {model_names}")
-                print(f"Please run: ollama pull {requested_model}")
-                return False
-            
-            # Test the model with a simple request
-            test_response = requests.post(
-                f"{config.OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": requested_model,
-                    "prompt": "Hi",
-                    "stream": False
-                },
-                timeout=10
-            )
-            
-            if test_response.status_code == 200:
-                return True
-            else:
-                print(f"Ollama model test failed: {test_response.status_code} - {test_response.text}")
-                return False
-        return False
-    except requests.exceptions.ConnectionError:
-        print(f"Cannot connect to Ollama at {config.OLLAMA_BASE_URL}. Make sure Ollama is running.")
-        return False
-    except Exception as e:
-        print(f"Ollama availability check failed: {e}")
-        return False
+    return await _get_ollama_client().check_availability()
+
+
+def _get_index_manifest():
+    global _index_manifest
+    if _index_manifest is None:
+        with _registry_lock:
+            if _index_manifest is None:
+                from index_manifest import IndexManifest
+                _index_manifest = IndexManifest()
+    return _index_manifest
+
+
+def _get_chunk_embedding_cache():
+    """Persistent chunk embedding cache, or None when disabled"""
+    global _chunk_embedding_cache
+    if _chunk_embedding_cache is None and config.CHUNK_EMBEDDING_CACHE_ENABLED:
+        with _registry_lock:
+            if _chunk_embedding_cache is None:
+                from embedding_cache import ChunkEmbeddingCache
+                _chunk_embedding_cache = ChunkEmbeddingCache()
+    return _chunk_embedding_cache
+
+
+def _get_ingestion_queue():
+    global _ingestion_queue
+    if _ingestion_queue is None:
+        with _registry_lock:
+            if _ingestion_queue is None:
+                from ingestion_queue import IngestionQueue
+                _ingestion_queue = IngestionQueue()
+    return _ingestion_queue
+
+
+def _get_provider_registry():
+    global _provider_registry
+    if _provider_registry is None:
+        with _registry_lock:
+            if _provider_registry is None:
+                from provider_health import ProviderHealthRegistry
+                _provider_registry = ProviderHealthRegistry(
+                    checks={
+                        "openai": check_openai_api_key,
+                        "gemini": check_gemini_api_key,
+                        "ollama": check_ollama_availability
+                    },
+                    ttl_seconds=config.PROVIDER_HEALTH_TTL_SECONDS
+                )
+    return _provider_registry
 
 
 def get_supabase() -> Client:
@@ -223,11 +288,66 @@ def get_qdrant_client():
     return _get_qdrant_client()
 
 
+def get_async_qdrant_client():
+    """Dependency to get the async Qdrant client (None when disabled)"""
+    return _get_async_qdrant_client()
+
+
 def get_gemini_model():
     """Dependency to get Gemini model"""
     return _get_gemini_model()
 
 
+def get_vector_store():
+    """Dependency to get the shared VectorStore instance"""
+    return _get_vector_store()
+
+
+def get_answer_cache():
+    """Dependency to get the shared semantic answer cache"""
+    return _get_answer_cache()
+
+
+def get_index_manifest():
+    """Dependency to get the per-file index manifest"""
+    return _get_index_manifest()
+
+
+def get_ingestion_service():
+    """Dependency to get an IngestionService bound to the shared resources"""
+    from services.ingestion_service import IngestionService
+    return IngestionService(
+        supabase=_get_supabase(),
+        vector_store=_get_vector_store(),
+        index_manifest=_get_index_manifest()
+    )
+
+
+def get_chunk_embedding_cache():
+    """Dependency to get the persistent chunk embedding cache (None when disabled)"""
+    return _get_chunk_embedding_cache()
+
+
+def get_ingestion_queue():
+    """Dependency to get the durable ingestion job queue"""
+    return _get_ingestion_queue()
+
+
+def get_gemini_client():
+    """Dependency to get the async Gemini client (None when Gemini is not configured)"""
+    return _get_gemini_client()
+
+
+def get_ollama_client():
+    """Dependency to get the shared Ollama HTTP client"""
+    return _get_ollama_client()
+
+
+def get_provider_registry():
+    """Dependency to get the shared provider health registry"""
+    return _get_provider_registry()
+
+
 def get_chat_service():
     """Dependency to get ChatService instance"""
     from services.chat_service import ChatService
@@ -236,5 +356,11 @@ def get_chat_service():
         embeddings=_get_embeddings(),
         llm=_get_llm(),
         qdrant_client=_get_qdrant_client(),
-        gemini_model=_get_gemini_model()
-    )
\ No newline at end of file
+        gemini_model=_get_gemini_model(),
+        vector_store=_get_vector_store(),
+        provider_registry=_get_provider_registry(),
+        index_manifest=_get_index_manifest(),
+        answer_cache=_get_answer_cache(),
+        ollama_client=_get_ollama_client(),
+        gemini_client=_get_gemini_client()
+    )
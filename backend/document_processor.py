@@ -1,19 +1,25 @@
 import os
 import tempfile
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Union
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import io
+
+import httpx
 
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownTextSplitter
 from langchain_core.documents import Document
 from supabase import Client
-import fitz  # PyMuPDF
 import re
 
 from config import config
+from embedding_cache import chunk_hash
+from pdf_extraction import extract_pages, resolve_profile, STANDARD
+
+# A PDF held in memory, or the path of a spooled download
+PdfSource = Union[bytes, bytearray, str]
 
 class DocumentProcessor:
     def __init__(self, supabase_client: Client):
@@ -35,56 +41,86 @@ class DocumentProcessor:
             chunk_overlap=config.CHUNK_OVERLAP
         )
         
-    async def download_pdf_from_supabase(self, storage_path: str) -> str:
-        """Download PDF from Supabase storage to temp file"""
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=config.TEMP_DIR)
-        temp_path = temp_file.name
-        temp_file.close()
+    async def _signed_download_url(self, storage_path: str) -> Optional[str]:
+        """Short-lived URL for streaming the object; None if the storage API cannot issue one"""
+        try:
+            signed = await asyncio.to_thread(
+                self.supabase.storage.from_(config.SUPABASE_BUCKET).create_signed_url, storage_path, 600
+            )
+        except Exception as e:
+            print(f"Could not create signed URL for {storage_path}: {e}")
+            return None
         
-        # Download file from Supabase
-        file_bytes = self.supabase.storage.from_(config.SUPABASE_BUCKET).download(storage_path)
+        url = signed.get("signedURL") or signed.get("signedUrl")
+        if url and not url.startswith("http"):
+            # Older storage APIs return a path relative to the storage endpoint
+            url = f"{config.SUPABASE_URL.rstrip('/')}/storage/v1{url}"
+        return url
+    
+    async def fetch_pdf(self, storage_path: str) -> Tuple[PdfSource, str]:
+        """
+        Download a PDF from Supabase storage together with its SHA-256.
+        Files up to PDF_STREAM_TO_DISK_BYTES stay in memory and are opened from
+        the buffer; larger ones are streamed to a spool file in chunks, so a
+        file is never held in memory twice or written out and read back whole.
+        """
+        url = await self._signed_download_url(storage_path)
+        if url is None:
+            # Non-streaming fallback: one in-memory copy, still no temp file
+            file_bytes = await asyncio.to_thread(
+                self.supabase.storage.from_(config.SUPABASE_BUCKET).download, storage_path
+            )
+            return file_bytes, hashlib.sha256(file_bytes).hexdigest()
         
-        with open(temp_path, 'wb') as f:
-            f.write(file_bytes)
-            
-        return temp_path
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        spool = None
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for block in response.aiter_bytes(1024 * 1024):
+                        digest.update(block)
+                        if spool is None and len(buffer) + len(block) > config.PDF_STREAM_TO_DISK_BYTES:
+                            # Too big to keep in memory: spill what we have and stream the rest to disk
+                            spool = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=config.PDF_SPOOL_DIR)
+                            spool.write(buffer)
+                            buffer = bytearray()
+                        if spool is not None:
+                            spool.write(block)
+                        else:
+                            buffer.extend(block)
+        except BaseException:
+            if spool is not None:
+                spool.close()
+                os.unlink(spool.name)
+            raise
+        
+        if spool is not None:
+            spool.close()
+            return spool.name, digest.hexdigest()
+        return buffer, digest.hexdigest()
     
-    def _extract_text_with_pymupdf(self, pdf_path: str) -> Tuple[str, List[Dict[str, Any]]]:
+    def _extract_text_with_pymupdf(self, pdf_path: PdfSource, profile: str = STANDARD) -> Tuple[str, List[Dict[str, Any]]]:
         """Extract text from PDF using PyMuPDF with better formatting preservation"""
-        doc = fitz.open(pdf_path)
         full_text = ""
         page_metadata = []
         
-        for page_num, page in enumerate(doc):
-            # Extract text with layout preservation
-            text = page.get_text("text", sort=True)
-            
-            # Extract tables if present
-            tables = []
-            try:
-                # Try to find tables
-                tabs = page.find_tables()
-                for tab in tabs:
-                    table_text = "\n".join(["\t".join(row) for row in tab.extract()])
-                    tables.append(table_text)
-            except:
-                pass
-            
-            # Combine text and tables
-            page_text = text
-            if tables:
-                page_text += "\n\nTables:\n" + "\n\n".join(tables)
-            
-            full_text += f"\n\n--- Page {page_num + 1} ---\n\n{page_text}"
+        # Large PDFs are extracted in parallel page ranges; pages come back in order
+        for page in extract_pages(pdf_path, profile):
+            full_text += f"\n\n--- Page {page['page']} ---\n\n{page['text']}"
             
             # Store page metadata
             page_metadata.append({
-                "page": page_num + 1,
-                "text_length": len(page_text),
-                "has_tables": len(tables) > 0
+                "page": page["page"],
+                "text_length": len(page["text"]),
+                "has_tables": page["has_tables"],
+                "low_text": page["low_text"],
+                "has_images": page["has_images"],
+                "raw_order": page["raw_order"],
+                "table_scan": page["table_scan"]
             })
         
-        doc.close()
         return full_text, page_metadata
     
     def _clean_and_normalize_text(self, text: str) -> str:
@@ -125,7 +161,7 @@ class DocumentProcessor:
                         "page": i,
                         "chunk_index": j,
                         "total_chunks_in_page": len(page_chunks),
-                        "chunk_id": hashlib.md5(chunk.encode()).hexdigest()[:8]
+                        "chunk_hash": chunk_hash(chunk)
                     }
                     chunks.append(Document(page_content=chunk, metadata=chunk_metadata))
         else:
@@ -137,31 +173,27 @@ class DocumentProcessor:
                     **metadata,
                     "chunk_index": i,
                     "total_chunks": len(text_chunks),
-                    "chunk_id": hashlib.md5(chunk.encode()).hexdigest()[:8]
+                    "chunk_hash": chunk_hash(chunk)
                 }
                 chunks.append(Document(page_content=chunk, metadata=chunk_metadata))
         
         return chunks
     
-    def _process_pdf_sync(self, pdf_path: str, file_id: str, folder_id: str, original_filename: str) -> List[Document]:
+    def _process_pdf_sync(self, pdf_path: PdfSource, file_id: str, folder_id: str, original_filename: str, profile: str = STANDARD) -> List[Document]:
         """Synchronous PDF processing with improved text extraction"""
         try:
             # Extract text using PyMuPDF
-            full_text, page_metadata = self._extract_text_with_pymupdf(pdf_path)
+            full_text, page_metadata = self._extract_text_with_pymupdf(pdf_path, profile)
             
             # Clean and normalize text
-            cleaned_text = self._clean_and_normalize_text(full_text)
+            primary_text = self._clean_and_normalize_text(full_text)
             
-            # Also try loading with PyMuPDFLoader for comparison
-            loader = PyMuPDFLoader(pdf_path)
-            langchain_docs = loader.load()
-            
-            # Combine both extraction methods for better coverage
-            if len(langchain_docs) > 0 and len(langchain_docs[0].page_content) > len(cleaned_text):
-                # Use LangChain extraction if it got more content
-                primary_text = "\n\n".join([doc.page_content for doc in langchain_docs])
-            else:
-                primary_text = cleaned_text
+            # Quality is judged per page during extraction (pages with a weak sorted read fall back to raw order)
+            low_text_pages = [page["page"] for page in page_metadata if page["low_text"]]
+            if low_text_pages:
+                scanned = [page["page"] for page in page_metadata if page["low_text"] and page["has_images"]]
+                print(f"{original_filename}: {len(low_text_pages)}/{len(page_metadata)} pages have little or no text"
+                      f"{f' ({len(scanned)} look scanned)' if scanned else ''}")
             
             # Create base metadata
             base_metadata = {
@@ -169,22 +201,26 @@ class DocumentProcessor:
                 "folder_id": folder_id,
                 "filename": original_filename,
                 "total_pages": len(page_metadata),
-                "extraction_method": "pymupdf_enhanced"
+                "low_text_pages": len(low_text_pages),
+                "extraction_method": "pymupdf_enhanced",
+                "extraction_profile": profile
             }
             
             # Create chunks with overlap
             chunks = self._create_chunks_with_overlap(primary_text, base_metadata)
             
             # Validate chunks
-            print(f"Processed {original_filename}: {len(chunks)} chunks from {len(primary_text)} characters")
+            table_scans = sum(1 for page in page_metadata if page["table_scan"])
+            print(f"Processed {original_filename}: {len(chunks)} chunks from {len(primary_text)} characters "
+                  f"({profile} profile, table detection on {table_scans}/{len(page_metadata)} pages)")
             
             return chunks
             
         except Exception as e:
-            print(f"Error processing PDF {pdf_path}: {str(e)}")
+            print(f"Error processing PDF {original_filename}: {str(e)}")
             # Fallback to basic extraction
             try:
-                with open(pdf_path, 'rb') as file:
+                with (open(pdf_path, 'rb') if isinstance(pdf_path, str) else io.BytesIO(pdf_path)) as file:
                     import PyPDF2
                     pdf_reader = PyPDF2.PdfReader(file)
                     text = ""
@@ -209,27 +245,30 @@ class DocumentProcessor:
                 print(f"Fallback extraction also failed: {str(fallback_error)}")
                 raise
     
-    async def process_pdf(self, storage_path: str, file_id: str, folder_id: str, original_filename: str) -> List[Document]:
-        """Process a PDF file from Supabase storage"""
-        temp_path = None
+    async def process_pdf(self, storage_path: str, file_id: str, folder_id: str, original_filename: str, profile: str = None) -> List[Document]:
+        """Process a PDF file from Supabase storage using the given extraction profile (fast / standard / full)"""
+        profile = resolve_profile(profile)
+        source = None
         try:
-            # Download PDF from Supabase
-            temp_path = await self.download_pdf_from_supabase(storage_path)
+            # Download PDF from Supabase: in memory, or spooled to disk when large
+            source, content_hash = await self.fetch_pdf(storage_path)
             
             # Process PDF in thread pool to avoid blocking
             loop = asyncio.get_event_loop()
             chunks = await loop.run_in_executor(
                 self.executor,
                 self._process_pdf_sync,
-                temp_path,
+                source,
                 file_id,
                 folder_id,
-                original_filename
+                original_filename,
+                profile
             )
             
-            # Add storage path to all chunks
+            # Add storage path and content hash to all chunks
             for chunk in chunks:
                 chunk.metadata["storage_path"] = storage_path
+                chunk.metadata["content_hash"] = content_hash
             
             # Log processing statistics
             total_content_length = sum(len(chunk.page_content) for chunk in chunks)
@@ -242,9 +281,9 @@ class DocumentProcessor:
             return chunks
             
         finally:
-            # Clean up temp file
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
+            # Clean up the spooled download
+            if isinstance(source, str) and os.path.exists(source):
+                os.unlink(source)
     
     async def process_multiple_pdfs(self, pdf_files: List[Dict[str, Any]]) -> Dict[str, List[Document]]:
         """Process multiple PDF files concurrently"""
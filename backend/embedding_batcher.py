@@ -0,0 +1,109 @@
+import asyncio
+import weakref
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from executors import run_embedding
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding calls into batched forward passes.
+
+    Calls that arrive within window_ms of each other are concatenated and
+    embedded with one embed_documents call on the embedding pool; each caller
+    gets back only its own vectors. A batch is flushed early once it reaches
+    max_batch_size texts, and calls that are already that large skip the
+    queue. Query embeddings go through embed_documents too, which gives the
+    same vectors for symmetric sentence-transformers models such as MiniLM.
+    """
+    
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], window_ms: float = 5, max_batch_size: int = 32):
+        self.embed_fn = embed_fn
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # Pending calls are tracked per event loop
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+        # The event loop only keeps weak references to tasks; in-flight batches must not be collected
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+        self.calls = 0
+        self.largest_batch = 0
+    
+    def _state(self, loop: asyncio.AbstractEventLoop) -> Dict[str, Any]:
+        state = self._states.get(loop)
+        if state is None:
+            state = {"pending": [], "size": 0, "timer": None}
+            self._states[loop] = state
+        return state
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, sharing a forward pass with other concurrent callers"""
+        if not texts:
+            return []
+        self.calls += 1
+        
+        if len(texts) >= self.max_batch_size:
+            self._record_batch(len(texts))
+            return await run_embedding(self.embed_fn, texts)
+        
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        future = loop.create_future()
+        state["pending"].append((texts, future))
+        state["size"] += len(texts)
+        
+        if state["size"] >= self.max_batch_size:
+            self._flush(loop)
+        elif state["timer"] is None:
+            state["timer"] = loop.call_later(self.window_seconds, self._flush, loop)
+        
+        return await future
+    
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        state = self._state(loop)
+        if state["timer"] is not None:
+            state["timer"].cancel()
+            state["timer"] = None
+        
+        batch = state["pending"]
+        state["pending"] = []
+        state["size"] = 0
+        if batch:
+            task = loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future]]) -> None:
+        all_texts = [text for texts, _ in batch for text in texts]
+        self._record_batch(len(all_texts))
+        
+        try:
+            vectors = await run_embedding(self.embed_fn, all_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        offset = 0
+        for texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+    
+    def _record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.texts += size
+        self.largest_batch = max(self.largest_batch, size)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size
+        }
@@ -0,0 +1,207 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import config
+from executors import run_embedding
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings keyed by (embedding model, normalized text)"""
+    
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially different spellings share an entry"""
+        return " ".join(text.split())
+    
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(embedding)
+    
+    def put(self, model_name: str, text: str, embedding: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            self._entries[key] = list(embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+def chunk_hash(text: str) -> str:
+    """Full SHA-256 of a chunk's text; identifies the chunk across files and revisions"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingCache:
+    """
+    Persistent cache of document chunk embeddings keyed by (chunk hash, embedding model).
+    
+    Vectors are stored as float32 blobs in a local SQLite database in WAL mode,
+    so re-processing a file, a manual reprocess or a revised document only
+    embeds chunks whose text has not been seen before with the current model.
+    """
+    
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+    
+    def __init__(self, db_path: Path = None):
+        self.db_path = Path(db_path or config.CHUNK_EMBEDDING_CACHE_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._init_schema()
+        self.hits = 0
+        self.misses = 0
+    
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                    chunk_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (chunk_hash, model)
+                ) WITHOUT ROWID
+            """)
+    
+    def get_many(self, model_name: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Cached embeddings for the given chunk hashes; misses are simply absent"""
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), self._LOOKUP_BATCH):
+                batch = hashes[i:i + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, embedding FROM chunk_embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    (model_name, *batch)
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+    
+    def put_many(self, model_name: str, embeddings: Dict[str, List[float]]) -> None:
+        if not embeddings:
+            return
+        now = time.time()
+        rows = []
+        for key, embedding in embeddings.items():
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows.append((key, model_name, vector.shape[0], vector.tobytes(), now))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (chunk_hash, model, dimension, embedding, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def clear(self, model_name: Optional[str] = None) -> None:
+        """Drop cached embeddings, for one model or all of them"""
+        with self._lock, self._conn:
+            if model_name:
+                self._conn.execute("DELETE FROM chunk_embeddings WHERE model = ?", (model_name,))
+            else:
+                self._conn.execute("DELETE FROM chunk_embeddings")
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated queries from a QueryEmbeddingCache.
+    Document embeddings pass straight through to the wrapped model. When a
+    batcher is supplied, async calls are coalesced into shared forward passes.
+    """
+    
+    def __init__(self, embeddings: Embeddings, model_name: str, query_cache: QueryEmbeddingCache, batcher=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.query_cache = query_cache
+        self.batcher = batcher
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.query_cache.get(self.model_name, text)
+        if cached is not None:
+            return cached
+        
+        embedding = self.embeddings.embed_query(text)
+        self.query_cache.put(self.model_name, text, embedding)
+        return embedding
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents on the bounded embedding pool"""
+        if self.batcher is not None:
+            return await self.batcher.embed(texts)
+        return await run_embedding(self.embeddings.embed_documents, texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Cached query embedding; misses run on the bounded embedding pool"""
+        cached = self.query_cache.get(self.model_name, text)
+        if cached is not None:
+            return cached
+        
+        if self.batcher is not None:
+            embedding = (await self.batcher.embed([text]))[0]
+        else:
+            embedding = await run_embedding(self.embeddings.embed_query, text)
+        self.query_cache.put(self.model_name, text, embedding)
+        return embedding
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.query_cache.stats()
+    
+    def batch_stats(self) -> Optional[Dict[str, Any]]:
+        return self.batcher.stats() if self.batcher is not None else None
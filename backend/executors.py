@@ -0,0 +1,164 @@
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import config
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking work called from async code.
+
+    At most max_workers calls run at once and at most max_queue more wait for
+    a thread; further callers wait on the event loop (backpressure) instead
+    of piling up unbounded work. Queue depth and wait times are tracked so
+    saturation shows up in the debug endpoints.
+    """
+    
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        # One semaphore per event loop (the API process and ingestion workers each run their own)
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        # Calls whose caller stopped waiting while the thread was still running
+        self._abandoned = 0
+        self._max_queue_depth = 0
+        self._total_wait_ms = 0.0
+    
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._slots.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_workers + self.max_queue)
+            self._slots[loop] = semaphore
+        return semaphore
+    
+    def _run_tracked(self, state: Dict[str, Any], fn: Callable, args, kwargs) -> Any:
+        with self._lock:
+            if state["abandoned"]:
+                # The caller gave up before a worker picked this up
+                return None
+            state["started"] = True
+            self._queued -= 1
+            self._active += 1
+            self._total_wait_ms += (time.perf_counter() - state["submitted_at"]) * 1000
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self._completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+    
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result. A thread
+        cannot be interrupted, so when the caller is cancelled (e.g. by a
+        timeout) mid-call the slot stays taken until the thread is done.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore()
+        await semaphore.acquire()
+        state = {"started": False, "abandoned": False, "submitted_at": time.perf_counter()}
+        with self._lock:
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+        
+        future = self._executor.submit(functools.partial(self._run_tracked, state, fn, args, kwargs))
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                if not state["started"]:
+                    # Cancelled or rejected while still queued
+                    state["abandoned"] = True
+                    self._queued -= 1
+                elif not future.done():
+                    self._abandoned += 1
+            if future.done() or state["abandoned"]:
+                semaphore.release()
+            else:
+                future.add_done_callback(lambda _: self._release_from_thread(loop, semaphore))
+    
+    @staticmethod
+    def _release_from_thread(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # The event loop has already been closed
+            pass
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "abandoned": self._abandoned,
+                "max_queue_depth": self._max_queue_depth,
+                "avg_wait_ms": round(self._total_wait_ms / started, 2) if started else 0.0
+            }
+    
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Shared pool for 'embedding' (CPU model calls) or 'vector_io' (Qdrant/Supabase calls)"""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                workers = {
+                    "embedding": config.EMBEDDING_EXECUTOR_WORKERS,
+                    "vector_io": config.VECTOR_IO_EXECUTOR_WORKERS
+                }.get(name, 4)
+                executor = BoundedExecutor(name, max_workers=workers, max_queue=config.EXECUTOR_MAX_QUEUE)
+                _executors[name] = executor
+    return executor
+
+
+async def run_embedding(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking embedding-model call off the event loop"""
+    return await get_executor("embedding").run(fn, *args, **kwargs)
+
+
+async def run_vector_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking vector database call off the event loop"""
+    return await get_executor("vector_io").run(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
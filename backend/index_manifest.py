@@ -0,0 +1,215 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from config import config
+
+
+PENDING = "pending"
+INDEXING = "indexing"
+INDEXED = "indexed"
+FAILED = "failed"
+
+
+class IndexManifest:
+    """
+    Persistent per-file indexing state, written by ingestion and read by the
+    chat and status paths instead of probing the vector store.
+
+    Backed by a local SQLite database in WAL mode so that separate ingestion
+    processes on the same node can share it.
+    """
+    
+    def __init__(self, db_path: Path = None):
+        self.db_path = Path(db_path or config.INDEX_MANIFEST_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+    
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_index (
+                    file_id TEXT PRIMARY KEY,
+                    folder_id TEXT,
+                    state TEXT NOT NULL,
+                    chunk_count INTEGER,
+                    embedding_model TEXT,
+                    content_hash TEXT,
+                    extraction_profile TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # Manifests created by earlier versions lack the newer columns
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(file_index)")}
+            if "extraction_profile" not in columns:
+                self._conn.execute("ALTER TABLE file_index ADD COLUMN extraction_profile TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_index_folder ON file_index(folder_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_index_hash ON file_index(content_hash)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS folder_settings (
+                    folder_id TEXT PRIMARY KEY,
+                    extraction_profile TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+    
+    def _upsert(
+        self,
+        file_id: str,
+        state: str,
+        folder_id: Optional[str] = None,
+        chunk_count: Optional[int] = None,
+        embedding_model: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        extraction_profile: Optional[str] = None,
+        error: Optional[str] = None
+    ):
+        # Columns that are not supplied keep their previous value
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO file_index (
+                    file_id, folder_id, state, chunk_count, embedding_model, content_hash, extraction_profile, error, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(file_id) DO UPDATE SET
+                    folder_id = COALESCE(excluded.folder_id, file_index.folder_id),
+                    state = excluded.state,
+                    chunk_count = COALESCE(excluded.chunk_count, file_index.chunk_count),
+                    embedding_model = COALESCE(excluded.embedding_model, file_index.embedding_model),
+                    content_hash = COALESCE(excluded.content_hash, file_index.content_hash),
+                    extraction_profile = COALESCE(excluded.extraction_profile, file_index.extraction_profile),
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            """, (
+                str(file_id), folder_id and str(folder_id), state, chunk_count, embedding_model, content_hash,
+                extraction_profile, error, time.time()
+            ))
+    
+    def mark_pending(self, file_id: str, folder_id: str, content_hash: Optional[str] = None):
+        self._upsert(file_id, PENDING, folder_id=folder_id, content_hash=content_hash)
+    
+    def mark_indexing(self, file_id: str, folder_id: str):
+        self._upsert(file_id, INDEXING, folder_id=folder_id)
+    
+    def mark_indexed(
+        self,
+        file_id: str,
+        folder_id: str,
+        chunk_count: Optional[int],
+        embedding_model: str = None,
+        content_hash: Optional[str] = None,
+        extraction_profile: Optional[str] = None
+    ):
+        self._upsert(
+            file_id,
+            INDEXED,
+            folder_id=folder_id,
+            chunk_count=chunk_count,
+            embedding_model=embedding_model or config.EMBEDDING_MODEL,
+            content_hash=content_hash,
+            extraction_profile=extraction_profile
+        )
+    
+    def mark_failed(self, file_id: str, folder_id: str, error: str):
+        self._upsert(file_id, FAILED, folder_id=folder_id, error=error)
+    
+    def remove(self, file_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM file_index WHERE file_id = ?", (str(file_id),))
+    
+    def remove_folder(self, folder_id: str) -> int:
+        """Forget every file of a folder (its vectors were deleted); returns the number of entries removed"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM file_index WHERE folder_id = ?", (str(folder_id),)).rowcount
+    
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM file_index WHERE file_id = ?", (str(file_id),)).fetchone()
+        return dict(row) if row else None
+    
+    def get_many(self, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up several files with a single query"""
+        file_ids = [str(file_id) for file_id in file_ids]
+        if not file_ids:
+            return {}
+        
+        entries = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(file_ids), 500):
+            batch = file_ids[i:i+500]
+            placeholders = ",".join("?" for _ in batch)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM file_index WHERE file_id IN ({placeholders})", batch
+                ).fetchall()
+            entries.update({row["file_id"]: dict(row) for row in rows})
+        return entries
+    
+    def find_indexed_by_content_hash(self, content_hash: str, extraction_profile: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recently indexed file with these exact contents, extracted with
+        the same profile and embedded with the current model
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT * FROM file_index
+                WHERE content_hash = ? AND extraction_profile = ? AND state = ? AND embedding_model = ?
+                ORDER BY updated_at DESC LIMIT 1
+            """, (content_hash, extraction_profile, INDEXED, config.EMBEDDING_MODEL)).fetchone()
+        return dict(row) if row else None
+    
+    def get_folder(self, folder_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM file_index WHERE folder_id = ?", (str(folder_id),)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def folder_version(self, folder_id: str) -> str:
+        """
+        Changes whenever a file in the folder finishes indexing or is removed.
+        Lets processes that did not do the indexing themselves (the API, when
+        ingestion workers run separately) notice that a folder's vectors changed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS files, MAX(updated_at) AS latest FROM file_index WHERE folder_id = ? AND state = ?",
+                (str(folder_id), INDEXED)
+            ).fetchone()
+        return f"{row['files']}:{row['latest'] or 0}"
+    
+    def get_folder_profile(self, folder_id: str) -> Optional[str]:
+        """Extraction profile chosen for the folder, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extraction_profile FROM folder_settings WHERE folder_id = ?", (str(folder_id),)
+            ).fetchone()
+        return row["extraction_profile"] if row else None
+    
+    def set_folder_profile(self, folder_id: str, profile: Optional[str]):
+        """Set the folder's extraction profile; None goes back to the configured default"""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO folder_settings (folder_id, extraction_profile, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(folder_id) DO UPDATE SET
+                    extraction_profile = excluded.extraction_profile,
+                    updated_at = excluded.updated_at
+            """, (str(folder_id), profile, time.time()))
+    
+    def is_ready(self, entry: Optional[Dict[str, Any]]) -> bool:
+        """True when the entry is indexed with the embedding model currently configured"""
+        return bool(entry) and entry["state"] == INDEXED and entry["embedding_model"] == config.EMBEDDING_MODEL
+    
+    def is_in_progress(self, entry: Optional[Dict[str, Any]]) -> bool:
+        """True while another worker is indexing the file and has not gone stale"""
+        return (
+            bool(entry)
+            and entry["state"] == INDEXING
+            and time.time() - entry["updated_at"] < config.INDEX_STALE_SECONDS
+        )
@@ -0,0 +1,343 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from config import config
+
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Jobs that still hold a claim on their file
+ACTIVE_STATES = (QUEUED, RUNNING, RETRYING)
+
+
+class LeaseLostError(Exception):
+    """The worker no longer owns the job; state is what became of it (cancelled, or running under another worker)"""
+    
+    def __init__(self, state: Optional[str]):
+        super().__init__(f"Lost the lease on the ingestion job (job is now {state})")
+        self.state = state
+
+
+class IngestionQueue:
+    """
+    Durable queue of file ingestion jobs.
+    
+    Backed by a local SQLite database in WAL mode so the API process and any
+    number of worker processes on the same node can share it. A worker claims
+    a job by taking a time-limited lease; jobs whose lease expires (the worker
+    crashed or was redeployed) become claimable again. Failed attempts are
+    retried with exponential backoff until max_attempts is reached.
+    """
+    
+    def __init__(self, db_path: Path = None):
+        self.db_path = Path(db_path or config.INGESTION_QUEUE_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+    
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    folder_id TEXT NOT NULL,
+                    storage_path TEXT NOT NULL,
+                    original_filename TEXT,
+                    extraction_profile TEXT,
+                    source_file_id TEXT,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    run_after REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    last_error TEXT,
+                    chunk_count INTEGER,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # Queues created by earlier versions lack the newer columns
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            for column in ("extraction_profile", "source_file_id", "result"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_state ON ingestion_jobs(state, run_after)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_file ON ingestion_jobs(file_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_folder ON ingestion_jobs(folder_id)")
+    
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        return job
+    
+    def _fetch_one(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+    
+    def enqueue(
+        self,
+        file_id: str,
+        folder_id: str,
+        storage_path: str,
+        original_filename: str,
+        extraction_profile: Optional[str] = None,
+        source_file_id: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a file for ingestion; returns the existing job if one is already active for the file.
+        With source_file_id the job copies that identical file's vectors instead of processing the PDF.
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in ACTIVE_STATES)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT * FROM ingestion_jobs WHERE file_id = ? AND state IN ({placeholders}) ORDER BY created_at LIMIT 1",
+                (str(file_id), *ACTIVE_STATES)
+            ).fetchone()
+            if row:
+                return self._to_job(row)
+            
+            job_id = str(uuid.uuid4())
+            self._conn.execute("""
+                INSERT INTO ingestion_jobs (
+                    id, file_id, folder_id, storage_path, original_filename, extraction_profile, source_file_id, state,
+                    attempts, max_attempts, run_after, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?)
+            """, (
+                job_id, str(file_id), str(folder_id), storage_path, original_filename, extraction_profile,
+                source_file_id and str(source_file_id), QUEUED,
+                max_attempts or config.INGESTION_MAX_ATTEMPTS, now, now, now
+            ))
+            return self._fetch_one(job_id)
+    
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next runnable job for worker_id, or return None.
+        Running jobs whose lease has expired are picked up again.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            candidates = self._conn.execute("""
+                SELECT id, state, attempts, max_attempts FROM ingestion_jobs
+                WHERE (state IN (?, ?) AND run_after <= ?)
+                   OR (state = ? AND lease_expires_at < ?)
+                ORDER BY run_after, created_at
+                LIMIT 5
+            """, (QUEUED, RETRYING, now, RUNNING, now)).fetchall()
+            
+            for candidate in candidates:
+                if candidate["state"] == RUNNING and candidate["attempts"] >= candidate["max_attempts"]:
+                    # The worker died on its last attempt; do not let a job that crashes workers loop forever
+                    self._conn.execute("""
+                        UPDATE ingestion_jobs SET
+                            state = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL,
+                            finished_at = ?, updated_at = ?
+                        WHERE id = ? AND state = ? AND lease_expires_at < ?
+                    """, (FAILED, "Worker lease expired on the final attempt", now, now, candidate["id"], RUNNING, now))
+                    continue
+                
+                # Conditional update so two processes cannot claim the same job
+                claimed = self._conn.execute("""
+                    UPDATE ingestion_jobs SET
+                        state = ?,
+                        attempts = attempts + 1,
+                        lease_owner = ?,
+                        lease_expires_at = ?,
+                        started_at = ?,
+                        updated_at = ?
+                    WHERE id = ?
+                      AND ((state IN (?, ?) AND run_after <= ?) OR (state = ? AND lease_expires_at < ?))
+                """, (
+                    RUNNING, worker_id, now + lease_seconds, now, now, candidate["id"],
+                    QUEUED, RETRYING, now, RUNNING, now
+                )).rowcount
+                if claimed:
+                    return self._fetch_one(candidate["id"])
+        return None
+    
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease of a running job; False if the worker no longer owns it"""
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute("""
+                UPDATE ingestion_jobs SET lease_expires_at = ?, updated_at = ?
+                WHERE id = ? AND state = ? AND lease_owner = ?
+            """, (now + lease_seconds, now, job_id, RUNNING, worker_id)).rowcount == 1
+    
+    def lease_status(self, job_id: str, worker_id: str) -> Optional[str]:
+        """None while worker_id holds the job's lease, otherwise the job's current state"""
+        with self._lock:
+            row = self._conn.execute("SELECT state, lease_owner FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return CANCELLED
+        if row["state"] == RUNNING and row["lease_owner"] == worker_id:
+            return None
+        return row["state"]
+    
+    def complete(
+        self,
+        job_id: str,
+        worker_id: str,
+        chunk_count: Optional[int] = None,
+        result: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Mark a job succeeded, keeping its outcome (e.g. chunks added / removed / kept).
+        False if the worker no longer owns the job.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute("""
+                UPDATE ingestion_jobs SET
+                    state = ?, chunk_count = ?, result = ?, last_error = NULL,
+                    lease_owner = NULL, lease_expires_at = NULL,
+                    finished_at = ?, updated_at = ?
+                WHERE id = ? AND state = ? AND lease_owner = ?
+            """, (SUCCEEDED, chunk_count, json.dumps(result) if result else None, now, now, job_id, RUNNING, worker_id)).rowcount == 1
+    
+    def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        """Record a failed attempt; the job is retried with backoff until it runs out of attempts. Returns the new state."""
+        now = time.time()
+        with self._lock, self._conn:
+            job = self._fetch_one(job_id)
+            if job is None or job["lease_owner"] != worker_id:
+                return None
+            
+            if job["attempts"] >= job["max_attempts"]:
+                state, run_after, finished_at = FAILED, job["run_after"], now
+            else:
+                delay = min(
+                    config.INGESTION_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1)),
+                    config.INGESTION_RETRY_MAX_SECONDS
+                )
+                state, run_after, finished_at = RETRYING, now + delay, None
+            
+            self._conn.execute("""
+                UPDATE ingestion_jobs SET
+                    state = ?, run_after = ?, last_error = ?,
+                    lease_owner = NULL, lease_expires_at = NULL,
+                    finished_at = ?, updated_at = ?
+                WHERE id = ?
+            """, (state, run_after, error, finished_at, now, job_id))
+            return state
+    
+    def release(self, job_id: str, worker_id: str) -> None:
+        """Hand a running job back to the queue without counting the attempt (worker shutting down)"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                UPDATE ingestion_jobs SET
+                    state = ?, attempts = MAX(attempts - 1, 0), run_after = ?,
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE id = ? AND state = ? AND lease_owner = ?
+            """, (QUEUED, now, now, job_id, RUNNING, worker_id))
+    
+    def retry(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Requeue a failed or cancelled job with a fresh set of attempts. If another
+        job is already active for the file, that job is returned instead.
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in ACTIVE_STATES)
+        with self._lock, self._conn:
+            job = self._fetch_one(job_id)
+            if job is None or job["state"] not in (FAILED, CANCELLED):
+                return job
+            
+            row = self._conn.execute(
+                f"SELECT * FROM ingestion_jobs WHERE file_id = ? AND state IN ({placeholders}) ORDER BY created_at LIMIT 1",
+                (job["file_id"], *ACTIVE_STATES)
+            ).fetchone()
+            if row:
+                return self._to_job(row)
+            
+            self._conn.execute("""
+                UPDATE ingestion_jobs SET
+                    state = ?, attempts = 0, run_after = ?, last_error = NULL,
+                    finished_at = NULL, updated_at = ?
+                WHERE id = ? AND state IN (?, ?)
+            """, (QUEUED, now, now, job_id, FAILED, CANCELLED))
+            return self._fetch_one(job_id)
+    
+    def cancel_file_jobs(self, file_id: str) -> int:
+        """Cancel jobs for a file that have not started yet (e.g. the file was deleted)"""
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute("""
+                UPDATE ingestion_jobs SET state = ?, finished_at = ?, updated_at = ?
+                WHERE file_id = ? AND state IN (?, ?)
+            """, (CANCELLED, now, now, str(file_id), QUEUED, RETRYING)).rowcount
+    
+    def cancel_folder_jobs(self, folder_id: str) -> int:
+        """
+        Cancel every active job of a folder (its vectors are being deleted),
+        including running ones: their worker loses the lease, checks it before
+        writing vectors or the manifest, and abandons the job at the latest at
+        its next heartbeat.
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in ACTIVE_STATES)
+        with self._lock, self._conn:
+            return self._conn.execute(f"""
+                UPDATE ingestion_jobs SET
+                    state = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    finished_at = ?, updated_at = ?
+                WHERE folder_id = ? AND state IN ({placeholders})
+            """, (CANCELLED, now, now, str(folder_id), *ACTIVE_STATES)).rowcount
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._fetch_one(job_id)
+    
+    def list(
+        self,
+        state: Optional[str] = None,
+        folder_id: Optional[str] = None,
+        file_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally filtered"""
+        clauses, params = [], []
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        if folder_id:
+            clauses.append("folder_id = ?")
+            params.append(str(folder_id))
+        if file_id:
+            clauses.append("file_id = ?")
+            params.append(str(file_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM ingestion_jobs {where} ORDER BY created_at DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+    
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS count FROM ingestion_jobs GROUP BY state").fetchall()
+        return {row["state"]: row["count"] for row in rows}
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import Dict, Any, List, Optional
+
+from config import config
+from ingestion_queue import IngestionQueue, LeaseLostError, RETRYING
+
+
+class IngestionWorkerPool:
+    """
+    Pool of workers that drain the ingestion queue.
+    
+    Each worker claims one job at a time, keeps its lease alive while the file
+    is being indexed, and reports the outcome back to the queue. Queue writes
+    run in threads, so SQLite lock waits never block the event loop. The pool can
+    run inside the API process or on its own via `python ingestion_worker.py`.
+    """
+    
+    def __init__(
+        self,
+        queue: IngestionQueue,
+        concurrency: int = 2,
+        lease_seconds: float = 300,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._running_jobs: Dict[str, Optional[str]] = {}
+        self._stopping = False
+        self.completed = 0
+        self.failed = 0
+    
+    async def _heartbeat(self, job_id: str, worker_id: str, work: asyncio.Task) -> None:
+        """Keep the lease alive; if it was lost (reclaimed or cancelled), stop the work"""
+        while True:
+            await asyncio.sleep(max(1, self.lease_seconds / 3))
+            if not await asyncio.to_thread(self.queue.heartbeat, job_id, worker_id, self.lease_seconds):
+                print(f"[{worker_id}] Lost the lease on job {job_id}; abandoning it")
+                work.cancel()
+                return
+    
+    async def _process(self, job: Dict[str, Any], worker_id: str) -> Dict[str, Any]:
+        from dependencies import get_ingestion_service
+        
+        ingestion_service = get_ingestion_service()
+        # Checked before every vector and manifest write, so a cancelled job stops writing right away
+        lease_check = lambda: asyncio.to_thread(self.queue.lease_status, job["id"], worker_id)
+        if job.get("source_file_id"):
+            # Same contents as an already indexed file: copy its vectors
+            return await ingestion_service.clone_file(
+                source_file_id=job["source_file_id"],
+                file_id=job["file_id"],
+                folder_id=job["folder_id"],
+                storage_path=job["storage_path"],
+                original_filename=job["original_filename"],
+                extraction_profile=job.get("extraction_profile"),
+                lease_check=lease_check
+            )
+        return await ingestion_service.index_file(
+            file_id=job["file_id"],
+            folder_id=job["folder_id"],
+            storage_path=job["storage_path"],
+            original_filename=job["original_filename"],
+            extraction_profile=job.get("extraction_profile"),
+            lease_check=lease_check
+        )
+    
+    async def _run_job(self, job: Dict[str, Any], worker_id: str) -> None:
+        from dependencies import get_index_manifest
+        
+        job_id = job["id"]
+        print(f"[{worker_id}] Processing {job['original_filename']} (job {job_id}, attempt {job['attempts']}/{job['max_attempts']})")
+        work = asyncio.create_task(self._process(job, worker_id))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id, work))
+        try:
+            result = await work
+            if await asyncio.to_thread(self.queue.complete, job_id, worker_id, result["chunk_count"], result):
+                self.completed += 1
+            else:
+                print(f"[{worker_id}] Finished {job['original_filename']} after losing the lease on job {job_id}; not completing it")
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                # Cancelled from outside (shutdown), not by a lost lease
+                raise
+        except LeaseLostError as e:
+            print(f"[{worker_id}] Stopped {job['original_filename']}: {e}")
+        except Exception as e:
+            state = await asyncio.to_thread(self.queue.fail, job_id, worker_id, str(e))
+            self.failed += 1
+            print(f"[{worker_id}] Error processing {job['original_filename']}: {e} (job is now {state})")
+            if state == RETRYING:
+                # The manifest shows the file as waiting again rather than failed
+                await asyncio.to_thread(get_index_manifest().mark_pending, job["file_id"], job["folder_id"])
+        finally:
+            heartbeat.cancel()
+    
+    async def _worker_loop(self, index: int) -> None:
+        worker_id = f"{self.name}-{index}"
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"[{worker_id}] Failed to claim a job: {e}")
+                job = None
+            
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            
+            self._running_jobs[worker_id] = job["id"]
+            try:
+                await self._run_job(job, worker_id)
+            except asyncio.CancelledError:
+                # Shutting down mid-job: give it back so another worker picks it up straight away
+                await asyncio.to_thread(self.queue.release, job["id"], worker_id)
+                raise
+            finally:
+                self._running_jobs[worker_id] = None
+    
+    def start(self) -> None:
+        """Start the workers on the running event loop"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker_loop(i)) for i in range(self.concurrency)]
+        print(f"Started {self.concurrency} ingestion workers ({self.name})")
+    
+    async def stop(self) -> None:
+        """Cancel the workers; jobs that were mid-flight are released back to the queue"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "running_jobs": {worker: job for worker, job in self._running_jobs.items() if job},
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+
+def create_worker_pool(queue: IngestionQueue, concurrency: Optional[int] = None) -> IngestionWorkerPool:
+    return IngestionWorkerPool(
+        queue,
+        concurrency=concurrency or config.INGESTION_WORKERS,
+        lease_seconds=config.INGESTION_LEASE_SECONDS,
+        poll_interval=config.INGESTION_POLL_INTERVAL_SECONDS
+    )
+
+
+async def _run_standalone(concurrency: Optional[int]) -> None:
+    from dependencies import get_ingestion_queue, get_async_qdrant_client
+    from executors import shutdown_executors
+    from pdf_extraction import shutdown_extraction_pool
+    
+    pool = create_worker_pool(get_ingestion_queue(), concurrency)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    
+    pool.start()
+    await stop.wait()
+    print("Stopping ingestion workers...")
+    await pool.stop()
+    if get_async_qdrant_client() is not None:
+        await get_async_qdrant_client().close()
+    shutdown_executors()
+    shutdown_extraction_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run ingestion workers outside the API process")
+    parser.add_argument("--workers", type=int, default=None, help="Number of concurrent workers (default: INGESTION_WORKERS)")
+    args = parser.parse_args()
+    asyncio.run(_run_standalone(args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+import google.generativeai as genai
+import httpx
+
+from config import config
+
+
+class OllamaClient:
+    """
+    Shared async HTTP client for the local Ollama server.
+    
+    Connections are pooled and kept alive between requests, every call has
+    connect/read deadlines, and a semaphore caps how many generations run at
+    once so a slow local model queues callers instead of piling up requests.
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_connections: int = 10,
+        max_concurrency: int = 4
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0
+        )
+        self.max_concurrency = max_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+    
+    async def _acquire(self) -> None:
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+    
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._semaphore.release()
+    
+    async def chat(self, messages: List[Dict[str, str]]) -> str:
+        """Send a chat request and return the full answer"""
+        client = self._get_client()
+        await self._acquire()
+        try:
+            response = await client.post(
+                "/api/chat",
+                json={"model": self.model, "messages": messages, "stream": False}
+            )
+        finally:
+            self._release()
+        
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+        return response.json().get("message", {}).get("content", "No response generated")
+    
+    @asynccontextmanager
+    async def _slot(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+    
+    async def stream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Send a chat request and yield the answer as it is generated.
+        The HTTP stream is read by a separate task that holds the concurrency
+        slot only while Ollama is generating, so a consumer that stops
+        iterating (e.g. a disconnected SSE client) does not keep the slot.
+        """
+        client = self._get_client()
+        chunks: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(self._read_stream(client, messages, chunks))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            reader.cancel()
+    
+    async def _read_stream(self, client: httpx.AsyncClient, messages: List[Dict[str, str]], chunks: asyncio.Queue) -> None:
+        """Put the generated text on chunks, then None when done or the error that ended the stream"""
+        try:
+            async with self._slot():
+                async with client.stream(
+                    "POST",
+                    "/api/chat",
+                    json={"model": self.model, "messages": messages, "stream": True}
+                ) as response:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        raise Exception(f"Ollama API error: {response.status_code} - {body.decode(errors='replace')}")
+                    lines = response.aiter_lines()
+                    while True:
+                        try:
+                            # Each line must arrive within the read timeout, so a stalled generation gives the slot back
+                            line = await asyncio.wait_for(lines.__anext__(), timeout=self.timeout.read)
+                        except StopAsyncIteration:
+                            break
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        content = data.get("message", {}).get("content")
+                        if content:
+                            chunks.put_nowait(content)
+                        if data.get("done"):
+                            break
+        except asyncio.TimeoutError:
+            chunks.put_nowait(Exception(f"Ollama stream stalled: no data within {self.timeout.read}s"))
+            return
+        except Exception as e:
+            chunks.put_nowait(e)
+            return
+        chunks.put_nowait(None)
+    
+    async def check_availability(self) -> bool:
+        """Check if Ollama is running and model is available"""
+        client = self._get_client()
+        probe_timeout = httpx.Timeout(5.0, connect=self.timeout.connect)
+        try:
+            # First check if Ollama is running
+            response = await client.get("/api/version", timeout=probe_timeout)
+            if response.status_code != 200:
+                print("Ollama is not running")
+                return False
+            
+            # Check if the specific model is available
+            response = await client.get("/api/tags", timeout=probe_timeout)
+            if response.status_code != 200:
+                return False
+            
+            models = response.json().get('models', [])
+            model_names = [model.get('name', '') for model in models]
+            
+            # Check for exact match or base model match
+            base_model = self.model.split(':')[0]
+            model_exists = any(
+                name == self.model or name.startswith(f"{base_model}:")
+                for name in model_names
+            )
+            
+            if not model_exists:
+                print(f"Ollama model {self.model} is not pulled. Available models: {model_names}")
+                print(f"Please run: ollama pull {self.model}")
+                return False
+            
+            # Test the model with a simple request
+            await self._acquire()
+            try:
+                test_response = await client.post(
+                    "/api/generate",
+                    json={"model": self.model, "prompt": "Hi", "stream": False},
+                    timeout=httpx.Timeout(10.0, connect=self.timeout.connect)
+                )
+            finally:
+                self._release()
+            
+            if test_response.status_code == 200:
+                return True
+            print(f"Ollama model test failed: {test_response.status_code} - {test_response.text}")
+            return False
+        except httpx.ConnectError:
+            print(f"Cannot connect to Ollama at {self.base_url}. Make sure Ollama is running.")
+            return False
+        except Exception as e:
+            print(f"Ollama availability check failed: {e}")
+            return False
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "connect_timeout": self.timeout.connect,
+            "read_timeout": self.timeout.read
+        }
+    
+    async def aclose(self) -> None:
+        """Close pooled connections (called on application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class GeminiClient:
+    """
+    Async wrapper around a Gemini GenerativeModel.
+
+    Uses the SDK's native async generation so a slow response only holds its
+    own request, with a deadline on every call and a cap on how many
+    generations are in flight at once.
+    """
+    
+    def __init__(self, model, timeout_seconds: float = 30.0, max_concurrency: int = 8):
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._timeouts = 0
+    
+    async def generate(self, prompt: str) -> str:
+        """Generate a full answer, failing after timeout_seconds"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt),
+                    timeout=self.timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise Exception(f"Gemini did not respond within {self.timeout_seconds}s")
+            finally:
+                self._in_flight -= 1
+        return response.text
+    
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the answer as it is generated; each chunk must arrive within timeout_seconds"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, stream=True),
+                    timeout=self.timeout_seconds
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout_seconds)
+                    except StopAsyncIteration:
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                        continue
+                    if text:
+                        yield text
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise Exception(f"Gemini did not respond within {self.timeout_seconds}s")
+            finally:
+                self._in_flight -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "timeouts": self._timeouts,
+            "timeout_seconds": self.timeout_seconds
+        }
+
+
+async def check_gemini_availability(api_key: Optional[str], model_name: str, timeout_seconds: float = 10.0) -> bool:
+    """Check if the Gemini API key is valid and a generation model answers"""
+    if not api_key:
+        return False
+    
+    try:
+        genai.configure(api_key=api_key)
+        # The SDK has no async model listing; keep it off the event loop and bounded
+        models = await asyncio.wait_for(asyncio.to_thread(lambda: list(genai.list_models())), timeout=timeout_seconds)
+        available_models = [m.name for m in models if 'generateContent' in m.supported_generation_methods]
+        print(f"Available Gemini models: {available_models}")
+        
+        # Check if our configured model is available
+        if f"models/{model_name}" not in available_models:
+            print(f"Warning: Configured model {model_name} not available.")
+            print(f"Available models: {', '.join([m.replace('models/', '') for m in available_models])}")
+            if not available_models:
+                return False
+            # Try with the first available model
+            model_name = available_models[0].replace('models/', '')
+            print(f"Trying with {model_name}")
+        
+        # Test the model
+        model = genai.GenerativeModel(model_name)
+        await asyncio.wait_for(model.generate_content_async("Hello"), timeout=timeout_seconds)
+        return True
+    except asyncio.TimeoutError:
+        print(f"Gemini API check timed out after {timeout_seconds}s")
+        return False
+    except Exception as e:
+        print(f"Gemini API error: {e}")
+        return False
+
+
+def create_ollama_client() -> OllamaClient:
+    return OllamaClient(
+        base_url=config.OLLAMA_BASE_URL,
+        model=config.OLLAMA_MODEL,
+        connect_timeout=config.OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=config.OLLAMA_READ_TIMEOUT,
+        max_connections=config.OLLAMA_MAX_CONNECTIONS,
+        max_concurrency=config.OLLAMA_MAX_CONCURRENCY
+    )
+
+
+def create_gemini_client(model) -> GeminiClient:
+    return GeminiClient(
+        model,
+        timeout_seconds=config.GEMINI_TIMEOUT_SECONDS,
+        max_concurrency=config.GEMINI_MAX_CONCURRENCY
+    )
@@ -1,44 +1,16 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+# Entry point: `python main.py` or `uvicorn main:app`.
+# Kept free of imports: spawned PDF extraction processes re-import the __main__ script,
+# and must not load the API, torch and langchain each time. The app lives in api.py.
 
-# Import routers
-from routers import folders, files, chat, health, sessions, debug
-from routers.debug import router as debug_router
 
-# Initialize FastAPI app
-app = FastAPI(title="Folder File Management API")
+def __getattr__(name):
+    # `uvicorn main:app` looks the app up as an attribute of this module
+    if name == "app":
+        from api import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Your Next.js frontend
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Root endpoint
-@app.get("/")
-async def root():
-    return {"message": "Folder File Management API"}
-
-# Include routers
-app.include_router(folders.router)
-app.include_router(files.router)
-app.include_router(chat.router)
-app.include_router(health.router)
-app.include_router(sessions.router)
-app.include_router(debug_router)
-
-
-@app.get("/")
-async def root():
-    return {"message": "AI Chat PDF API is running"}
-
-@app.get("/api/health")
-async def health_check():
-    return {"status": "healthy", "message": "API is running"}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run("api:app", host="0.0.0.0", port=8000)
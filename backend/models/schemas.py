@@ -15,6 +15,10 @@ class FolderUpdate(BaseModel):
     parent_id: Optional[UUID4] = None
 
 
+class FolderExtractionProfile(BaseModel):
+    extraction_profile: Optional[str] = None
+
+
 class FolderResponse(BaseModel):
     id: UUID4
     name: str
@@ -41,14 +45,10 @@ class ChatRequest(BaseModel):
     folder_id: UUID4
 
 
-class ChatResponse(BaseModel):
-    response: str
-    sources: List[str] = [] 
-    
-
 class ChatResponse(BaseModel):
     response: str
     sources: List[str] = []
+    model: Optional[str] = None
 
 
 class SessionCreate(BaseModel):
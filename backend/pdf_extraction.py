@@ -0,0 +1,203 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Tuple, Optional, Union
+
+import fitz  # PyMuPDF
+
+from config import config
+
+# Spawned extraction processes import this module, and the parent's __main__ script, on start-up:
+# keep both free of heavy imports (the API app lives in api.py, main.py only launches it)
+
+# Extraction profiles: how much work goes into table detection
+FAST = "fast"          # never look for tables
+STANDARD = "standard"  # only on pages a cheap heuristic flags
+FULL = "full"          # on every page
+EXTRACTION_PROFILES = (FAST, STANDARD, FULL)
+
+# Two or more column gaps (tab or a run of spaces) between words on one line
+_ALIGNED_LINE = re.compile(r"\S(?:\t| {3,})\S.*\S(?:\t| {3,})\S")
+
+# A PDF held in memory, or a path on disk
+PdfSource = Union[bytes, bytearray, str]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _count_ruling_lines(page) -> Tuple[int, int]:
+    """Horizontal and vertical rules drawn on the page (lines and hairline rectangles)"""
+    min_length = page.rect.width * 0.1
+    horizontal = vertical = 0
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                start, end = item[1], item[2]
+                if abs(start.y - end.y) < 1 and abs(start.x - end.x) >= min_length:
+                    horizontal += 1
+                elif abs(start.x - end.x) < 1 and abs(start.y - end.y) >= min_length:
+                    vertical += 1
+            elif item[0] == "re":
+                rect = item[1]
+                if rect.height < 2 and rect.width >= min_length:
+                    horizontal += 1
+                elif rect.width < 2 and rect.height >= min_length:
+                    vertical += 1
+    return horizontal, vertical
+
+
+def _likely_has_tables(page, text: str) -> bool:
+    """Cheap check for table-like pages: tab/column-aligned text lines or a grid of ruling lines"""
+    aligned_lines = sum(1 for line in text.splitlines() if _ALIGNED_LINE.search(line))
+    if aligned_lines >= 3:
+        return True
+    horizontal, vertical = _count_ruling_lines(page)
+    return horizontal >= 3 or (horizontal >= 2 and vertical >= 2)
+
+
+def _extract_page(page, profile: str = STANDARD) -> Tuple[str, List[str], bool, bool]:
+    """
+    Layout-preserving text and any tables found on one page, plus whether the
+    raw reading order was used and whether table detection ran
+    """
+    text = page.get_text("text", sort=True)
+    
+    # Layout sorting can lose text on unusual pages; only near-empty pages pay for a second read
+    used_raw_order = False
+    if len(text.strip()) < config.PDF_MIN_PAGE_TEXT_CHARS:
+        raw_text = page.get_text("text")
+        if len(raw_text.strip()) > len(text.strip()):
+            text = raw_text
+            used_raw_order = True
+    
+    # find_tables is by far the most expensive call, so the profile decides when it runs
+    scan_tables = profile == FULL or (profile == STANDARD and _likely_has_tables(page, text))
+    
+    tables = []
+    if scan_tables:
+        try:
+            for tab in page.find_tables():
+                table_text = "\n".join(["\t".join(row) for row in tab.extract()])
+                tables.append(table_text)
+        except:
+            pass
+    
+    return text, tables, used_raw_order, scan_tables
+
+
+def _extract_doc_pages(doc, start: int, end: int, profile: str) -> List[Dict[str, Any]]:
+    pages = []
+    for page_num in range(start, min(end, doc.page_count)):
+        page = doc[page_num]
+        text, tables, used_raw_order, table_scan = _extract_page(page, profile)
+        page_text = text
+        if tables:
+            page_text += "\n\nTables:\n" + "\n\n".join(tables)
+        pages.append({
+            "page": page_num + 1,
+            "text": page_text,
+            "has_tables": len(tables) > 0,
+            # Per-page quality signals: little or no text layer usually means a scanned page
+            "low_text": len(text.strip()) < config.PDF_MIN_PAGE_TEXT_CHARS,
+            "has_images": bool(page.get_images()),
+            "raw_order": used_raw_order,
+            "table_scan": table_scan
+        })
+    return pages
+
+
+def _open(source: PdfSource):
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def extract_page_range(source: PdfSource, start: int, end: int, profile: str = STANDARD) -> List[Dict[str, Any]]:
+    """Extract pages [start, end) of a PDF; runs in an extraction process"""
+    doc = _open(source)
+    try:
+        return _extract_doc_pages(doc, start, end, profile)
+    finally:
+        doc.close()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the parent runs threads (and torch) that must not be forked
+            _pool = ProcessPoolExecutor(
+                max_workers=config.PDF_EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the extraction processes (called on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def resolve_profile(profile: Optional[str]) -> str:
+    """The given profile, or the configured default when none is set"""
+    profile = (profile or config.PDF_EXTRACTION_PROFILE).lower()
+    if profile not in EXTRACTION_PROFILES:
+        raise ValueError(f"Unknown extraction profile '{profile}'. Use one of: {', '.join(EXTRACTION_PROFILES)}")
+    return profile
+
+
+def extract_pages(source: PdfSource, profile: str = STANDARD) -> List[Dict[str, Any]]:
+    """
+    Per-page text of a PDF in page order. Large documents are split into
+    page ranges that are extracted in parallel by a pool of processes, since
+    PyMuPDF work is CPU-bound and threads would serialize on the GIL.
+    In-memory sources are spooled to a temporary file first, so the
+    extraction processes receive a path rather than a copy of the PDF each.
+    """
+    doc = _open(source)
+    try:
+        page_count = doc.page_count
+        workers = config.PDF_EXTRACTION_PROCESSES
+        if workers <= 1 or page_count < config.PDF_PARALLEL_MIN_PAGES:
+            # Small documents are read in this single open
+            return _extract_doc_pages(doc, 0, page_count, profile)
+    finally:
+        doc.close()
+    
+    spool_path = None
+    if not isinstance(source, str):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=config.PDF_SPOOL_DIR) as spool:
+            spool.write(source)
+        spool_path = source = spool.name
+    
+    # A few ranges per worker so one slow range does not leave the others idle
+    ranges = _page_ranges(page_count, workers * 2)
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(extract_page_range, source, start, end, profile) for start, end in ranges]
+        pages = []
+        # Collect in submission order, which is page order
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool as e:
+        print(f"PDF extraction pool failed ({e}); extracting in-process")
+        shutdown_extraction_pool()
+        return extract_page_range(source, 0, page_count, profile)
+    finally:
+        if spool_path is not None:
+            os.unlink(spool_path)
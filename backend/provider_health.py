@@ -0,0 +1,144 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, List, Union, Awaitable
+
+
+# Routing priority used by smart chat
+PROVIDER_PRIORITY = ["openai", "gemini", "ollama"]
+
+
+class ProviderHealthRegistry:
+    """
+    In-memory availability of the LLM providers.
+
+    Routing decisions read from memory. Entries are refreshed by a background
+    task once they are older than the TTL, and are also updated passively from
+    the outcome of real chat calls, so providers that are in active use are
+    rarely probed at all. Without chat traffic the background task does not
+    probe.
+    """
+    
+    def __init__(self, checks: Dict[str, Callable[[], Union[bool, Awaitable[bool]]]], ttl_seconds: int = 300):
+        self.checks = checks
+        self.ttl_seconds = ttl_seconds
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"available": None, "checked_at": None, "last_error": None, "source": None}
+            for name in checks
+        }
+        # Last time routing asked for providers; the background loop stays idle without traffic
+        self._last_used: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+    
+    def _set_status(self, name: str, available: bool, source: str, error: Optional[str] = None):
+        self._status[name] = {
+            "available": available,
+            "checked_at": time.time(),
+            "last_error": error,
+            "source": source
+        }
+    
+    def _is_stale(self, name: str) -> bool:
+        checked_at = self._status[name]["checked_at"]
+        return checked_at is None or time.time() - checked_at > self.ttl_seconds
+    
+    def _stale_providers(self) -> List[str]:
+        return [name for name in self.checks if self._is_stale(name)]
+    
+    async def _run_check(self, name: str) -> None:
+        """Run one probe and store its result; blocking probes run in a thread"""
+        check = self.checks[name]
+        try:
+            if asyncio.iscoroutinefunction(check):
+                available = await check()
+            else:
+                available = await asyncio.to_thread(check)
+            self._set_status(name, bool(available), "probe")
+        except Exception as e:
+            self._set_status(name, False, "probe", str(e))
+    
+    async def refresh(self, providers: Optional[List[str]] = None) -> None:
+        """Probe providers concurrently without blocking the event loop"""
+        names = providers or list(self.checks)
+        await asyncio.gather(*(self._run_check(name) for name in names))
+    
+    async def ensure_fresh(self) -> None:
+        """
+        Make sure routing has something to go on. Only the very first call
+        waits for probes; afterwards stale entries are refreshed in the
+        background while the current answer is served from memory.
+        """
+        self._last_used = time.time()
+        never_checked = [name for name in self.checks if self._status[name]["checked_at"] is None]
+        if never_checked:
+            await self.refresh(never_checked)
+            return
+        
+        stale = self._stale_providers()
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh(stale))
+    
+    def record_success(self, name: str) -> None:
+        """Passive update from a real call that succeeded"""
+        self._last_used = time.time()
+        if name in self._status:
+            self._set_status(name, True, "call")
+    
+    def record_failure(self, name: str, error: Any = None) -> None:
+        """Passive update from a real call that failed; stays down until the next refresh"""
+        self._last_used = time.time()
+        if name in self._status:
+            self._set_status(name, False, "call", str(error) if error is not None else None)
+    
+    def is_available(self, name: str) -> bool:
+        return bool(self._status.get(name, {}).get("available"))
+    
+    def best_provider(self) -> str:
+        """First available provider in priority order, answered from memory"""
+        for name in PROVIDER_PRIORITY:
+            if self.is_available(name):
+                return name
+        return "unavailable"
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current state of every provider, with timestamps in ISO format"""
+        result = {}
+        for name, status in self._status.items():
+            checked_at = status["checked_at"]
+            result[name] = {
+                **status,
+                "checked_at": datetime.utcfromtimestamp(checked_at).isoformat() if checked_at else None
+            }
+        return result
+    
+    def _recently_used(self) -> bool:
+        return self._last_used is not None and time.time() - self._last_used <= self.ttl_seconds
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                # Probes are only worth it while chat requests are coming in
+                stale = self._stale_providers() if self._recently_used() else []
+                if stale:
+                    await self.refresh(stale)
+            except Exception as e:
+                print(f"Provider health refresh failed: {e}")
+            await asyncio.sleep(max(1, self.ttl_seconds // 2))
+    
+    def start(self) -> None:
+        """Start the background refresh task on the running event loop"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        """Cancel the background refresh task"""
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._background_task = None
+        self._refresh_task = None
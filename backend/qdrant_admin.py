@@ -0,0 +1,463 @@
+import argparse
+import random
+import re
+import time
+from typing import Dict, Any, List, Optional
+
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import (
+    CollectionStatus,
+    Datatype,
+    Disabled,
+    Distance,
+    FieldCondition,
+    Filter,
+    HnswConfigDiff,
+    KeywordIndexParams,
+    KeywordIndexType,
+    MatchValue,
+    OptimizersConfigDiff,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff
+)
+
+from config import config
+
+# Folder id with the dashes removed, appended to the base collection name in "collection" partitioning
+_FOLDER_SUFFIX = re.compile(r"_[0-9a-f]{32}$")
+
+
+def create_client() -> QdrantClient:
+    """Sync client, used for collection setup and admin commands, and for all vector I/O without QDRANT_ASYNC_CLIENT"""
+    return QdrantClient(
+        host=config.QDRANT_HOST,
+        port=config.QDRANT_PORT,
+        grpc_port=config.QDRANT_GRPC_PORT,
+        prefer_grpc=config.QDRANT_PREFER_GRPC,
+        api_key=config.QDRANT_API_KEY,
+        timeout=int(config.QDRANT_WRITE_TIMEOUT_SECONDS)
+    )
+
+
+def create_async_client() -> AsyncQdrantClient:
+    """Async client shared by the whole process: one gRPC channel or one pooled HTTP client"""
+    rest_options = {}
+    if not config.QDRANT_PREFER_GRPC:
+        rest_options["limits"] = httpx.Limits(
+            max_connections=config.QDRANT_MAX_CONNECTIONS,
+            max_keepalive_connections=config.QDRANT_MAX_CONNECTIONS
+        )
+    return AsyncQdrantClient(
+        host=config.QDRANT_HOST,
+        port=config.QDRANT_PORT,
+        grpc_port=config.QDRANT_GRPC_PORT,
+        prefer_grpc=config.QDRANT_PREFER_GRPC,
+        api_key=config.QDRANT_API_KEY,
+        timeout=int(config.QDRANT_WRITE_TIMEOUT_SECONDS),
+        **rest_options
+    )
+
+
+def collection_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Settings of a collection profile (the configured one by default) with the env overrides applied"""
+    name = (name or config.QDRANT_COLLECTION_PROFILE).lower()
+    if name not in config.QDRANT_COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}'. Use one of: {', '.join(config.QDRANT_COLLECTION_PROFILES)}")
+    
+    profile = dict(config.QDRANT_COLLECTION_PROFILES[name])
+    overrides = {
+        "hnsw_m": config.QDRANT_HNSW_M,
+        "hnsw_ef_construct": config.QDRANT_HNSW_EF_CONSTRUCT,
+        "hnsw_ef": config.QDRANT_SEARCH_HNSW_EF
+    }
+    profile.update({key: value for key, value in overrides.items() if value is not None})
+    if config.QDRANT_PARTITIONING == "tenant":
+        # Every query filters by folder, so build per-folder graphs only instead of one global graph
+        profile["hnsw_payload_m"] = profile.get("hnsw_m") or 16
+        profile["hnsw_m"] = 0
+    profile["name"] = name
+    return profile
+
+
+def folder_collection_name(folder_id: str, base: str = None) -> str:
+    """Collection that holds one folder's vectors in "collection" partitioning"""
+    return f"{base or config.QDRANT_COLLECTION_NAME}_{str(folder_id).replace('-', '').lower()}"
+
+
+def list_folder_collections(client: QdrantClient, base: str = None) -> List[str]:
+    prefix = base or config.QDRANT_COLLECTION_NAME
+    return [
+        collection.name for collection in client.get_collections().collections
+        if collection.name.startswith(prefix) and _FOLDER_SUFFIX.fullmatch(collection.name[len(prefix):])
+    ]
+
+
+def vectors_config(profile: Dict[str, Any], size: int) -> VectorParams:
+    return VectorParams(
+        size=size,
+        distance=Distance.COSINE,
+        on_disk=profile.get("on_disk"),
+        datatype=Datatype.FLOAT16 if profile.get("datatype") == "float16" else None
+    )
+
+
+def hnsw_config(profile: Dict[str, Any]) -> Optional[HnswConfigDiff]:
+    if not any(key in profile for key in ("hnsw_m", "hnsw_ef_construct", "hnsw_on_disk", "hnsw_payload_m")):
+        return None
+    return HnswConfigDiff(
+        m=profile.get("hnsw_m"),
+        ef_construct=profile.get("hnsw_ef_construct"),
+        on_disk=profile.get("hnsw_on_disk"),
+        payload_m=profile.get("hnsw_payload_m")
+    )
+
+
+def optimizers_config(profile: Dict[str, Any]) -> Optional[OptimizersConfigDiff]:
+    if not any(key in profile for key in ("indexing_threshold", "memmap_threshold")):
+        return None
+    return OptimizersConfigDiff(
+        indexing_threshold=profile.get("indexing_threshold"),
+        memmap_threshold=profile.get("memmap_threshold")
+    )
+
+
+def quantization_config(profile: Dict[str, Any]) -> Optional[ScalarQuantization]:
+    if profile.get("quantization") != "int8":
+        return None
+    return ScalarQuantization(scalar=ScalarQuantizationConfig(
+        type=ScalarType.INT8,
+        quantile=0.99,
+        always_ram=profile.get("quantization_always_ram", True)
+    ))
+
+
+def search_params(profile: Dict[str, Any]) -> Optional[SearchParams]:
+    """Per-query parameters of a profile: HNSW search width and quantized re-scoring"""
+    quantization = None
+    if profile.get("quantization"):
+        quantization = QuantizationSearchParams(
+            rescore=profile.get("rescore", True),
+            oversampling=profile.get("oversampling")
+        )
+    if profile.get("hnsw_ef") is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=profile.get("hnsw_ef"), quantization=quantization)
+
+
+def create_collection(client: QdrantClient, collection_name: str, profile: Dict[str, Any], size: int = None) -> None:
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config(profile, size or config.EMBEDDING_DIMENSION),
+        hnsw_config=hnsw_config(profile),
+        optimizers_config=optimizers_config(profile),
+        quantization_config=quantization_config(profile)
+    )
+
+
+def check_payload_indexes(client: QdrantClient, collection_name: str) -> Dict[str, List[str]]:
+    """Which of the configured filter fields have a keyword payload index and which are missing"""
+    payload_schema = client.get_collection(collection_name).payload_schema or {}
+    indexed, missing = [], []
+    for field in config.QDRANT_PAYLOAD_INDEXES:
+        schema = payload_schema.get(f"metadata.{field}")
+        ok = schema is not None and schema.data_type == PayloadSchemaType.KEYWORD
+        if ok and _is_tenant_field(field):
+            ok = bool(getattr(schema.params, "is_tenant", False))
+        (indexed if ok else missing).append(field)
+    return {"indexed": indexed, "missing": missing}
+
+
+def _is_tenant_field(field: str) -> bool:
+    return field == "folder_id" and config.QDRANT_PARTITIONING == "tenant"
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str) -> List[str]:
+    """
+    Create the missing keyword payload indexes; returns the fields that were added.
+    On an existing collection Qdrant builds them in the background. In
+    "tenant" partitioning folder_id is indexed as the tenant key, which makes
+    Qdrant store each folder's vectors together.
+    """
+    created = []
+    for field in check_payload_indexes(client, collection_name)["missing"]:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=f"metadata.{field}",
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True)
+                if _is_tenant_field(field) else PayloadSchemaType.KEYWORD,
+            wait=False
+        )
+        created.append(field)
+    if created:
+        print(f"Created Qdrant payload indexes on {', '.join(created)} ({collection_name})")
+    return created
+
+
+def copy_points(client: QdrantClient, source: str, target: str) -> int:
+    """Copy all points (vectors and payloads) between collections in batches; returns the number copied"""
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=256,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[PointStruct(id=point.id, vector=point.vector, payload=point.payload or {}) for point in points],
+                wait=True
+            )
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def _wait_until_indexed(client: QdrantClient, collection_name: str, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while client.get_collection(collection_name).status != CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection_name} is still optimizing after {timeout:.0f}s")
+        time.sleep(1)
+
+
+def migrate(client: QdrantClient, profile: Dict[str, Any], collection_name: str = None, target: str = None) -> None:
+    """
+    Apply a profile to an existing collection. HNSW, quantization, optimizer
+    and on-disk settings are updated in place (Qdrant rebuilds in the
+    background). The vector datatype cannot be changed in place, so that
+    needs a target collection that the points are copied into.
+    """
+    collection_name = collection_name or config.QDRANT_COLLECTION_NAME
+    info = client.get_collection(collection_name)
+    current_datatype = getattr(info.config.params.vectors, "datatype", None) or Datatype.FLOAT32
+    wanted_datatype = Datatype.FLOAT16 if profile.get("datatype") == "float16" else Datatype.FLOAT32
+    
+    if current_datatype != wanted_datatype or target:
+        if not target:
+            raise ValueError(
+                f"{collection_name} stores {current_datatype.value} vectors and profile '{profile['name']}' uses "
+                f"{wanted_datatype.value}; pass --target to copy into a new collection"
+            )
+        create_collection(client, target, profile, info.config.params.vectors.size)
+        ensure_payload_indexes(client, target)
+        copied = copy_points(client, collection_name, target)
+        print(f"Copied {copied} points from {collection_name} into {target} ({profile['name']} profile)")
+        print(f"Set QDRANT_COLLECTION_NAME={target} and QDRANT_COLLECTION_PROFILE={profile['name']} to switch over")
+        return
+    
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": VectorParamsDiff(on_disk=bool(profile.get("on_disk")))},
+        hnsw_config=hnsw_config(profile),
+        optimizers_config=optimizers_config(profile),
+        quantization_config=quantization_config(profile) or Disabled.DISABLED
+    )
+    ensure_payload_indexes(client, collection_name)
+    print(f"Applied the {profile['name']} profile to {collection_name}; Qdrant re-optimizes it in the background")
+
+
+def partition(client: QdrantClient, profile: Dict[str, Any], collection_name: str = None) -> Dict[str, int]:
+    """
+    Move the points of the shared collection into per-folder collections
+    (for switching to "collection" partitioning). Points are copied before
+    they are deleted, so an interrupted run can simply be started again.
+    """
+    collection_name = collection_name or config.QDRANT_COLLECTION_NAME
+    size = client.get_collection(collection_name).config.params.vectors.size
+    existing = set(list_folder_collections(client, collection_name))
+    moved: Dict[str, int] = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name, limit=256, offset=offset, with_payload=True, with_vectors=True
+        )
+        
+        by_folder: Dict[str, List[PointStruct]] = {}
+        for point in points:
+            folder_id = ((point.payload or {}).get("metadata") or {}).get("folder_id")
+            if folder_id:
+                # Points without a folder stay where they are
+                by_folder.setdefault(folder_id, []).append(
+                    PointStruct(id=point.id, vector=point.vector, payload=point.payload or {})
+                )
+        
+        for folder_id, folder_points in by_folder.items():
+            target = folder_collection_name(folder_id, collection_name)
+            if target not in existing:
+                create_collection(client, target, profile, size)
+                ensure_payload_indexes(client, target)
+                existing.add(target)
+            client.upsert(collection_name=target, points=folder_points, wait=True)
+            client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=[point.id for point in folder_points]),
+                wait=True
+            )
+            moved[folder_id] = moved.get(folder_id, 0) + len(folder_points)
+        
+        if offset is None:
+            return moved
+
+
+def benchmark(
+    client: QdrantClient,
+    profiles: List[str],
+    k: int = 10,
+    sample_size: int = 5000,
+    query_count: int = 100,
+    collection_name: str = None,
+    keep: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k and latency of each profile against exact search. A sample of
+    the collection is copied into one scratch collection per profile; the
+    ground truth is a brute-force cosine search over the same sample.
+    In "tenant" partitioning there is no global HNSW graph (m=0), so an
+    unfiltered query would be an exhaustive scan with perfect recall; every
+    query is then filtered by its folder, as in production, and the ground
+    truth is taken within that folder.
+    """
+    import numpy as np
+    
+    collection_name = collection_name or config.QDRANT_COLLECTION_NAME
+    by_tenant = config.QDRANT_PARTITIONING == "tenant"
+    points, _ = client.scroll(
+        collection_name=collection_name,
+        limit=sample_size,
+        with_payload=["metadata.folder_id"] if by_tenant else False,
+        with_vectors=True
+    )
+    folders = [((point.payload or {}).get("metadata") or {}).get("folder_id") for point in points]
+    if by_tenant:
+        points = [point for point, folder_id in zip(points, folders) if folder_id]
+        folders = [folder_id for folder_id in folders if folder_id]
+    if len(points) <= k:
+        raise ValueError(f"{collection_name} needs more than {k} points to benchmark")
+    
+    ids = [point.id for point in points]
+    matrix = np.asarray([point.vector for point in points], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    folder_array = np.asarray(folders, dtype=object)
+    query_rows = random.Random(0).sample(range(len(points)), min(query_count, len(points)))
+    truth = {}
+    for row in query_rows:
+        scores = matrix @ matrix[row]
+        if by_tenant:
+            scores = np.where(folder_array == folders[row], scores, -np.inf)
+        top = [i for i in np.argsort(-scores)[:k] if np.isfinite(scores[i])]
+        truth[row] = {ids[i] for i in top}
+    
+    results = []
+    for name in profiles:
+        profile = collection_profile(name)
+        scratch = f"{collection_name}_bench_{name}"
+        if client.collection_exists(scratch):
+            client.delete_collection(scratch)
+        # A low indexing threshold so the sample gets an HNSW graph instead of being searched exhaustively
+        create_collection(client, scratch, {**profile, "indexing_threshold": 1}, matrix.shape[1])
+        try:
+            if by_tenant:
+                ensure_payload_indexes(client, scratch)
+            client.upsert(
+                collection_name=scratch,
+                points=[
+                    PointStruct(
+                        id=point_id,
+                        vector=vector.tolist(),
+                        payload={"metadata": {"folder_id": folder_id}} if by_tenant else {}
+                    )
+                    for point_id, vector, folder_id in zip(ids, matrix, folders)
+                ],
+                wait=True
+            )
+            _wait_until_indexed(client, scratch)
+            
+            recalls, latencies = [], []
+            params = search_params(profile)
+            for row in query_rows:
+                query_filter = Filter(
+                    must=[FieldCondition(key="metadata.folder_id", match=MatchValue(value=folders[row]))]
+                ) if by_tenant else None
+                start = time.perf_counter()
+                response = client.query_points(
+                    collection_name=scratch, query=matrix[row].tolist(), query_filter=query_filter,
+                    limit=k, search_params=params
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len({point.id for point in response.points} & truth[row]) / len(truth[row]))
+            
+            latencies.sort()
+            results.append({
+                "profile": name,
+                "points": len(ids),
+                "queries": len(query_rows),
+                "filtered_by_folder": by_tenant,
+                f"recall@{k}": round(sum(recalls) / len(recalls), 4),
+                "p50_ms": round(latencies[len(latencies) // 2], 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2)
+            })
+        finally:
+            if not keep:
+                client.delete_collection(scratch)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Qdrant collection administration")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    migrate_parser = commands.add_parser("migrate", help="Apply a collection profile to an existing collection")
+    migrate_parser.add_argument("--profile", default=None, help="Profile to apply (default: QDRANT_COLLECTION_PROFILE)")
+    migrate_parser.add_argument("--collection", default=None, help="Collection to migrate (default: QDRANT_COLLECTION_NAME)")
+    migrate_parser.add_argument("--target", default=None, help="Copy into this new collection instead of updating in place")
+    
+    partition_parser = commands.add_parser("partition", help="Move the shared collection's points into per-folder collections")
+    partition_parser.add_argument("--collection", default=None, help="Collection to split (default: QDRANT_COLLECTION_NAME)")
+    
+    bench_parser = commands.add_parser("benchmark", help="Recall@k of each profile against exact search")
+    bench_parser.add_argument("--profiles", default=",".join(config.QDRANT_COLLECTION_PROFILES), help="Comma-separated profiles")
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--sample", type=int, default=5000, help="Points copied from the collection")
+    bench_parser.add_argument("--queries", type=int, default=100)
+    bench_parser.add_argument("--collection", default=None, help="Collection to sample (default: QDRANT_COLLECTION_NAME)")
+    bench_parser.add_argument("--keep", action="store_true", help="Keep the scratch collections")
+    
+    args = parser.parse_args()
+    from dependencies import _get_qdrant_client
+    client = _get_qdrant_client()
+    
+    if args.command == "migrate":
+        migrate(client, collection_profile(args.profile), args.collection, args.target)
+    elif args.command == "partition":
+        moved = partition(client, collection_profile(), args.collection)
+        print(f"Moved {sum(moved.values())} points into {len(moved)} folder collections")
+        print("Set QDRANT_PARTITIONING=collection to read from them")
+    else:
+        results = benchmark(
+            client,
+            [name.strip() for name in args.profiles.split(",") if name.strip()],
+            k=args.k,
+            sample_size=args.sample,
+            query_count=args.queries,
+            collection_name=args.collection,
+            keep=args.keep
+        )
+        for result in results:
+            print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
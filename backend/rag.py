@@ -1,7 +1,7 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from langchain_openai import ChatOpenAI
-from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 
@@ -33,6 +33,59 @@ class RAGChat:
         # Create document chain
         self.document_chain = create_stuff_documents_chain(self.llm, self.prompt)
     
+    @staticmethod
+    def _filter(folder_id: Optional[str], file_id: Optional[str]) -> Optional[Dict[str, str]]:
+        filter_dict = {}
+        if folder_id:
+            filter_dict["folder_id"] = folder_id
+        if file_id:
+            filter_dict["file_id"] = file_id
+        return filter_dict or None
+    
+    @staticmethod
+    def _history(chat_history: Optional[List[Dict[str, str]]]) -> List[Any]:
+        """Convert chat history to langchain format"""
+        messages = []
+        for msg in chat_history or []:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            else:
+                messages.append(AIMessage(content=msg["content"]))
+        return messages
+    
+    async def retrieve(
+        self,
+        message: str,
+        folder_id: Optional[str] = None,
+        file_id: Optional[str] = None,
+        k: int = 5
+    ) -> List[Document]:
+        """Relevant chunks for a question; vector store only, no LLM call"""
+        return await self.vector_store.similarity_search(message, k=k, filter_dict=self._filter(folder_id, file_id))
+    
+    async def answer(self, message: str, documents: List[Document], chat_history: List[Dict[str, str]] = None) -> str:
+        """Generate the answer from already retrieved chunks; the only step that calls OpenAI"""
+        return await self.document_chain.ainvoke({
+            "input": message,
+            "chat_history": self._history(chat_history),
+            "context": documents
+        })
+    
+    async def stream_answer(
+        self,
+        message: str,
+        documents: List[Document],
+        chat_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Like answer, yielding the text as it is generated"""
+        async for text in self.document_chain.astream({
+            "input": message,
+            "chat_history": self._history(chat_history),
+            "context": documents
+        }):
+            if text:
+                yield text
+    
     async def chat(
         self,
         message: str,
@@ -51,52 +104,19 @@ class RAGChat:
             file_id: Filter by specific file
             k: Number of relevant documents to retrieve
         """
-        # Build filter
-        filter_dict = {}
-        if folder_id:
-            filter_dict["folder_id"] = folder_id
-        if file_id:
-            filter_dict["file_id"] = file_id
-        
-        # Get retriever with filter
-        retriever = self.vector_store.get_retriever(
-            search_kwargs={
-                "k": k,
-                "filter": {"must": [
-                    {"key": f"metadata.{key}", "match": {"value": value}}
-                    for key, value in filter_dict.items()
-                ]} if filter_dict else None
-            }
-        )
-        
-        # Create retrieval chain
-        retrieval_chain = create_retrieval_chain(retriever, self.document_chain)
-        
-        # Convert chat history to langchain format
-        messages = []
-        if chat_history:
-            for msg in chat_history:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                else:
-                    messages.append(AIMessage(content=msg["content"]))
-        
-        # Invoke chain
-        response = await retrieval_chain.ainvoke({
-            "input": message,
-            "chat_history": messages
-        })
+        documents = await self.retrieve(message, folder_id=folder_id, file_id=file_id, k=k)
+        answer = await self.answer(message, documents, chat_history)
         
         # Format response
         sources = []
-        for doc in response.get("context", []):
+        for doc in documents:
             sources.append({
                 "content": doc.page_content[:200] + "...",  # Preview
                 "metadata": doc.metadata
             })
         
         return {
-            "answer": response["answer"],
+            "answer": answer,
             "sources": sources,
             "question": message
         }
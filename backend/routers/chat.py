@@ -1,14 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, AsyncIterator, Dict, Any
+import json
 from pydantic import UUID4
 from models.schemas import ChatRequest, ChatResponse, FileResponse, SessionCreate, MessageCreate
-from services.chat_service import ChatService
+from services.chat_service import ChatService, is_quota_error
 from services.file_service import FileService
 from services.session_service import SessionService
-from dependencies import get_supabase, get_embeddings, get_llm, get_qdrant_client, get_gemini_model, get_chat_service
+from dependencies import get_supabase, get_embeddings, get_llm, get_qdrant_client, get_gemini_model, get_chat_service, get_vector_store, get_provider_registry
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
+# Model names accepted by /chat/with-session mapped to ChatService providers
+SESSION_MODEL_PROVIDERS = {"OpenAI": "openai", "Gemini": "gemini", "Ollama": "ollama"}
+# Prepended to the answer (and the stored session message) when a named model was replaced by a fallback
+FALLBACK_NOTES = {
+    "OpenAI": "[Note: Using fallback model due to OpenAI quota limits]",
+    "Gemini": "[Note: Using fallback model due to Gemini unavailability]",
+    "Ollama": "[Note: Using fallback model due to Ollama unavailability]"
+}
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _event_stream(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Wrap ChatService stream events in a text/event-stream response"""
+    async def body():
+        async for item in events:
+            yield _sse(item["event"], item["data"])
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies from buffering tokens
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 
 @router.get("/folders/{folder_id}/files", response_model=List[FileResponse])
 async def get_folder_files(folder_id: UUID4, supabase=Depends(get_supabase)):
@@ -23,11 +56,12 @@ async def chat_with_documents(
     supabase=Depends(get_supabase),
     embeddings=Depends(get_embeddings),
     llm=Depends(get_llm),
-    qdrant_client=Depends(get_qdrant_client)
+    qdrant_client=Depends(get_qdrant_client),
+    vector_store=Depends(get_vector_store)
 ):
     """Chat with documents in a folder using AI"""
     try:
-        chat_service = ChatService(supabase, embeddings, llm, qdrant_client)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, vector_store=vector_store)
         return await chat_service.chat_with_openai(request)
     except Exception as e:
         print(f"Chat error: {str(e)}")
@@ -41,11 +75,12 @@ async def gemini_chat_with_documents(
     embeddings=Depends(get_embeddings),
     llm=Depends(get_llm),
     qdrant_client=Depends(get_qdrant_client),
-    gemini_model=Depends(get_gemini_model)
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
 ):
     """Chat with documents using Google Gemini"""
     try:
-        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
         return await chat_service.chat_with_gemini(request)
     except Exception as e:
         print(f"Gemini chat error: {str(e)}")
@@ -59,11 +94,12 @@ async def ollama_chat_with_documents(
     embeddings=Depends(get_embeddings),
     llm=Depends(get_llm),
     qdrant_client=Depends(get_qdrant_client),
-    gemini_model=Depends(get_gemini_model)
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
 ):
     """Chat with documents using Ollama local LLM"""
     try:
-        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
         return await chat_service.chat_with_ollama(request)
     except Exception as e:
         print(f"Ollama chat error: {str(e)}")
@@ -77,53 +113,114 @@ async def smart_chat_with_documents(
     embeddings=Depends(get_embeddings),
     llm=Depends(get_llm),
     qdrant_client=Depends(get_qdrant_client),
-    gemini_model=Depends(get_gemini_model)
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
 ):
     """Smart chat that automatically selects the best available model (OpenAI -> Gemini -> Ollama)"""
     try:
-        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
         return await chat_service.smart_chat(request)
     except Exception as e:
         print(f"Smart chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Smart chat failed: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def stream_chat_with_documents(
+    request: ChatRequest,
+    supabase=Depends(get_supabase),
+    embeddings=Depends(get_embeddings),
+    llm=Depends(get_llm),
+    qdrant_client=Depends(get_qdrant_client),
+    vector_store=Depends(get_vector_store)
+):
+    """Stream an OpenAI answer as server-sent events"""
+    chat_service = ChatService(supabase, embeddings, llm, qdrant_client, vector_store=vector_store)
+    return _event_stream(chat_service.stream_chat(request, "openai"))
+
+
+@router.post("/chat/gemini/stream")
+async def stream_gemini_chat_with_documents(
+    request: ChatRequest,
+    supabase=Depends(get_supabase),
+    embeddings=Depends(get_embeddings),
+    llm=Depends(get_llm),
+    qdrant_client=Depends(get_qdrant_client),
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
+):
+    """Stream a Google Gemini answer as server-sent events"""
+    chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
+    return _event_stream(chat_service.stream_chat(request, "gemini"))
+
+
+@router.post("/chat/ollama/stream")
+async def stream_ollama_chat_with_documents(
+    request: ChatRequest,
+    supabase=Depends(get_supabase),
+    embeddings=Depends(get_embeddings),
+    llm=Depends(get_llm),
+    qdrant_client=Depends(get_qdrant_client),
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
+):
+    """Stream an Ollama answer as server-sent events"""
+    chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
+    return _event_stream(chat_service.stream_chat(request, "ollama"))
+
+
+@router.post("/chat/smart/stream")
+async def stream_smart_chat_with_documents(
+    request: ChatRequest,
+    supabase=Depends(get_supabase),
+    embeddings=Depends(get_embeddings),
+    llm=Depends(get_llm),
+    qdrant_client=Depends(get_qdrant_client),
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
+):
+    """Stream an answer from the best available model, falling back if it fails before any text"""
+    chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
+    return _event_stream(chat_service.stream_chat(request, "smart"))
+
+
 @router.get("/chat/models/status")
-async def get_models_status():
-    """Check the status of all available chat models"""
-    from dependencies import check_openai_api_key, check_gemini_api_key, check_ollama_availability
+async def get_models_status(refresh: bool = False, provider_registry=Depends(get_provider_registry)):
+    """Check the status of all available chat models (served from the provider health cache)"""
     from config import config
     
-    openai_available = check_openai_api_key()
-    gemini_available = check_gemini_api_key()
-    ollama_available = check_ollama_availability()
+    if refresh:
+        await provider_registry.refresh()
+    else:
+        await provider_registry.ensure_fresh()
+    
+    statuses = provider_registry.snapshot()
+    openai_available = provider_registry.is_available("openai")
+    gemini_available = provider_registry.is_available("gemini")
+    ollama_available = provider_registry.is_available("ollama")
     
     # Determine recommended model
-    if openai_available:
-        recommended = "openai"
-    elif gemini_available:
-        recommended = "gemini"
-    elif ollama_available:
-        recommended = "ollama"
-    else:
-        recommended = "unavailable"
+    recommended = provider_registry.best_provider()
     
     return {
         "models": {
             "openai": {
                 "available": openai_available,
                 "name": "OpenAI GPT",
-                "description": "Advanced AI model with high accuracy"
+                "description": "Advanced AI model with high accuracy",
+                "checked_at": statuses["openai"]["checked_at"]
             },
             "gemini": {
                 "available": gemini_available,
                 "name": "Google Gemini",
-                "description": "Google's advanced AI model"
+                "description": "Google's advanced AI model",
+                "checked_at": statuses["gemini"]["checked_at"]
             },
             "ollama": {
                 "available": ollama_available,
                 "name": "Ollama Local LLM",
-                "description": f"Local LLM running via Ollama (model: {config.OLLAMA_MODEL})"
+                "description": f"Local LLM running via Ollama (model: {config.OLLAMA_MODEL})",
+                "checked_at": statuses["ollama"]["checked_at"]
             }
         },
         "recommended": recommended,
@@ -141,12 +238,13 @@ async def chat_with_session(
     embeddings=Depends(get_embeddings),
     llm=Depends(get_llm),
     qdrant_client=Depends(get_qdrant_client),
-    gemini_model=Depends(get_gemini_model)
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
 ):
     """Chat with documents and maintain session history"""
     try:
         session_service = SessionService(supabase)
-        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
         
         # Create or get session
         if not session_id:
@@ -178,12 +276,11 @@ async def chat_with_session(
                 chat_response = await chat_service.chat_with_openai(chat_request)
             except Exception as openai_error:
                 # Check if it's a quota error
-                error_str = str(openai_error).lower()
-                if 'quota' in error_str or 'insufficient_quota' in error_str or '429' in error_str:
+                if is_quota_error(openai_error):
                     print("OpenAI quota exceeded, falling back to smart chat")
                     # Fall back to smart chat (will try Gemini then Ollama)
                     chat_response = await chat_service.smart_chat(chat_request)
-                    chat_response.response = f"[Note: Using fallback model due to OpenAI quota limits]\n\n{chat_response.response}"
+                    chat_response.response = f"{FALLBACK_NOTES['OpenAI']}\n\n{chat_response.response}"
                 else:
                     # Re-raise if it's not a quota error
                     raise
@@ -193,14 +290,14 @@ async def chat_with_session(
             except Exception as gemini_error:
                 print("Gemini failed, falling back to smart chat")
                 chat_response = await chat_service.smart_chat(chat_request)
-                chat_response.response = f"[Note: Using fallback model due to Gemini unavailability]\n\n{chat_response.response}"
+                chat_response.response = f"{FALLBACK_NOTES['Gemini']}\n\n{chat_response.response}"
         elif model == "Ollama":
             try:
                 chat_response = await chat_service.chat_with_ollama(chat_request)
             except Exception as ollama_error:
                 print("Ollama failed, falling back to smart chat")
                 chat_response = await chat_service.smart_chat(chat_request)
-                chat_response.response = f"[Note: Using fallback model due to Ollama unavailability]\n\n{chat_response.response}"
+                chat_response.response = f"{FALLBACK_NOTES['Ollama']}\n\n{chat_response.response}"
         else:
             # Default to smart chat for any other model names
             chat_response = await chat_service.smart_chat(chat_request)
@@ -225,6 +322,68 @@ async def chat_with_session(
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@router.post("/chat/with-session/stream")
+async def stream_chat_with_session(
+    message: str,
+    folder_id: UUID4,
+    session_id: Optional[UUID4] = None,
+    model: str = "Smart",
+    supabase=Depends(get_supabase),
+    embeddings=Depends(get_embeddings),
+    llm=Depends(get_llm),
+    qdrant_client=Depends(get_qdrant_client),
+    gemini_model=Depends(get_gemini_model),
+    vector_store=Depends(get_vector_store)
+):
+    """Stream a chat answer as server-sent events and save both turns to the session"""
+    try:
+        session_service = SessionService(supabase)
+        chat_service = ChatService(supabase, embeddings, llm, qdrant_client, gemini_model, vector_store)
+        
+        if not session_id:
+            title = message[:50] + "..." if len(message) > 50 else message
+            session = session_service.create_session(SessionCreate(
+                folder_id=folder_id,
+                title=title,
+                model=model
+            ))
+            session_id = session.id
+        
+        session_service.add_message(MessageCreate(
+            session_id=session_id,
+            role="user",
+            content=message
+        ))
+    except Exception as e:
+        print(f"Chat with session error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+    
+    chat_request = ChatRequest(message=message, folder_id=folder_id)
+    # A named model falls back like the non-streaming endpoint does: OpenAI only when out of quota
+    provider = SESSION_MODEL_PROVIDERS.get(model, "smart")
+    fallback_when = is_quota_error if provider == "openai" else None
+    
+    async def events():
+        yield {"event": "session", "data": {"session_id": session_id, "model": model}}
+        async for item in chat_service.stream_chat(chat_request, provider, allow_fallback=True, fallback_when=fallback_when):
+            if item["event"] == "done":
+                answered_by = item["data"].get("model")
+                if model in FALLBACK_NOTES and answered_by in SESSION_MODEL_PROVIDERS.values() and answered_by != provider:
+                    # Same history as the non-streaming endpoint when another model had to answer
+                    item["data"]["response"] = f"{FALLBACK_NOTES[model]}\n\n{item['data']['response']}"
+                try:
+                    session_service.add_message(MessageCreate(
+                        session_id=session_id,
+                        role="assistant",
+                        content=item["data"]["response"]
+                    ))
+                except Exception as e:
+                    print(f"Failed to save streamed answer: {str(e)}")
+            yield item
+    
+    return _event_stream(events())
+
+
 @router.get("/chat/folder/{folder_id}/indexed")
 async def check_folder_files_indexed(
     folder_id: UUID4,
@@ -241,27 +400,34 @@ async def check_folder_files_indexed(
             return {"indexed": True, "message": "No files to index"}
         
         # Vector storage info
-        from vector_store import VectorStore
-        vector_store = VectorStore(supabase_client=supabase)
+        vector_store = chat_service.vector_store
         storage_info = await vector_store.get_storage_info()
         
-        # Check each file
+        # Check each file against the index manifest in a single lookup
+        entries = chat_service.index_manifest.get_many([str(file["id"]) for file in files])
         for file in files:
-            file_id = file.id
-            # Try a simple search query limited to this file to see if it's indexed
-            results = await vector_store.similarity_search(
-                "test",
-                k=1,
-                filter_dict={"file_id": str(file_id)}
-            )
+            entry = entries.get(str(file["id"]))
+            
+            if entry is None:
+                # Not tracked yet (indexed before the manifest existed): probe once and backfill
+                results = await vector_store.similarity_search(
+                    "test",
+                    k=1,
+                    filter_dict={"file_id": str(file["id"])}
+                )
+                if results:
+                    chat_service.index_manifest.mark_indexed(str(file["id"]), str(folder_id), chunk_count=None)
+                    continue
+            elif chat_service.index_manifest.is_ready(entry):
+                continue
             
             # If any file is not indexed, return false
-            if not results:
-                return {
-                    "indexed": False, 
-                    "message": f"File {file.original_filename} is not indexed yet",
-                    "storage": storage_info.get("primary_storage")
-                }
+            return {
+                "indexed": False, 
+                "message": f"File {file['original_filename']} is not indexed yet",
+                "state": entry["state"] if entry else "pending",
+                "storage": storage_info.get("primary_storage")
+            }
         
         # All files are indexed
         return {
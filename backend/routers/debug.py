@@ -1,48 +1,16 @@
 # Debug routes for troubleshooting
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import UUID4
-from models.schemas import ChatRequest, ChatResponse, FileResponse, SessionCreate, MessageCreate
-from services.chat_service import ChatService
-from services.file_service import FileService
-from services.session_service import SessionService
-from dependencies import get_supabase, get_embeddings, get_llm, get_qdrant_client, get_gemini_model, get_chat_service
-from vector_store import VectorStore
-from document_processor import DocumentProcessor
+from dependencies import get_supabase, get_vector_store, get_answer_cache, get_ollama_client, get_gemini_client, get_ingestion_queue
+from executors import executor_stats
+from config import config
+from routers.files import enqueue_file_processing
+from routers.folders import delete_folder_vectors
         
         
 router = APIRouter(prefix="/api/debug", tags=["debug"])
 
 
-async def process_file_background(file_id: str, folder_id: str, storage_path: str, original_filename: str, supabase_client):
-    """Background task to process uploaded file and create embeddings"""
-    try:
-        print(f"Starting background processing for file: {original_filename}")
-        
-        
-        # Initialize processor and vector store
-        processor = DocumentProcessor(supabase_client)
-        vector_store = VectorStore(supabase_client=supabase_client)
-        
-        # Process the PDF and create chunks
-        chunks = await processor.process_pdf(
-            storage_path=storage_path,
-            file_id=file_id,
-            folder_id=folder_id,
-            original_filename=original_filename
-        )
-        
-        if chunks:
-            # Add documents to vector store
-            await vector_store.add_documents(chunks, file_id)
-            print(f"Successfully processed and indexed {len(chunks)} chunks for {original_filename}")
-        else:
-            print(f"No chunks created for file {original_filename}")
-            
-    except Exception as e:
-        print(f"Error processing file {original_filename}: {str(e)}")
-
-
 @router.get("/folder/{folder_id}/files")
 async def debug_folder_files(
     folder_id: UUID4,
@@ -92,7 +60,6 @@ async def debug_folder_files(
 @router.post("/process-all-files/{folder_id}")
 async def debug_process_all_files(
     folder_id: UUID4,
-    background_tasks: BackgroundTasks,
     supabase=Depends(get_supabase)
 ):
     """Debug: Force process all files in a folder"""
@@ -109,13 +76,11 @@ async def debug_process_all_files(
         for item in folder_files_response.data:
             file_data = item["files"]
             if file_data:
-                background_tasks.add_task(
-                    process_file_background,
+                enqueue_file_processing(
                     file_id=file_data["id"],
                     folder_id=str(folder_id),
                     storage_path=file_data["storage_path"],
-                    original_filename=file_data["original_filename"],
-                    supabase_client=supabase
+                    original_filename=file_data["original_filename"]
                 )
                 files_processed += 1
         
@@ -135,7 +100,7 @@ async def debug_vector_store_status(
 ):
     """Debug: Check vector store status and statistics"""
     try:
-        vector_store = VectorStore(supabase_client=supabase)
+        vector_store = get_vector_store()
         
         # Check Supabase vectors
         supabase_total = None
@@ -154,7 +119,8 @@ async def debug_vector_store_status(
                 collections = vector_store.qdrant_client.get_collections()
                 qdrant_info = {
                     "available": True,
-                    "collections": [col.name for col in collections.collections]
+                    "collections": [col.name for col in collections.collections],
+                    "payload_indexes": vector_store.check_payload_indexes()
                 }
         except Exception as e:
             qdrant_error = str(e)
@@ -171,7 +137,18 @@ async def debug_vector_store_status(
                 "error": qdrant_error
             },
             "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
-            "embedding_dimension": 384
+            "embedding_dimension": 384,
+            "query_embedding_cache": vector_store.embeddings.cache_stats()
+                if hasattr(vector_store.embeddings, "cache_stats") else None,
+            "embedding_batching": vector_store.embeddings.batch_stats()
+                if hasattr(vector_store.embeddings, "batch_stats") else None,
+            "chunk_embedding_cache": vector_store.chunk_cache.stats()
+                if vector_store.chunk_cache is not None else None,
+            "answer_cache": get_answer_cache().stats(),
+            "executors": executor_stats(),
+            "ollama_client": get_ollama_client().stats(),
+            "ingestion_queue": get_ingestion_queue().stats(),
+            "gemini_client": get_gemini_client().stats() if get_gemini_client() is not None else None
         }
         
     except Exception as e:
@@ -179,36 +156,16 @@ async def debug_vector_store_status(
 
 
 @router.delete("/folder/{folder_id}/vectors")
-async def debug_delete_folder_vectors(
-    folder_id: UUID4,
-    supabase=Depends(get_supabase)
-):
+async def debug_delete_folder_vectors(folder_id: UUID4):
     """Debug: Delete all vectors for a folder"""
     try:
-        vector_store = VectorStore(supabase_client=supabase)
-        
-        # Delete from Supabase
-        supabase_deleted = 0
-        try:
-            response = supabase.table("document_vectors").delete().eq("folder_id", str(folder_id)).execute()
-            supabase_deleted = len(response.data) if response.data else 0
-        except Exception as e:
-            print(f"Error deleting from Supabase: {e}")
-        
-        # Delete from Qdrant (if available)
-        qdrant_deleted = 0
-        try:
-            if vector_store.qdrant_available:
-                # This would require implementing folder-based deletion in Qdrant
-                pass
-        except Exception as e:
-            print(f"Error deleting from Qdrant: {e}")
+        result = await delete_folder_vectors(str(folder_id))
         
         return {
             "message": "Vectors deleted",
             "folder_id": str(folder_id),
-            "supabase_deleted": supabase_deleted,
-            "qdrant_deleted": qdrant_deleted
+            "partitioning": config.QDRANT_PARTITIONING,
+            **result
         }
         
     except Exception as e:
@@ -266,10 +223,10 @@ async def debug_test_embedding(
 ):
     """Debug: Test embedding generation"""
     try:
-        vector_store = VectorStore(supabase_client=supabase)
+        vector_store = get_vector_store()
         
         # Generate embedding
-        embedding = vector_store.embeddings.embed_query(text)
+        embedding = await vector_store.embed_query(text)
         
         return {
             "text": text,
@@ -1,55 +1,58 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, BackgroundTasks, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from typing import List, Optional
 from pydantic import UUID4
 from models.schemas import FileResponse
 from services.file_service import FileService
-from dependencies import get_supabase
+from dependencies import get_supabase, get_vector_store, get_index_manifest, get_ingestion_queue
+from caching import TTLCache
+from config import config
+from pdf_extraction import resolve_profile
 
 router = APIRouter(prefix="/api/files", tags=["files"])
 
+# Shared by all pollers of the folder status endpoint
+_folder_status_cache = TTLCache(ttl_seconds=config.FOLDER_STATUS_CACHE_TTL_SECONDS)
 
-async def process_file_background(file_id: str, folder_id: str, storage_path: str, original_filename: str, supabase_client):
-    """Background task to process uploaded file and create embeddings"""
+
+def enqueue_file_processing(
+    file_id: str,
+    folder_id: str,
+    storage_path: str,
+    original_filename: str,
+    extraction_profile: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    source_file_id: Optional[str] = None
+) -> dict:
+    """Mark a file pending and queue it for the ingestion workers (as a vector copy when source_file_id is set)"""
+    get_index_manifest().mark_pending(file_id, folder_id, content_hash=content_hash)
+    return get_ingestion_queue().enqueue(
+        file_id=file_id,
+        folder_id=folder_id,
+        storage_path=storage_path,
+        original_filename=original_filename,
+        extraction_profile=extraction_profile,
+        source_file_id=source_file_id
+    )
+
+
+def _validate_profile(extraction_profile: Optional[str]) -> Optional[str]:
+    if extraction_profile is None:
+        return None
     try:
-        print(f"Starting background processing for file: {original_filename}")
-        
-        # Import here to avoid circular imports
-        from document_processor import DocumentProcessor
-        from vector_store import VectorStore
-        
-        # Initialize processor and vector store
-        processor = DocumentProcessor(supabase_client)
-        vector_store = VectorStore(supabase_client=supabase_client)
-        
-        # Process the PDF and create chunks
-        chunks = await processor.process_pdf(
-            storage_path=storage_path,
-            file_id=file_id,
-            folder_id=folder_id,
-            original_filename=original_filename
-        )
-        
-        if chunks:
-            # Add documents to vector store
-            await vector_store.add_documents(chunks, file_id)
-            print(f"Successfully processed and indexed {len(chunks)} chunks for {original_filename}")
-        else:
-            print(f"No chunks created for file {original_filename}")
-            
-    except Exception as e:
-        print(f"Error processing file {original_filename}: {str(e)}")
-        # You might want to update a status field in the database here
-        # to indicate processing failed
+        return resolve_profile(extraction_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
     folder_id: UUID4 = Form(...),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    extraction_profile: Optional[str] = Form(None),
     supabase=Depends(get_supabase)
 ):
-    """Upload a PDF file to a folder and automatically process it"""
+    """Upload a PDF file to a folder and automatically process it (optionally with a fast / standard / full extraction profile)"""
+    extraction_profile = _validate_profile(extraction_profile)
     try:
         file_service = FileService(supabase)
         
@@ -58,20 +61,32 @@ async def upload_file(
         
         if upload_result and "file" in upload_result:
             file_record = upload_result["file"]
+            content_hash = upload_result.get("content_hash")
             
-            # Add background task to process the file
-            background_tasks.add_task(
-                process_file_background,
+            # Identical bytes already indexed with the same extraction profile and the current model:
+            # copy those vectors instead of re-processing
+            profile = resolve_profile(extraction_profile or get_index_manifest().get_folder_profile(str(folder_id)))
+            source = get_index_manifest().find_indexed_by_content_hash(content_hash, profile) if content_hash else None
+            if source and source["file_id"] == str(file_record["id"]):
+                source = None
+            
+            # Queue the file for the ingestion workers
+            job = enqueue_file_processing(
                 file_id=file_record["id"],
                 folder_id=str(folder_id),
                 storage_path=file_record["storage_path"],
                 original_filename=file_record["original_filename"],
-                supabase_client=supabase
+                extraction_profile=extraction_profile,
+                content_hash=content_hash,
+                source_file_id=source["file_id"] if source else None
             )
+            if source:
+                upload_result["deduplicated_from"] = source["file_id"]
             
             # Update the response to indicate processing has started
             upload_result["processing_status"] = "started"
-            upload_result["message"] = "File uploaded successfully and processing started in background"
+            upload_result["job_id"] = job["id"]
+            upload_result["message"] = "File uploaded successfully and queued for processing"
             
         return upload_result
         
@@ -83,10 +98,11 @@ async def upload_file(
 @router.post("/{file_id}/process")
 async def process_file_manually(
     file_id: UUID4,
-    background_tasks: BackgroundTasks,
+    extraction_profile: Optional[str] = None,
     supabase=Depends(get_supabase)
 ):
     """Manually trigger processing of an uploaded file"""
+    extraction_profile = _validate_profile(extraction_profile)
     try:
         # Get file information
         file_response = supabase.table("files").select("*").eq("id", str(file_id)).execute()
@@ -104,19 +120,18 @@ async def process_file_manually(
         
         folder_id = folder_response.data[0]["folder_id"]
         
-        # Add background task
-        background_tasks.add_task(
-            process_file_background,
+        job = enqueue_file_processing(
             file_id=str(file_id),
             folder_id=folder_id,
             storage_path=file_info["storage_path"],
             original_filename=file_info["original_filename"],
-            supabase_client=supabase
+            extraction_profile=extraction_profile
         )
         
         return {
-            "message": "File processing started in background", 
+            "message": "File queued for processing", 
             "file_id": str(file_id),
+            "job_id": job["id"],
             "filename": file_info["original_filename"]
         }
         
@@ -127,17 +142,11 @@ async def process_file_manually(
 @router.get("/{file_id}/processing-status")
 async def get_file_processing_status(
     file_id: UUID4,
-    supabase=Depends(get_supabase)
+    supabase=Depends(get_supabase),
+    index_manifest=Depends(get_index_manifest)
 ):
     """Check if a file has been processed and indexed"""
     try:
-        # Check if vectors exist for this file
-        vector_response = supabase.table("document_vectors").select(
-            "id", count="exact"
-        ).eq("file_id", str(file_id)).execute()
-        
-        vector_count = vector_response.count if vector_response.count else 0
-        
         # Get file info
         file_response = supabase.table("files").select("*").eq("id", str(file_id)).execute()
         
@@ -146,14 +155,33 @@ async def get_file_processing_status(
         
         file_info = file_response.data[0]
         
+        entry = index_manifest.get(str(file_id))
+        if entry is not None:
+            vector_count = entry["chunk_count"] or 0
+            # Keep the "processed" label existing clients check for
+            status = "processed" if index_manifest.is_ready(entry) else entry["state"]
+        else:
+            # Not tracked by the manifest yet: fall back to counting stored vectors
+            vector_response = supabase.table("document_vectors").select(
+                "id", count="exact"
+            ).eq("file_id", str(file_id)).execute()
+            
+            vector_count = vector_response.count if vector_response.count else 0
+            status = "processed" if vector_count > 0 else "pending"
+        
+        is_processed = index_manifest.is_ready(entry) if entry is not None else vector_count > 0
+        
         return {
             "file_id": str(file_id),
             "filename": file_info["original_filename"],
-            "is_processed": vector_count > 0,
+            "is_processed": is_processed,
             "vector_count": vector_count,
-            "status": "processed" if vector_count > 0 else "pending"
+            "status": status,
+            "error": entry["error"] if entry else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking processing status: {str(e)}")
 
@@ -161,7 +189,6 @@ async def get_file_processing_status(
 @router.post("/batch-process")
 async def batch_process_files(
     folder_id: UUID4,
-    background_tasks: BackgroundTasks,
     supabase=Depends(get_supabase)
 ):
     """Process all files in a folder that haven't been processed yet"""
@@ -176,34 +203,29 @@ async def batch_process_files(
         
         files_to_process = []
         
+        # One grouped count for the whole folder instead of a count query per file
+        vector_counts = await get_vector_store().get_folder_vector_counts(str(folder_id))
+        
         for item in folder_files_response.data:
             file_data = item["files"]
             if file_data:
                 # Check if file is already processed
-                vector_response = supabase.table("document_vectors").select(
-                    "id", count="exact"
-                ).eq("file_id", file_data["id"]).execute()
-                
-                vector_count = vector_response.count if vector_response.count else 0
+                vector_count = vector_counts.get(str(file_data["id"]), 0)
                 
                 if vector_count == 0:  # Not processed yet
-                    files_to_process.append(file_data)
-                    
-                    # Add background task
-                    background_tasks.add_task(
-                        process_file_background,
+                    job = enqueue_file_processing(
                         file_id=file_data["id"],
                         folder_id=str(folder_id),
                         storage_path=file_data["storage_path"],
-                        original_filename=file_data["original_filename"],
-                        supabase_client=supabase
+                        original_filename=file_data["original_filename"]
                     )
+                    files_to_process.append({**file_data, "job_id": job["id"]})
         
         return {
             "message": f"Started processing {len(files_to_process)} unprocessed files",
             "folder_id": str(folder_id),
             "files_to_process": len(files_to_process),
-            "files": [{"id": f["id"], "name": f["original_filename"]} for f in files_to_process]
+            "files": [{"id": f["id"], "name": f["original_filename"], "job_id": f["job_id"]} for f in files_to_process]
         }
         
     except Exception as e:
@@ -225,9 +247,11 @@ async def delete_file(file_id: UUID4, supabase=Depends(get_supabase)):
         
         # Delete vectors first
         try:
-            from vector_store import VectorStore
-            vector_store = VectorStore(supabase_client=supabase)
-            await vector_store.delete_by_file_id(str(file_id))
+            vector_store = get_vector_store()
+            entry = get_index_manifest().get(str(file_id))
+            await vector_store.delete_by_file_id(str(file_id), folder_id=entry["folder_id"] if entry else None)
+            get_index_manifest().remove(str(file_id))
+            get_ingestion_queue().cancel_file_jobs(str(file_id))
             print(f"Deleted vectors for file {file_id}")
         except Exception as e:
             print(f"Error deleting vectors for file {file_id}: {e}")
@@ -248,56 +272,65 @@ async def get_folder_processing_status(
 ):
     """Get processing status for all files in a folder"""
     try:
-        # Get all files in folder
-        folder_files_response = supabase.table("folder_files").select(
-            "files(*)"
-        ).eq("folder_id", str(folder_id)).execute()
-        
-        if not folder_files_response.data:
-            return {
-                "folder_id": str(folder_id),
-                "total_files": 0,
-                "processed_files": 0,
-                "pending_files": 0,
-                "files": []
-            }
-        
-        file_statuses = []
-        processed_count = 0
-        
-        for item in folder_files_response.data:
-            file_data = item["files"]
-            if file_data:
-                # Check vector count for this file
-                vector_response = supabase.table("document_vectors").select(
-                    "id", count="exact"
-                ).eq("file_id", file_data["id"]).execute()
-                
-                vector_count = vector_response.count if vector_response.count else 0
-                is_processed = vector_count > 0
-                
-                if is_processed:
-                    processed_count += 1
-                
-                file_statuses.append({
-                    "file_id": file_data["id"],
-                    "filename": file_data["original_filename"],
-                    "is_processed": is_processed,
-                    "vector_count": vector_count,
-                    "file_size": file_data["file_size"]
-                })
-        
-        total_files = len(file_statuses)
-        pending_files = total_files - processed_count
+        # Concurrent pollers of the same folder share one computation per TTL window
+        return await _folder_status_cache.get_or_load(
+            str(folder_id),
+            lambda: _compute_folder_processing_status(str(folder_id), supabase)
+        )
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting folder status: {str(e)}")
+
+
+async def _compute_folder_processing_status(folder_id: str, supabase) -> dict:
+    """Build the folder status from one file listing and one grouped vector count"""
+    # Get all files in folder
+    folder_files_response = supabase.table("folder_files").select(
+        "files(*)"
+    ).eq("folder_id", folder_id).execute()
+    
+    if not folder_files_response.data:
         return {
-            "folder_id": str(folder_id),
-            "total_files": total_files,
-            "processed_files": processed_count,
-            "pending_files": pending_files,
-            "processing_complete": pending_files == 0,
-            "files": file_statuses
+            "folder_id": folder_id,
+            "total_files": 0,
+            "processed_files": 0,
+            "pending_files": 0,
+            "files": []
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting folder status: {str(e)}")
\ No newline at end of file
+    
+    vector_counts = await get_vector_store().get_folder_vector_counts(folder_id)
+    manifest_entries = get_index_manifest().get_folder(folder_id)
+    states = {entry["file_id"]: entry["state"] for entry in manifest_entries}
+    
+    file_statuses = []
+    processed_count = 0
+    
+    for item in folder_files_response.data:
+        file_data = item["files"]
+        if file_data:
+            vector_count = vector_counts.get(str(file_data["id"]), 0)
+            is_processed = vector_count > 0
+            
+            if is_processed:
+                processed_count += 1
+            
+            file_statuses.append({
+                "file_id": file_data["id"],
+                "filename": file_data["original_filename"],
+                "is_processed": is_processed,
+                "vector_count": vector_count,
+                "state": states.get(str(file_data["id"]), "processed" if is_processed else "pending"),
+                "file_size": file_data["file_size"]
+            })
+    
+    total_files = len(file_statuses)
+    pending_files = total_files - processed_count
+    
+    return {
+        "folder_id": folder_id,
+        "total_files": total_files,
+        "processed_files": processed_count,
+        "pending_files": pending_files,
+        "processing_complete": pending_files == 0,
+        "files": file_statuses
+    }
@@ -1,13 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Optional
 from pydantic import UUID4
-from models.schemas import FolderCreate, FolderUpdate, FolderResponse
+from models.schemas import FolderCreate, FolderUpdate, FolderResponse, FolderExtractionProfile
 from services.folder_service import FolderService
-from dependencies import get_supabase
+from dependencies import get_supabase, get_index_manifest, get_vector_store, get_ingestion_queue
+from pdf_extraction import resolve_profile
 
 router = APIRouter(prefix="/api/folders", tags=["folders"])
 
 
+async def delete_folder_vectors(folder_id: str) -> dict:
+    """
+    Delete a folder's vectors and forget its files in the index manifest, so
+    chat re-indexes them if they are used again and cached answers for the
+    folder are invalidated through its folder_version.
+    """
+    # Cancel first: running jobs check their lease before each vector and manifest write and stop there;
+    # one caught mid-write removes what it wrote once it sees the cancellation
+    cancelled_jobs = get_ingestion_queue().cancel_folder_jobs(folder_id)
+    await get_vector_store().delete_folder(folder_id)
+    removed_entries = get_index_manifest().remove_folder(folder_id)
+    return {"cancelled_jobs": cancelled_jobs, "removed_manifest_entries": removed_entries}
+
+
 @router.post("", response_model=FolderResponse)
 async def create_folder(folder: FolderCreate, supabase=Depends(get_supabase)):
     """Create a new folder"""
@@ -38,6 +53,44 @@ async def update_folder(folder_id: UUID4, folder: FolderUpdate, supabase=Depends
 
 @router.delete("/{folder_id}")
 async def delete_folder(folder_id: UUID4, supabase=Depends(get_supabase)):
-    """Delete a folder"""
+    """Delete a folder and its vectors"""
     folder_service = FolderService(supabase)
-    return folder_service.delete_folder(folder_id) 
\ No newline at end of file
+    result = folder_service.delete_folder(folder_id)
+    
+    # With per-folder partitions this drops a whole collection instead of filtering the shared one
+    try:
+        await delete_folder_vectors(str(folder_id))
+    except Exception as e:
+        print(f"Error deleting vectors of folder {folder_id}: {e}")
+    return result
+
+
+@router.get("/{folder_id}/extraction-profile")
+async def get_folder_extraction_profile(folder_id: UUID4, index_manifest=Depends(get_index_manifest)):
+    """Get the PDF extraction profile used for files in a folder"""
+    profile = index_manifest.get_folder_profile(str(folder_id))
+    return {
+        "folder_id": str(folder_id),
+        "extraction_profile": profile,
+        "effective_profile": resolve_profile(profile)
+    }
+
+
+@router.put("/{folder_id}/extraction-profile")
+async def set_folder_extraction_profile(
+    folder_id: UUID4,
+    settings: FolderExtractionProfile,
+    index_manifest=Depends(get_index_manifest)
+):
+    """Set the PDF extraction profile (fast / standard / full) for future processing of a folder's files"""
+    try:
+        profile = resolve_profile(settings.extraction_profile) if settings.extraction_profile else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    index_manifest.set_folder_profile(str(folder_id), profile)
+    return {
+        "folder_id": str(folder_id),
+        "extraction_profile": profile,
+        "effective_profile": resolve_profile(profile)
+    }
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends
-from dependencies import get_supabase, get_qdrant_client
+from fastapi.responses import JSONResponse
+from dependencies import get_supabase, get_qdrant_client, get_vector_store
 from config import config
-from vector_store import VectorStore
 
 router = APIRouter(prefix="/api", tags=["health"])
 
 
 @router.get("/health")
-async def health_check(supabase=Depends(get_supabase), qdrant_client=Depends(get_qdrant_client)):
+async def health_check(
+    supabase=Depends(get_supabase),
+    qdrant_client=Depends(get_qdrant_client),
+    vector_store=Depends(get_vector_store)
+):
     """Health check endpoint to verify Supabase connection"""
     try:
         # Check database connection
@@ -20,9 +24,6 @@ async def health_check(supabase=Depends(get_supabase), qdrant_client=Depends(get
         except:
             bucket_exists = False
             
-        # Initialize vector store to check availability
-        vector_store = VectorStore(supabase_client=supabase)
-        
         return {
             "status": "healthy",
             "database": "connected",
@@ -44,6 +45,15 @@ async def health_check(supabase=Depends(get_supabase), qdrant_client=Depends(get
         }
 
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup warm-up has finished"""
+    from warmup import warmup_state
+    
+    status_code = 200 if warmup_state["ready"] else 503
+    return JSONResponse(status_code=status_code, content=warmup_state)
+
+
 @router.get("/config/check")
 async def check_config():
     """Check if required environment variables are set"""
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+from pydantic import UUID4
+from dependencies import get_ingestion_queue, get_index_manifest
+from ingestion_queue import FAILED, CANCELLED
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("")
+async def list_jobs(
+    state: Optional[str] = None,
+    folder_id: Optional[UUID4] = None,
+    file_id: Optional[UUID4] = None,
+    limit: int = 100,
+    ingestion_queue=Depends(get_ingestion_queue)
+):
+    """List ingestion jobs, most recent first"""
+    jobs = ingestion_queue.list(state=state, folder_id=folder_id, file_id=file_id, limit=min(limit, 1000))
+    return {"jobs": jobs, "count": len(jobs)}
+
+
+@router.get("/stats")
+async def get_job_stats(request: Request, ingestion_queue=Depends(get_ingestion_queue)):
+    """Job counts per state and the state of the in-process workers"""
+    workers = getattr(request.app.state, "ingestion_workers", None)
+    return {
+        "states": ingestion_queue.stats(),
+        "in_process_workers": workers.stats() if workers is not None else None
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: UUID4, ingestion_queue=Depends(get_ingestion_queue)):
+    """Get a single ingestion job"""
+    job = ingestion_queue.get(str(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/retry")
+async def retry_job(
+    job_id: UUID4,
+    ingestion_queue=Depends(get_ingestion_queue),
+    index_manifest=Depends(get_index_manifest)
+):
+    """Requeue a failed or cancelled job"""
+    job = ingestion_queue.get(str(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["state"] not in (FAILED, CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Only failed or cancelled jobs can be retried (job is {job['state']})")
+    
+    # Returns the file's other active job instead when there is one
+    job = ingestion_queue.retry(str(job_id))
+    if job["id"] == str(job_id):
+        index_manifest.mark_pending(job["file_id"], job["folder_id"])
+    return job
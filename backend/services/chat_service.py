@@ -1,23 +1,38 @@
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from langchain_qdrant import Qdrant
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Any, AsyncIterator, Optional, Callable
 from services.document_service import DocumentService
 from models.schemas import ChatRequest, ChatResponse
 from openai import OpenAI
 import google.generativeai as genai
-import requests
 import json
+from langchain_core.messages import SystemMessage, HumanMessage
 from rag import RAGChat
 from config import config
-from dependencies import check_openai_api_key, check_gemini_api_key, check_ollama_availability
+from dependencies import get_vector_store, get_provider_registry, get_index_manifest, get_answer_cache, get_ollama_client, get_gemini_client, get_ingestion_queue
+from index_manifest import FAILED, PENDING
+from provider_health import PROVIDER_PRIORITY
 from vector_store import VectorStore
 import asyncio
 
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on the provided document context. Always base your answers on the given context."
+
+NO_RELEVANT_CONTENT = "I couldn't find relevant information in the uploaded documents to answer your question."
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Whether an OpenAI error means the quota or rate limit ran out"""
+    error_str = str(error).lower()
+    return 'quota' in error_str or 'insufficient_quota' in error_str or '429' in error_str
+
+
 class ChatService:
     """Service for chat operations with documents"""
     
-    def __init__(self, supabase, embeddings, llm, qdrant_client, gemini_model=None):
+    def __init__(self, supabase, embeddings, llm, qdrant_client, gemini_model=None, vector_store: VectorStore = None,
+                 provider_registry=None, index_manifest=None, answer_cache=None, ollama_client=None,
+                 gemini_client=None):
         self.supabase = supabase
         self.embeddings = embeddings
         self.llm = llm
@@ -25,8 +40,25 @@ class ChatService:
         self.gemini_model = gemini_model
         self.document_service = DocumentService()
         
-        # Initialize vector store (can be configured to use Supabase or Qdrant)
-        self.vector_store = VectorStore(supabase_client=supabase)
+        # Use the process-wide vector store instead of building a new model and client per request
+        self.vector_store = vector_store if vector_store is not None else get_vector_store()
+        
+        # Provider availability is answered from memory and updated from real calls
+        self.provider_registry = provider_registry if provider_registry is not None else get_provider_registry()
+        
+        # Per-file indexing state written by ingestion
+        self.index_manifest = index_manifest if index_manifest is not None else get_index_manifest()
+        
+        # Answers to near-duplicate questions, invalidated when the folder's vectors change
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+        
+        # Pooled async HTTP client so local-LLM calls never block the event loop
+        self.ollama_client = ollama_client if ollama_client is not None else get_ollama_client()
+        
+        # Async Gemini generation with per-call deadlines (None when Gemini is not configured)
+        if gemini_client is None and gemini_model is not None:
+            gemini_client = get_gemini_client()
+        self.gemini_client = gemini_client
     
     def get_folder_files(self, folder_id: str) -> List[dict]:
         """Get all files in a folder"""
@@ -41,33 +73,41 @@ class ChatService:
     
     async def ensure_files_are_indexed(self, folder_id: str, files: List[dict]):
         """Ensure all files in folder are properly indexed in vector store"""
+        # One manifest lookup for the whole folder instead of a probe search per file
+        entries = self.index_manifest.get_many([file_info['id'] for file_info in files])
+        
         for file_info in files:
             file_id = file_info['id']
+            entry = entries.get(file_id)
             
-            # Check if file is already indexed
-            test_results = await self.vector_store.similarity_search(
-                "test query",
-                k=1,
-                filter_dict={"file_id": file_id}
-            )
+            if self.index_manifest.is_ready(entry) or self.index_manifest.is_in_progress(entry):
+                continue
             
-            if not test_results:
-                print(f"File {file_info['original_filename']} not found in vector store. Processing...")
-                
-                # Process and index the file
-                from document_processor import DocumentProcessor
-                processor = DocumentProcessor(self.supabase)
-                
-                chunks = await processor.process_pdf(
-                    file_info['storage_path'],
-                    file_id,
-                    folder_id,
-                    file_info['original_filename']
+            if entry is None:
+                # Files indexed before the manifest existed: probe once and remember the answer
+                test_results = await self.vector_store.similarity_search(
+                    "test query",
+                    k=1,
+                    filter_dict={"file_id": file_id}
                 )
-                
-                if chunks:
-                    await self.vector_store.add_documents(chunks, file_id)
-                    print(f"Indexed {len(chunks)} chunks for {file_info['original_filename']}")
+                if test_results:
+                    self.index_manifest.mark_indexed(file_id, folder_id, chunk_count=None)
+                    continue
+            elif entry["state"] == FAILED:
+                # Failed files are retried through /process or batch processing, not on every message
+                continue
+            
+            print(f"File {file_info['original_filename']} not found in vector store. Queueing for processing...")
+            
+            # Index through the worker pool instead of on the chat request; the queue ignores duplicates
+            if entry is None or entry["state"] != PENDING:
+                self.index_manifest.mark_pending(file_id, folder_id)
+            get_ingestion_queue().enqueue(
+                file_id=file_id,
+                folder_id=folder_id,
+                storage_path=file_info['storage_path'],
+                original_filename=file_info['original_filename']
+            )
     
     def create_or_get_vector_store(self, folder_id: str, chunks: List[str], chunk_sources: List[str]):
         """Create or get existing vector store for folder"""
@@ -95,17 +135,10 @@ class ChatService:
     
     def determine_best_model(self) -> str:
         """
-        Determine the best available model based on API key availability.
+        Determine the best available model from the cached provider health.
         Priority: OpenAI -> Gemini -> Ollama -> Simple (local)
         """
-        if check_openai_api_key():
-            return "openai"
-        elif check_gemini_api_key():
-            return "gemini"
-        elif check_ollama_availability():
-            return "ollama"
-        else:
-            return "unavailable"
+        return self.provider_registry.best_provider()
     
     async def search_relevant_content(self, query: str, folder_id: str, k: int = 5) -> Tuple[List[str], List[str], List[str]]:
         """Search for relevant content using vector store"""
@@ -134,10 +167,48 @@ class ChatService:
         
         return relevant_chunks, relevant_sources, all_sources
     
+    def _build_prompt(self, question: str, context: str) -> str:
+        """User prompt shared by every provider"""
+        return f"""Based on the following context from the uploaded documents, please answer the question.
+            
+            Context:
+            {context}
+
+            Question: {question}
+
+            Please provide a helpful and accurate answer based on the context provided. If the answer cannot be found in the context, please say so."""
+    
+    async def _with_answer_cache(self, provider: str, request: ChatRequest, generate) -> ChatResponse:
+        """Serve a cached answer for a near-duplicate question, otherwise generate and store one"""
+        if not config.ANSWER_CACHE_ENABLED:
+            return await generate(request)
+        
+        folder_id = str(request.folder_id)
+        # Served from the query embedding LRU, so retrieval below does not embed the question again
+        query_embedding = await self.vector_store.embed_query(request.message)
+        
+        # Indexing may happen in a separate worker process, so compare against the manifest too
+        folder_version = self.index_manifest.folder_version(folder_id)
+        cached = self.answer_cache.lookup(folder_id, provider, query_embedding, folder_version)
+        if cached is not None:
+            print(f"Answer cache hit for folder {folder_id} ({provider})")
+            return cached
+        
+        response = await generate(request)
+        
+        # Placeholder answers from an unavailable provider are not worth keeping
+        if response.model != "Unavailable":
+            self.answer_cache.store(folder_id, provider, query_embedding, response, folder_version)
+        return response
+    
     async def chat_with_gemini(self, request: ChatRequest) -> ChatResponse:
         """Chat with documents using Google Gemini"""
+        return await self._with_answer_cache("gemini", request, self._chat_with_gemini)
+    
+    async def _chat_with_gemini(self, request: ChatRequest) -> ChatResponse:
+        """Chat with documents using Google Gemini (uncached)"""
         try:
-            if self.gemini_model is None:
+            if self.gemini_client is None:
                 # Search for relevant content without AI processing
                 files = self.get_folder_files(str(request.folder_id))
                 await self.ensure_files_are_indexed(str(request.folder_id), files)
@@ -174,7 +245,7 @@ class ChatService:
             
             if not relevant_chunks:
                 return ChatResponse(
-                    response="I couldn't find relevant information in the uploaded documents to answer your question.",
+                    response=NO_RELEVANT_CONTENT,
                     sources=all_sources
                 )
             
@@ -182,19 +253,17 @@ class ChatService:
             context = "\n\n".join(relevant_chunks[:3])  # Use top 3 chunks
             
             # Generate response with Gemini
-            prompt = f"""Based on the following context from the uploaded documents, please answer the question.
-            
-            Context:
-            {context}
+            prompt = self._build_prompt(request.message, context)
 
-            Question: {request.message}
-
-            Please provide a helpful and accurate answer based on the context provided. If the answer cannot be found in the context, please say so."""
-
-            response = self.gemini_model.generate_content(prompt)
+            try:
+                answer = await self.gemini_client.generate(prompt)
+            except Exception as e:
+                self.provider_registry.record_failure("gemini", e)
+                raise
+            self.provider_registry.record_success("gemini")
             
             return ChatResponse(
-                response=response.text,
+                response=answer,
                 sources=relevant_sources
             )
             
@@ -203,6 +272,10 @@ class ChatService:
     
     async def chat_with_ollama(self, request: ChatRequest) -> ChatResponse:
         """Chat with documents using Ollama local LLM"""
+        return await self._with_answer_cache("ollama", request, self._chat_with_ollama)
+    
+    async def _chat_with_ollama(self, request: ChatRequest) -> ChatResponse:
+        """Chat with documents using Ollama local LLM (uncached)"""
         try:
             # Get files from folder
             files = self.get_folder_files(str(request.folder_id))
@@ -217,7 +290,7 @@ class ChatService:
             
             if not relevant_chunks:
                 return ChatResponse(
-                    response="I couldn't find relevant information in the uploaded documents to answer your question.",
+                    response=NO_RELEVANT_CONTENT,
                     sources=all_sources
                 )
             
@@ -226,41 +299,20 @@ class ChatService:
             
             # Prepare messages for Ollama
             messages = [
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that answers questions based on the provided document context. Always base your answers on the given context."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Based on the following context from the uploaded documents, please answer the question.
-            
-                Context:
-                {context}
-                
-                Question: {request.message}
-
-                Please provide a helpful and accurate answer based on the context provided. If the answer cannot be found in the context, please say so."""
-                }
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_prompt(request.message, context)}
             ]
             
             # Call Ollama API
-            response = requests.post(
-                f"{config.OLLAMA_BASE_URL}/api/chat",
-                json={
-                    "model": config.OLLAMA_MODEL,
-                    "messages": messages,
-                    "stream": False
-                },
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
-            
-            result = response.json()
+            try:
+                answer = await self.ollama_client.chat(messages)
+            except Exception as e:
+                self.provider_registry.record_failure("ollama", e)
+                raise
+            self.provider_registry.record_success("ollama")
             
             return ChatResponse(
-                response=result.get("message", {}).get("content", "No response generated"),
+                response=answer,
                 sources=relevant_sources
             )
             
@@ -269,6 +321,10 @@ class ChatService:
     
     async def chat_with_openai(self, request: ChatRequest) -> ChatResponse:
         """Chat with documents using OpenAI"""
+        return await self._with_answer_cache("openai", request, self._chat_with_openai)
+    
+    async def _chat_with_openai(self, request: ChatRequest) -> ChatResponse:
+        """Chat with documents using OpenAI (uncached)"""
         try:
             # Check if OpenAI is available
             if self.llm is None or self.embeddings is None:
@@ -304,21 +360,23 @@ class ChatService:
             # Use RAG approach with vector store
             rag_chat = RAGChat(self.vector_store)
             
-            result = await rag_chat.chat(
-                message=request.message,
-                folder_id=str(request.folder_id),
-                k=5
-            )
+            # Retrieval errors (Qdrant / Supabase) say nothing about OpenAI's health
+            documents = await rag_chat.retrieve(request.message, folder_id=str(request.folder_id), k=5)
+            try:
+                answer = await rag_chat.answer(request.message, documents)
+            except Exception as e:
+                self.provider_registry.record_failure("openai", e)
+                raise
+            self.provider_registry.record_success("openai")
             
             return ChatResponse(
-                response=result["answer"],
-                sources=[source["metadata"].get("filename", "Unknown") for source in result["sources"]]
+                response=answer,
+                sources=[doc.metadata.get("filename", "Unknown") for doc in documents]
             )
             
         except Exception as e:
             # Check for quota errors specifically
-            error_str = str(e).lower()
-            if 'quota' in error_str or 'insufficient_quota' in error_str or '429' in error_str:
+            if is_quota_error(e):
                 raise Exception(f"OpenAI quota exceeded: {str(e)}")
             else:
                 raise Exception(f"Chat failed: {str(e)}")
@@ -328,6 +386,8 @@ class ChatService:
         Intelligent chat that automatically selects the best available model.
         Priority: OpenAI -> Gemini -> Ollama
         """
+        # Probes only run on the very first call; later refreshes happen in the background
+        await self.provider_registry.ensure_fresh()
         best_model = self.determine_best_model()
         
         # Handle case when no models are available
@@ -400,4 +460,145 @@ However, I found these potentially relevant excerpts from your documents:
                     print(f"Ollama also failed: {str(ollama_error)}")
                     raise Exception("All AI models failed. Please check your API keys and connections.")
             else:
-                raise Exception(f"All models failed: {str(e)}")
\ No newline at end of file
+                raise Exception(f"All models failed: {str(e)}")
+    
+    async def _stream_openai(self, prompt: str) -> AsyncIterator[str]:
+        if self.llm is None:
+            raise Exception("OpenAI is not available. Please check your API key configuration.")
+        async for chunk in self.llm.astream([SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]):
+            if chunk.content:
+                yield chunk.content
+    
+    async def _stream_gemini(self, prompt: str) -> AsyncIterator[str]:
+        if self.gemini_client is None:
+            raise Exception("Google Gemini is not available. Please check your API key configuration.")
+        async for text in self.gemini_client.stream(prompt):
+            yield text
+    
+    async def _stream_ollama(self, prompt: str) -> AsyncIterator[str]:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        async for text in self.ollama_client.stream_chat(messages):
+            yield text
+    
+    def _provider_stream(self, provider: str, prompt: str) -> AsyncIterator[str]:
+        return {
+            "openai": self._stream_openai,
+            "gemini": self._stream_gemini,
+            "ollama": self._stream_ollama
+        }[provider](prompt)
+    
+    async def stream_chat(
+        self,
+        request: ChatRequest,
+        provider: str = "smart",
+        allow_fallback: bool = None,
+        fallback_when: Optional[Callable[[Exception], bool]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an answer as events for server-sent events:
+        a "sources" event once retrieval finishes, "token" events as text
+        arrives, then "done" with the full ChatResponse (or "error").
+        "smart" picks the best available provider; with allow_fallback the
+        next provider is tried if one fails before producing any text.
+        fallback_when limits which errors of the first provider may fall back.
+        OpenAI answers use the same retrieval and prompt as RAGChat.
+        """
+        folder_id = str(request.folder_id)
+        if allow_fallback is None:
+            allow_fallback = provider == "smart"
+        
+        try:
+            if provider == "smart":
+                await self.provider_registry.ensure_fresh()
+                provider = self.determine_best_model()
+            elif provider == "openai" and (self.llm is None or self.embeddings is None):
+                # Like chat_with_openai: answer with excerpts instead of failing
+                provider = "unavailable"
+            
+            query_embedding = await self.vector_store.embed_query(request.message)
+            
+            folder_version = self.index_manifest.folder_version(folder_id)
+            if config.ANSWER_CACHE_ENABLED and provider != "unavailable":
+                cached = self.answer_cache.lookup(folder_id, provider, query_embedding, folder_version)
+                if cached is not None:
+                    yield {"event": "sources", "data": {"sources": cached.sources, "model": cached.model or provider}}
+                    yield {"event": "token", "data": {"text": cached.response}}
+                    yield {"event": "done", "data": {**cached.model_dump(), "cached": True}}
+                    return
+            
+            files = self.get_folder_files(folder_id)
+            await self.ensure_files_are_indexed(folder_id, files)
+            rag_chat = None
+            if provider == "openai":
+                rag_chat = RAGChat(self.vector_store)
+                documents = await rag_chat.retrieve(request.message, folder_id=folder_id, k=5)
+                relevant_chunks = [doc.page_content for doc in documents]
+                relevant_sources = all_sources = [doc.metadata.get("filename", "Unknown") for doc in documents]
+            else:
+                relevant_chunks, relevant_sources, all_sources = await self.search_relevant_content(
+                    request.message, folder_id
+                )
+            
+            yield {
+                "event": "sources",
+                "data": {"sources": relevant_sources if relevant_chunks else all_sources, "model": provider}
+            }
+            
+            if not relevant_chunks:
+                response = ChatResponse(response=NO_RELEVANT_CONTENT, sources=all_sources)
+                yield {"event": "token", "data": {"text": response.response}}
+                yield {"event": "done", "data": response.model_dump()}
+                return
+            
+            if provider == "unavailable":
+                response_text = "No AI models are currently available to process your question. Please check your API keys and connections.\n\n"
+                response_text += "However, I found these potentially relevant excerpts from your documents:\n\n"
+                response_text += "\n\n".join(relevant_chunks[:2])
+                response = ChatResponse(response=response_text, sources=relevant_sources, model="Unavailable")
+                yield {"event": "token", "data": {"text": response.response}}
+                yield {"event": "done", "data": response.model_dump()}
+                return
+            
+            prompt = self._build_prompt(request.message, "\n\n".join(relevant_chunks[:3]))
+            candidates = [provider]
+            if allow_fallback:
+                candidates += [name for name in PROVIDER_PRIORITY if name != provider]
+            
+            last_error: Optional[Exception] = None
+            for candidate in candidates:
+                parts: List[str] = []
+                if rag_chat is not None and candidate == "openai":
+                    stream = rag_chat.stream_answer(request.message, documents)
+                else:
+                    stream = self._provider_stream(candidate, prompt)
+                try:
+                    async for text in stream:
+                        parts.append(text)
+                        yield {"event": "token", "data": {"text": text}}
+                except Exception as e:
+                    self.provider_registry.record_failure(candidate, e)
+                    last_error = e
+                    print(f"Streaming with {candidate} failed: {e}")
+                    if parts:
+                        # Text already reached the client; switching models mid-answer would garble it
+                        break
+                    if candidate == provider and fallback_when is not None and not fallback_when(e):
+                        yield {"event": "error", "data": {"message": f"Chat failed: {e}"}}
+                        return
+                    continue
+                
+                self.provider_registry.record_success(candidate)
+                response = ChatResponse(response="".join(parts), sources=relevant_sources, model=candidate)
+                if config.ANSWER_CACHE_ENABLED:
+                    self.answer_cache.store(folder_id, candidate, query_embedding, response, folder_version)
+                yield {"event": "done", "data": response.model_dump()}
+                return
+            
+            yield {"event": "error", "data": {"message": f"All AI models failed: {last_error}"}}
+            
+        except Exception as e:
+            print(f"Streaming chat error: {e}")
+            yield {"event": "error", "data": {"message": str(e)}}
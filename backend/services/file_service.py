@@ -1,4 +1,5 @@
 import os
+import hashlib
 from datetime import datetime
 from uuid import uuid4
 from typing import List
@@ -31,6 +32,9 @@ class FileService:
             
             print(f"Uploading file: {file.filename} ({len(content)} bytes)")
             
+            # Identifies identical PDFs so their vectors can be reused instead of re-embedded
+            content_hash = hashlib.sha256(content).hexdigest()
+            
             # First, check if bucket exists and create if needed
             try:
                 # Try to create the bucket (will fail if it already exists, which is fine)
@@ -89,7 +93,8 @@ class FileService:
                 
                 return {
                     "message": "File uploaded successfully",
-                    "file": file_record
+                    "file": file_record,
+                    "content_hash": content_hash
                 }
             else:
                 raise HTTPException(status_code=400, detail="Failed to save file metadata")
@@ -0,0 +1,172 @@
+from typing import Optional, Dict, Callable, Awaitable
+from config import config
+from document_processor import DocumentProcessor
+from index_manifest import IndexManifest
+from ingestion_queue import LeaseLostError, CANCELLED
+from pdf_extraction import resolve_profile
+from vector_store import VectorStore
+
+
+class IngestionService:
+    """Service that extracts, embeds and indexes uploaded files while recording their state"""
+    
+    def __init__(self, supabase, vector_store: VectorStore, index_manifest: IndexManifest):
+        self.supabase = supabase
+        self.vector_store = vector_store
+        self.index_manifest = index_manifest
+    
+    def effective_profile(self, folder_id: str, extraction_profile: Optional[str] = None) -> str:
+        """Extraction profile a file is processed with: the upload's, then the folder's, then the configured default"""
+        return resolve_profile(extraction_profile or self.index_manifest.get_folder_profile(folder_id))
+    
+    @staticmethod
+    async def _ensure_lease(lease_check: Optional[Callable[[], Awaitable[Optional[str]]]]) -> None:
+        """
+        Stop before a write if the queue gave the job to another worker or
+        cancelled it (e.g. its folder was deleted). lease_check returns None
+        while the lease is held, otherwise the job's state.
+        """
+        if lease_check is None:
+            return
+        state = await lease_check()
+        if state is not None:
+            raise LeaseLostError(state)
+    
+    async def index_file(
+        self,
+        file_id: str,
+        folder_id: str,
+        storage_path: str,
+        original_filename: str,
+        extraction_profile: Optional[str] = None,
+        lease_check: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+    ) -> Dict[str, int]:
+        """
+        Process a PDF into chunks and write them to the vector store. Returns the
+        chunk count and how many chunks were added, removed and kept; a file
+        that was indexed before is updated incrementally.
+        """
+        await self._ensure_lease(lease_check)
+        self.index_manifest.mark_indexing(file_id, folder_id)
+        
+        try:
+            profile = self.effective_profile(folder_id, extraction_profile)
+            processor = DocumentProcessor(self.supabase)
+            
+            # Process the PDF and create chunks
+            chunks = await processor.process_pdf(
+                storage_path=storage_path,
+                file_id=file_id,
+                folder_id=folder_id,
+                original_filename=original_filename,
+                profile=profile
+            )
+            
+            if not chunks:
+                raise Exception("No text could be extracted from the document")
+            
+            await self._ensure_lease(lease_check)
+            # Only changed chunks are written; unchanged vectors stay in place
+            if config.INCREMENTAL_REINDEX_ENABLED:
+                result = await self.vector_store.sync_file_documents(chunks, file_id)
+            else:
+                await self.vector_store.add_documents(chunks, file_id)
+                result = {"chunk_count": len(chunks), "added": len(chunks), "removed": 0, "kept": 0}
+            
+            await self._ensure_lease_after_write(lease_check, file_id, folder_id)
+            content_hash: Optional[str] = chunks[0].metadata.get("content_hash")
+            self.index_manifest.mark_indexed(
+                file_id,
+                folder_id,
+                chunk_count=result["chunk_count"],
+                embedding_model=config.EMBEDDING_MODEL,
+                content_hash=content_hash,
+                extraction_profile=profile
+            )
+            print(f"Successfully processed and indexed {result['chunk_count']} chunks for {original_filename}")
+            return result
+            
+        except LeaseLostError:
+            # The job belongs to someone else now (or its folder is gone); leave the manifest alone
+            raise
+        except Exception as e:
+            self.index_manifest.mark_failed(file_id, folder_id, str(e))
+            raise
+    
+    async def _ensure_lease_after_write(
+        self,
+        lease_check: Optional[Callable[[], Awaitable[Optional[str]]]],
+        file_id: str,
+        folder_id: str
+    ) -> None:
+        """
+        Lease lost while writing: do not record the file as indexed. A
+        cancelled job's vectors are taken back out; a reclaimed job's are left
+        to the worker that owns it now, which writes the same chunk ids.
+        """
+        try:
+            await self._ensure_lease(lease_check)
+        except LeaseLostError as e:
+            if e.state == CANCELLED:
+                try:
+                    await self.vector_store.delete_by_file_id(file_id, folder_id)
+                except Exception as delete_error:
+                    print(f"Could not remove vectors of cancelled job for file {file_id}: {delete_error}")
+            raise
+    
+    async def clone_file(
+        self,
+        source_file_id: str,
+        file_id: str,
+        folder_id: str,
+        storage_path: str,
+        original_filename: str,
+        extraction_profile: Optional[str] = None,
+        lease_check: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+    ) -> Dict[str, int]:
+        """
+        Index a file whose contents are identical to an already indexed one by
+        copying that file's vectors, re-tagged for the new file and folder.
+        Falls back to full processing if the source is no longer usable.
+        """
+        profile = self.effective_profile(folder_id, extraction_profile)
+        source = self.index_manifest.get(source_file_id)
+        if not self.index_manifest.is_ready(source):
+            print(f"Duplicate source {source_file_id} is no longer indexed; processing {original_filename} from scratch")
+            return await self.index_file(file_id, folder_id, storage_path, original_filename, extraction_profile, lease_check)
+        if source.get("extraction_profile") != profile:
+            print(f"Duplicate source {source_file_id} was extracted with another profile; processing {original_filename} with {profile}")
+            return await self.index_file(file_id, folder_id, storage_path, original_filename, extraction_profile, lease_check)
+        
+        await self._ensure_lease(lease_check)
+        self.index_manifest.mark_indexing(file_id, folder_id)
+        try:
+            # A retried job may have left a partial copy behind
+            await self.vector_store.delete_by_file_id(file_id, folder_id)
+            copied = await self.vector_store.clone_file_vectors(
+                source_file_id,
+                file_id,
+                folder_id,
+                metadata_updates={"filename": original_filename, "storage_path": storage_path},
+                source_folder_id=source["folder_id"]
+            )
+        except Exception as e:
+            print(f"Copying vectors from {source_file_id} failed ({e}); processing {original_filename} from scratch")
+            # Drop any partial copy so full processing does not add a second set
+            await self.vector_store.delete_by_file_id(file_id, folder_id)
+            copied = 0
+        
+        if not copied:
+            return await self.index_file(file_id, folder_id, storage_path, original_filename, extraction_profile, lease_check)
+        
+        await self._ensure_lease_after_write(lease_check, file_id, folder_id)
+        self.index_manifest.mark_indexed(
+            file_id,
+            folder_id,
+            chunk_count=copied,
+            embedding_model=config.EMBEDDING_MODEL,
+            content_hash=source["content_hash"],
+            extraction_profile=profile
+        )
+        print(f"Reused {copied} chunks from identical file {source_file_id} for {original_filename}")
+        return {"chunk_count": copied, "added": copied, "removed": 0, "kept": 0}
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules are imported as top-level modules, as when running main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time() and time.monotonic() for the stores and caches that timestamp entries"""
+    fake = FakeClock()
+    monkeypatch.setattr("time.time", fake)
+    monkeypatch.setattr("time.monotonic", fake)
+    return fake
@@ -0,0 +1,98 @@
+import pytest
+
+from answer_cache import SemanticAnswerCache
+from models.schemas import ChatResponse
+
+
+def answer(text):
+    return ChatResponse(response=text, sources=["a.pdf"], model="test")
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticAnswerCache(similarity_threshold=0.95, ttl_seconds=60, max_entries=3)
+
+
+def test_near_duplicate_question_hits(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"))
+    
+    # cos = 0.995
+    hit = cache.lookup("folder-1", "openai", [1.0, 0.1])
+    assert hit.response == "cached"
+    assert cache.stats()["hits"] == 1
+
+
+def test_question_below_threshold_misses(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"))
+    
+    # cos = 0.894
+    assert cache.lookup("folder-1", "openai", [1.0, 0.5]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_best_match_wins(cache):
+    cache.store("folder-1", "openai", [1.0, 0.2], answer("close"))
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("closest"))
+    
+    assert cache.lookup("folder-1", "openai", [1.0, 0.01]).response == "closest"
+
+
+def test_answers_are_scoped_to_folder_and_provider(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"))
+    
+    assert cache.lookup("folder-2", "openai", [1.0, 0.0]) is None
+    assert cache.lookup("folder-1", "gemini", [1.0, 0.0]) is None
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0]) is not None
+
+
+def test_returned_answer_is_a_copy(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"))
+    
+    cache.lookup("folder-1", "openai", [1.0, 0.0]).sources.append("other.pdf")
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0]).sources == ["a.pdf"]
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"))
+    
+    clock.advance(59)
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0]) is not None
+    clock.advance(2)
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0, 0.0], answer("x"))
+    cache.store("folder-1", "openai", [0.0, 1.0, 0.0], answer("y"))
+    cache.store("folder-1", "openai", [0.0, 0.0, 1.0], answer("z"))
+    
+    # Touch "x" so "y" becomes the least recently used
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0, 0.0]).response == "x"
+    cache.store("folder-2", "openai", [1.0, 0.0, 0.0], answer("w"))
+    
+    assert cache.stats()["entries"] == 3
+    assert cache.lookup("folder-1", "openai", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0, 0.0]).response == "x"
+    assert cache.lookup("folder-1", "openai", [0.0, 0.0, 1.0]).response == "z"
+
+
+def test_changed_folder_version_drops_stale_answers(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("cached"), version="3:100.0")
+    
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0], version="3:100.0") is not None
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0], version="4:120.0") is None
+    # The stale entry is gone, even for a lookup with the old version
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0], version="3:100.0") is None
+
+
+def test_invalidate_folders(cache):
+    cache.store("folder-1", "openai", [1.0, 0.0], answer("one"))
+    cache.store("folder-2", "openai", [1.0, 0.0], answer("two"))
+    
+    cache.invalidate_folders({"folder-1"})
+    assert cache.lookup("folder-1", "openai", [1.0, 0.0]) is None
+    assert cache.lookup("folder-2", "openai", [1.0, 0.0]) is not None
+    
+    cache.invalidate_folders(None)
+    assert cache.stats()["entries"] == 0
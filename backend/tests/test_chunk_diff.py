@@ -0,0 +1,103 @@
+import pytest
+from langchain_core.documents import Document
+
+from embedding_cache import chunk_hash
+from vector_store import VectorStore
+
+
+@pytest.fixture
+def diff():
+    # _diff_chunks needs no connections, so skip __init__
+    return VectorStore.__new__(VectorStore)._diff_chunks
+
+
+def doc(text, page, index, with_hash=True):
+    metadata = {"page": page, "chunk_index": index}
+    if with_hash:
+        metadata["chunk_hash"] = chunk_hash(text)
+    return Document(page_content=text, metadata=metadata)
+
+
+def stored(point_id, text, page, index):
+    return (point_id, (chunk_hash(text), page, index))
+
+
+def test_unchanged_file_keeps_every_chunk(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0), stored("b", "beta", 1, 1)],
+        [doc("alpha", 1, 0), doc("beta", 1, 1)]
+    )
+    assert new_documents == []
+    assert stale_ids == []
+    assert kept == 2
+
+
+def test_new_chunk_is_added(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0)],
+        [doc("alpha", 1, 0), doc("gamma", 2, 1)]
+    )
+    assert [d.page_content for d in new_documents] == ["gamma"]
+    assert stale_ids == []
+    assert kept == 1
+
+
+def test_vanished_chunk_is_removed(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0), stored("b", "beta", 1, 1)],
+        [doc("alpha", 1, 0)]
+    )
+    assert new_documents == []
+    assert stale_ids == ["b"]
+    assert kept == 1
+
+
+def test_edited_chunk_is_replaced(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0), stored("b", "beta", 1, 1)],
+        [doc("alpha", 1, 0), doc("beta, edited", 1, 1)]
+    )
+    assert [d.page_content for d in new_documents] == ["beta, edited"]
+    assert stale_ids == ["b"]
+    assert kept == 1
+
+
+def test_moved_chunk_is_replaced(diff):
+    # Same text at another position gets a new id, so it is re-added and the old copy removed
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0)],
+        [doc("alpha", 2, 0)]
+    )
+    assert [d.metadata["page"] for d in new_documents] == [2]
+    assert stale_ids == ["a"]
+    assert kept == 0
+
+
+def test_duplicate_stored_copies_are_removed(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0), stored("a-retry", "alpha", 1, 0)],
+        [doc("alpha", 1, 0)]
+    )
+    assert new_documents == []
+    assert stale_ids == ["a-retry"]
+    assert kept == 1
+
+
+def test_chunk_hash_is_computed_when_missing_from_metadata(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0)],
+        [doc("alpha", 1, 0, with_hash=False)]
+    )
+    assert new_documents == []
+    assert stale_ids == []
+    assert kept == 1
+
+
+def test_empty_file_removes_everything(diff):
+    new_documents, stale_ids, kept = diff(
+        [stored("a", "alpha", 1, 0), stored("b", "beta", 1, 1)],
+        []
+    )
+    assert new_documents == []
+    assert sorted(stale_ids) == ["a", "b"]
+    assert kept == 0
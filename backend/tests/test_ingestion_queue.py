@@ -0,0 +1,158 @@
+import pytest
+
+from config import config
+from ingestion_queue import IngestionQueue, QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED, CANCELLED
+
+
+@pytest.fixture
+def queue(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(config, "INGESTION_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(config, "INGESTION_RETRY_MAX_SECONDS", 60)
+    return IngestionQueue(tmp_path / "queue.db")
+
+
+def enqueue(queue, file_id, folder_id="folder-1", max_attempts=3):
+    return queue.enqueue(file_id, folder_id, f"{folder_id}/{file_id}.pdf", f"{file_id}.pdf", max_attempts=max_attempts)
+
+
+def test_claim_returns_jobs_in_order_and_leases_them(queue, clock):
+    first = enqueue(queue, "file-1")
+    clock.advance(1)
+    second = enqueue(queue, "file-2")
+    
+    claimed = queue.claim("worker-a", lease_seconds=30)
+    assert claimed["id"] == first["id"]
+    assert claimed["state"] == RUNNING
+    assert claimed["attempts"] == 1
+    assert claimed["lease_owner"] == "worker-a"
+    assert claimed["lease_expires_at"] == clock.now + 30
+    
+    assert queue.claim("worker-b", lease_seconds=30)["id"] == second["id"]
+    assert queue.claim("worker-c", lease_seconds=30) is None
+
+
+def test_enqueue_returns_the_active_job_for_a_file(queue):
+    job = enqueue(queue, "file-1")
+    assert enqueue(queue, "file-1")["id"] == job["id"]
+    assert queue.stats() == {QUEUED: 1}
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    job = enqueue(queue, "file-1")
+    queue.claim("worker-a", lease_seconds=30)
+    
+    clock.advance(29)
+    assert queue.claim("worker-b", lease_seconds=30) is None
+    
+    clock.advance(2)
+    reclaimed = queue.claim("worker-b", lease_seconds=30)
+    assert reclaimed["id"] == job["id"]
+    assert reclaimed["lease_owner"] == "worker-b"
+    assert reclaimed["attempts"] == 2
+    
+    # The first worker no longer owns the job
+    assert not queue.heartbeat(job["id"], "worker-a", 30)
+    assert not queue.complete(job["id"], "worker-a", 1)
+    assert queue.complete(job["id"], "worker-b", 5)
+    assert queue.get(job["id"])["state"] == SUCCEEDED
+
+
+def test_heartbeat_extends_the_lease(queue, clock):
+    job = enqueue(queue, "file-1")
+    queue.claim("worker-a", lease_seconds=30)
+    
+    clock.advance(20)
+    assert queue.heartbeat(job["id"], "worker-a", 30)
+    clock.advance(20)
+    assert queue.claim("worker-b", lease_seconds=30) is None
+
+
+def test_failed_attempts_back_off_exponentially(queue, clock):
+    job = enqueue(queue, "file-1", max_attempts=5)
+    
+    expected_delays = [10, 20, 40, 60]
+    for delay in expected_delays:
+        claimed = queue.claim("worker-a", lease_seconds=30)
+        assert claimed["id"] == job["id"]
+        
+        assert queue.fail(job["id"], "worker-a", "boom") == RETRYING
+        failed = queue.get(job["id"])
+        assert failed["run_after"] == clock.now + delay
+        assert failed["lease_owner"] is None
+        
+        # Not runnable until the backoff has passed
+        clock.advance(delay - 1)
+        assert queue.claim("worker-a", lease_seconds=30) is None
+        clock.advance(1)
+
+
+def test_job_is_dead_lettered_after_max_attempts(queue, clock):
+    job = enqueue(queue, "file-1", max_attempts=2)
+    
+    queue.claim("worker-a", lease_seconds=30)
+    assert queue.fail(job["id"], "worker-a", "first") == RETRYING
+    clock.advance(10)
+    
+    queue.claim("worker-a", lease_seconds=30)
+    assert queue.fail(job["id"], "worker-a", "second") == FAILED
+    
+    failed = queue.get(job["id"])
+    assert failed["state"] == FAILED
+    assert failed["attempts"] == 2
+    assert failed["last_error"] == "second"
+    assert failed["finished_at"] == clock.now
+    
+    clock.advance(3600)
+    assert queue.claim("worker-a", lease_seconds=30) is None
+
+
+def test_lease_expiring_on_the_final_attempt_fails_the_job(queue, clock):
+    job = enqueue(queue, "file-1", max_attempts=1)
+    queue.claim("worker-a", lease_seconds=30)
+    
+    clock.advance(31)
+    assert queue.claim("worker-b", lease_seconds=30) is None
+    assert queue.get(job["id"])["state"] == FAILED
+
+
+def test_retry_resets_attempts_unless_the_file_has_an_active_job(queue, clock):
+    job = enqueue(queue, "file-1", max_attempts=1)
+    queue.claim("worker-a", lease_seconds=30)
+    queue.fail(job["id"], "worker-a", "boom")
+    
+    retried = queue.retry(job["id"])
+    assert retried["id"] == job["id"]
+    assert retried["state"] == QUEUED
+    assert retried["attempts"] == 0
+    
+    queue.cancel_file_jobs("file-1")
+    newer = enqueue(queue, "file-1")
+    assert queue.retry(job["id"])["id"] == newer["id"]
+    assert queue.get(job["id"])["state"] == CANCELLED
+
+
+def test_cancel_folder_jobs_revokes_running_leases(queue, clock):
+    running = enqueue(queue, "file-1")
+    clock.advance(1)
+    queued = enqueue(queue, "file-2")
+    other = enqueue(queue, "file-3", folder_id="folder-2")
+    assert queue.claim("worker-a", lease_seconds=30)["id"] == running["id"]
+    
+    assert queue.cancel_folder_jobs("folder-1") == 2
+    assert queue.get(running["id"])["state"] == CANCELLED
+    assert queue.get(queued["id"])["state"] == CANCELLED
+    assert queue.get(other["id"])["state"] == QUEUED
+    assert not queue.heartbeat(running["id"], "worker-a", 30)
+    assert not queue.complete(running["id"], "worker-a", 1)
+    assert queue.lease_status(running["id"], "worker-a") == CANCELLED
+
+
+def test_lease_status_reports_a_reclaimed_job(queue, clock):
+    job = enqueue(queue, "file-1")
+    queue.claim("worker-a", lease_seconds=30)
+    assert queue.lease_status(job["id"], "worker-a") is None
+    
+    clock.advance(31)
+    queue.claim("worker-b", lease_seconds=30)
+    assert queue.lease_status(job["id"], "worker-a") == RUNNING
+    assert queue.lease_status(job["id"], "worker-b") is None
@@ -1,35 +1,75 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
+from collections import Counter
 import uuid
 import numpy as np
 from datetime import datetime
 import asyncio
 import json
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from langchain_qdrant import QdrantVectorStore
+import threading
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import PointStruct, PointIdsList, Filter, FieldCondition, MatchValue
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 from supabase import Client
 
+import qdrant_admin
 from config import config
+from embedding_cache import ChunkEmbeddingCache, chunk_hash
+from executors import run_vector_io
+
+# Namespace of the deterministic chunk ids (uuid5), shared by Qdrant point ids and document_vectors.chunk_id
+CHUNK_ID_NAMESPACE = uuid.UUID("6ec0a978-a642-48ff-9bc9-ff4fc253dad0")
+
+# Qdrant calls that write; they get the longer per-call timeout
+QDRANT_WRITE_METHODS = {"upsert", "delete", "set_payload", "delete_collection"}
+# Client methods that take a per-call timeout (qdrant-client >= 1.17); collection_exists does not
+# and is bounded by the client-wide timeout set in qdrant_admin.create_client
+QDRANT_TIMEOUT_METHODS = {"scroll", "query_points", "facet", "upsert", "delete", "set_payload", "delete_collection"}
+
+# Chunk metadata that describes the whole file; refreshed on kept chunks after an incremental re-index
+FILE_LEVEL_METADATA = ("filename", "storage_path", "content_hash", "total_pages", "low_text_pages", "extraction_method", "extraction_profile")
 
 class VectorStore:
-    def __init__(self, supabase_client: Client = None, use_supabase_vectors: bool = None):
+    def __init__(
+        self,
+        supabase_client: Client = None,
+        use_supabase_vectors: bool = None,
+        embeddings=None,
+        qdrant_client: Optional[QdrantClient] = None,
+        chunk_cache: Optional[ChunkEmbeddingCache] = None,
+        async_qdrant_client: Optional[AsyncQdrantClient] = None
+    ):
         self.supabase = supabase_client
+        # Cleared when document_vectors lacks the unique chunk_id index that upserts need
+        self._supabase_upsert = True
+        # Embeddings of chunks seen before are reused instead of recomputed
+        self.chunk_cache = chunk_cache
+        # Searches, scrolls and writes go through the async client when one is provided;
+        # the sync client stays in use for collection setup and admin calls
+        self.async_qdrant_client = async_qdrant_client
+        # Per-folder collections known to exist ("collection" partitioning)
+        self._known_collections = set()
+        self._collections_lock = threading.Lock()
         self.supabase_available = False
         self.qdrant_available = False
         
+        # Callbacks told which folders changed whenever vectors are added or deleted
+        self._change_listeners: List[Callable[[Optional[Iterable[str]]], None]] = []
+        
         # Set use_supabase_vectors from parameter or config
         self.use_supabase_vectors = use_supabase_vectors
         if self.use_supabase_vectors is None:
             self.use_supabase_vectors = config.USE_SUPABASE_VECTORS if hasattr(config, 'USE_SUPABASE_VECTORS') else False
         
-        # Initialize HuggingFace embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # Reuse the shared embedding model when one is provided (see dependencies.get_vector_store)
+        if embeddings is not None:
+            self.embeddings = embeddings
+        else:
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name=config.EMBEDDING_MODEL,
+                model_kwargs={'device': 'cpu'},
+                encode_kwargs={'normalize_embeddings': True}
+            )
         self.embedding_dimension = config.EMBEDDING_DIMENSION
         print("Using HuggingFace embeddings")
         
@@ -39,7 +79,7 @@ class VectorStore:
             print(f"Supabase vector storage available: {self.supabase_available}")
         
         # Always initialize Qdrant as backup
-        self.qdrant_available = self._init_qdrant()
+        self.qdrant_available = self._init_qdrant(qdrant_client)
         
         if not self.supabase_available and not self.qdrant_available:
             raise Exception("Both Supabase and Qdrant vector stores failed to initialize")
@@ -99,32 +139,21 @@ class VectorStore:
             print(f"Failed to initialize Supabase vectors: {e}")
             return False
     
-    def _init_qdrant(self) -> bool:
+    def _init_qdrant(self, qdrant_client: Optional[QdrantClient] = None) -> bool:
         """Initialize Qdrant vector store"""
         try:
+            self.collection_profile = qdrant_admin.collection_profile()
+            self.search_params = qdrant_admin.search_params(self.collection_profile)
+            
             # Initialize Qdrant client
-            if config.QDRANT_API_KEY:
-                self.qdrant_client = QdrantClient(
-                    host=config.QDRANT_HOST,
-                    port=config.QDRANT_PORT,
-                    api_key=config.QDRANT_API_KEY
-                )
+            if qdrant_client is not None:
+                self.qdrant_client = qdrant_client
             else:
-                self.qdrant_client = QdrantClient(
-                    host=config.QDRANT_HOST,
-                    port=config.QDRANT_PORT
-                )
+                self.qdrant_client = qdrant_admin.create_client()
             
             # Initialize collection
             self._init_qdrant_collection()
             
-            # Initialize Langchain vector store
-            self.qdrant_vector_store = QdrantVectorStore(
-                client=self.qdrant_client,
-                collection_name=config.QDRANT_COLLECTION_NAME,
-                embedding=self.embeddings,
-            )
-            
             print("Qdrant vector storage initialized successfully")
             return True
             
@@ -139,31 +168,202 @@ class VectorStore:
             collection_names = [col.name for col in collections]
             
             if config.QDRANT_COLLECTION_NAME not in collection_names:
-                self.qdrant_client.create_collection(
-                    collection_name=config.QDRANT_COLLECTION_NAME,
-                    vectors_config=VectorParams(
-                        size=self.embedding_dimension,
-                        distance=Distance.COSINE
-                    ),
+                # Storage, quantization and HNSW settings come from the configured collection profile
+                qdrant_admin.create_collection(
+                    self.qdrant_client,
+                    config.QDRANT_COLLECTION_NAME,
+                    self.collection_profile,
+                    self.embedding_dimension
                 )
-                print(f"Created Qdrant collection: {config.QDRANT_COLLECTION_NAME}")
+                print(f"Created Qdrant collection: {config.QDRANT_COLLECTION_NAME} ({self.collection_profile['name']} profile)")
         except Exception as e:
             print(f"Error initializing Qdrant collection: {e}")
             raise
+        
+        # Every search, scroll and delete filters on these fields; without indexes Qdrant scans payloads
+        if config.QDRANT_CREATE_PAYLOAD_INDEXES:
+            try:
+                self.ensure_payload_indexes()
+            except Exception as e:
+                print(f"Could not create Qdrant payload indexes: {e}")
+        missing = self.check_payload_indexes()["missing"]
+        if missing:
+            print(f"Warning: Qdrant collection {config.QDRANT_COLLECTION_NAME} has no payload index on {', '.join(missing)}; "
+                  f"filtered search and deletes will scan payloads")
     
-    async def add_documents(self, documents: List[Document], file_id: str) -> List[str]:
-        """Add documents to vector store with automatic fallback"""
-        if not documents:
-            print(f"No documents to add for file {file_id}")
-            return []
+    async def _qdrant(self, method: str, *args, **kwargs):
+        """
+        Run one Qdrant client call with a per-call deadline: natively on the
+        async client (REST or gRPC) when configured, otherwise on the vector
+        I/O pool with the sync client.
+        """
+        timeout = config.QDRANT_WRITE_TIMEOUT_SECONDS if method in QDRANT_WRITE_METHODS else config.QDRANT_TIMEOUT_SECONDS
+        if method in QDRANT_TIMEOUT_METHODS:
+            # Enforced by the client itself on both paths, so the request is abandoned and not just the await
+            kwargs.setdefault("timeout", max(1, int(timeout)))
+        if self.async_qdrant_client is None:
+            # No wait_for here: cancelling the await would leave the call running on the pool thread,
+            # so reads and writes rely on the per-call timeout above
+            return await run_vector_io(getattr(self.qdrant_client, method), *args, **kwargs)
+        try:
+            return await asyncio.wait_for(getattr(self.async_qdrant_client, method)(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Qdrant {method} timed out after {timeout:.0f}s")
+    
+    def _create_collection_if_missing(self, collection_name: str) -> None:
+        with self._collections_lock:
+            if collection_name in self._known_collections:
+                return
+            if not self.qdrant_client.collection_exists(collection_name):
+                qdrant_admin.create_collection(
+                    self.qdrant_client, collection_name, self.collection_profile, self.embedding_dimension
+                )
+                if config.QDRANT_CREATE_PAYLOAD_INDEXES:
+                    qdrant_admin.ensure_payload_indexes(self.qdrant_client, collection_name)
+                print(f"Created Qdrant collection: {collection_name}")
+            self._known_collections.add(collection_name)
+    
+    async def _write_collection(self, folder_id: Optional[str]) -> str:
+        """Collection that a folder's vectors are written to, created on demand for per-folder collections"""
+        if config.QDRANT_PARTITIONING != "collection" or not folder_id:
+            return config.QDRANT_COLLECTION_NAME
+        collection_name = qdrant_admin.folder_collection_name(folder_id)
+        if collection_name not in self._known_collections:
+            await run_vector_io(self._create_collection_if_missing, collection_name)
+        return collection_name
+    
+    async def _read_collections(self, folder_id: Optional[str]) -> List[str]:
+        """
+        Collections to read when looking for a folder's (or, without a folder,
+        any) vectors. Only per-folder collections need more than one.
+        """
+        if config.QDRANT_PARTITIONING != "collection":
+            return [config.QDRANT_COLLECTION_NAME]
+        if not folder_id:
+            return await run_vector_io(qdrant_admin.list_folder_collections, self.qdrant_client)
         
-        # Validate and prepare documents
+        collection_name = qdrant_admin.folder_collection_name(folder_id)
+        if collection_name not in self._known_collections:
+            if not await self._qdrant("collection_exists", collection_name):
+                # Nothing has been written to this folder yet
+                return []
+            self._known_collections.add(collection_name)
+        return [collection_name]
+    
+    def check_payload_indexes(self) -> Dict[str, List[str]]:
+        """Which of the configured filter fields have a keyword payload index and which are missing"""
+        return qdrant_admin.check_payload_indexes(self.qdrant_client, config.QDRANT_COLLECTION_NAME)
+    
+    def ensure_payload_indexes(self) -> List[str]:
+        """Create the missing keyword payload indexes; returns the fields that were added"""
+        return qdrant_admin.ensure_payload_indexes(self.qdrant_client, config.QDRANT_COLLECTION_NAME)
+    
+    def add_change_listener(self, listener: Callable[[Optional[Iterable[str]]], None]):
+        """Register a callback that receives the affected folder ids (None when unknown) after writes"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, folder_ids: Optional[Iterable[str]]):
+        for listener in self._change_listeners:
+            try:
+                listener(folder_ids)
+            except Exception as e:
+                print(f"Vector store change listener failed: {e}")
+    
+    async def get_storage_info(self) -> Dict[str, Any]:
+        """Describe which vector backends are active"""
+        return {
+            "primary_storage": "supabase" if self.supabase_available else "qdrant",
+            "supabase_available": self.supabase_available,
+            "qdrant_available": self.qdrant_available,
+            "using_supabase_vectors": self.use_supabase_vectors,
+            "collection_name": config.QDRANT_COLLECTION_NAME,
+            "partitioning": config.QDRANT_PARTITIONING,
+            "qdrant_async_client": self.async_qdrant_client is not None,
+            "qdrant_prefer_grpc": config.QDRANT_PREFER_GRPC
+        }
+    
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a search query without blocking the event loop"""
+        return await self.embeddings.aembed_query(text)
+    
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks without blocking the event loop"""
+        return await self.embeddings.aembed_documents(texts)
+    
+    async def _embed_chunks(self, documents: List[Document]) -> List[List[float]]:
+        """
+        Embeddings for document chunks in order. Hits in the chunk cache are
+        looked up in one bulk read; only the misses go through the model.
+        """
+        if self.chunk_cache is None:
+            return await self.embed_documents([doc.page_content for doc in documents])
+        
+        model_name = config.EMBEDDING_MODEL
+        hashes = []
+        for doc in documents:
+            if not doc.metadata.get("chunk_hash"):
+                doc.metadata["chunk_hash"] = chunk_hash(doc.page_content)
+            hashes.append(doc.metadata["chunk_hash"])
+        
+        cached = await run_vector_io(self.chunk_cache.get_many, model_name, hashes)
+        
+        # Identical chunks within the batch are embedded once
+        missing = {}
+        for key, doc in zip(hashes, documents):
+            if key not in cached and key not in missing:
+                missing[key] = doc.page_content
+        if missing:
+            vectors = await self.embed_documents(list(missing.values()))
+            embedded = dict(zip(missing.keys(), vectors))
+            await run_vector_io(self.chunk_cache.put_many, model_name, embedded)
+            cached.update(embedded)
+        
+        return [cached[key] for key in hashes]
+    
+    async def _supabase_ready(self) -> bool:
+        """Supabase vectors are enabled and the database answers (checked off the event loop)"""
+        return self.supabase_available and await run_vector_io(self._check_supabase_connection)
+    
+    @staticmethod
+    def _build_qdrant_filter(filter_dict: Optional[Dict[str, Any]]) -> Optional[Filter]:
+        """Translate a flat metadata filter into a Qdrant filter"""
+        if not filter_dict:
+            return None
+        return Filter(must=[
+            FieldCondition(key=f"metadata.{key}", match=MatchValue(value=value))
+            for key, value in filter_dict.items()
+        ])
+    
+    @staticmethod
+    def _point_to_document(point) -> Document:
+        """Convert a Qdrant point (langchain payload layout) back into a Document"""
+        payload = point.payload or {}
+        return Document(page_content=payload.get("page_content", ""), metadata=payload.get("metadata") or {})
+    
+    @staticmethod
+    def chunk_point_id(file_id: str, key: Tuple[str, Any, Any]) -> str:
+        """Stable id of a chunk: the same file, text and position always map to the same point"""
+        content_hash, page, chunk_index = key
+        return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{file_id}:{content_hash}:{page}:{chunk_index}"))
+    
+    def _prepare_documents(self, documents: List[Document], file_id: str) -> List[Document]:
+        """Drop empty chunks and tag the rest with their file, full chunk hash and deterministic id"""
         valid_documents = []
         for doc in documents:
             if doc.page_content and len(doc.page_content.strip()) > 0:
                 doc.metadata["file_id"] = file_id
+                doc.metadata["chunk_hash"] = doc.metadata.get("chunk_hash") or chunk_hash(doc.page_content)
+                doc.metadata["chunk_id"] = self.chunk_point_id(file_id, self._chunk_key(doc.page_content, doc.metadata))
                 valid_documents.append(doc)
+        return valid_documents
+    
+    async def add_documents(self, documents: List[Document], file_id: str) -> List[str]:
+        """Add documents to vector store with automatic fallback"""
+        if not documents:
+            print(f"No documents to add for file {file_id}")
+            return []
         
+        valid_documents = self._prepare_documents(documents, file_id)
         if not valid_documents:
             print(f"No valid documents after filtering for file {file_id}")
             return []
@@ -175,7 +375,7 @@ class VectorStore:
         qdrant_success = False
         
         # Try Supabase first if available
-        if self.supabase_available and self._check_supabase_connection():
+        if await self._supabase_ready():
             try:
                 ids = await self._add_documents_supabase(valid_documents)
                 supabase_success = True
@@ -200,6 +400,8 @@ class VectorStore:
         if not supabase_success and not qdrant_success:
             raise Exception("Failed to add documents to both Supabase and Qdrant")
         
+        self._notify_change({doc.metadata["folder_id"] for doc in valid_documents if doc.metadata.get("folder_id")})
+        
         return ids
     
     async def _add_documents_supabase(self, documents: List[Document]) -> List[str]:
@@ -211,15 +413,14 @@ class VectorStore:
             batch_size = 50
             for i in range(0, len(documents), batch_size):
                 batch_docs = documents[i:i+batch_size]
-                texts = [doc.page_content for doc in batch_docs]
                 
-                # Generate embeddings
-                embeddings = self.embeddings.embed_documents(texts)
+                # Generate embeddings (cached chunks are not embedded again)
+                embeddings = await self._embed_chunks(batch_docs)
                 
                 # Prepare data for insertion
                 rows = []
                 for j, (doc, embedding) in enumerate(zip(batch_docs, embeddings)):
-                    chunk_id = doc.metadata.get('chunk_id', str(uuid.uuid4()))
+                    chunk_id = doc.metadata['chunk_id']
                     
                     # Prepare row data
                     row_data = {
@@ -237,8 +438,8 @@ class VectorStore:
                     rows.append(row_data)
                     ids.append(chunk_id)
                 
-                # Insert into Supabase
-                response = self.supabase.table('document_vectors').insert(rows).execute()
+                # Upsert into Supabase so retried batches overwrite instead of duplicating
+                response = await self._write_supabase_rows(rows)
                 
                 if not response.data:
                     raise Exception("Failed to insert documents into Supabase")
@@ -251,20 +452,60 @@ class VectorStore:
             print(f"Error adding documents to Supabase: {e}")
             raise
     
+    async def _write_supabase_rows(self, rows: List[Dict[str, Any]]):
+        """
+        Upsert document_vectors rows on chunk_id. Needs a unique index:
+        
+            create unique index if not exists document_vectors_chunk_id_key
+                on document_vectors (chunk_id);
+        
+        Without it, rows with the same chunk_id are deleted and inserted again.
+        """
+        if self._supabase_upsert:
+            try:
+                return await run_vector_io(
+                    self.supabase.table('document_vectors').upsert(rows, on_conflict='chunk_id').execute
+                )
+            except Exception as e:
+                if "42P10" not in str(e) and "unique or exclusion constraint" not in str(e):
+                    raise
+                print("document_vectors has no unique index on chunk_id; falling back to delete + insert")
+                self._supabase_upsert = False
+        
+        await run_vector_io(
+            self.supabase.table('document_vectors').delete().in_('chunk_id', [row['chunk_id'] for row in rows]).execute
+        )
+        return await run_vector_io(self.supabase.table('document_vectors').insert(rows).execute)
+    
     async def _add_documents_qdrant(self, documents: List[Document]) -> List[str]:
-        """Add documents to Qdrant"""
-        ids = [str(uuid.uuid4()) for _ in documents]
+        """Add documents to Qdrant (upserts on the deterministic chunk ids)"""
+        ids = [doc.metadata["chunk_id"] for doc in documents]
         
         try:
+            # All chunks of a file belong to one folder
+            collection_name = await self._write_collection(documents[0].metadata.get("folder_id"))
+            
             # Add documents in batches to avoid memory issues
             batch_size = 100
             for i in range(0, len(documents), batch_size):
                 batch_docs = documents[i:i+batch_size]
                 batch_ids = ids[i:i+batch_size]
                 
-                self.qdrant_vector_store.add_documents(
-                    documents=batch_docs,
-                    ids=batch_ids
+                vectors = await self._embed_chunks(batch_docs)
+                
+                # Same payload layout as langchain's QdrantVectorStore, so existing points stay readable
+                points = [
+                    PointStruct(
+                        id=point_id,
+                        vector=vector,
+                        payload={"page_content": doc.page_content, "metadata": doc.metadata}
+                    )
+                    for point_id, vector, doc in zip(batch_ids, vectors, batch_docs)
+                ]
+                await self._qdrant(
+                    "upsert",
+                    collection_name=collection_name,
+                    points=points
                 )
                 print(f"Added batch {i//batch_size + 1} to Qdrant ({len(batch_docs)} docs)")
             
@@ -273,6 +514,169 @@ class VectorStore:
             print(f"Error adding documents to Qdrant: {e}")
             raise
     
+    @staticmethod
+    def _chunk_key(content: str, metadata: Dict[str, Any]) -> Tuple[str, Any, Any]:
+        """Identity of a chunk within its file: its text and its position"""
+        return (metadata.get("chunk_hash") or chunk_hash(content), metadata.get("page"), metadata.get("chunk_index"))
+    
+    def _diff_chunks(
+        self,
+        stored: List[Tuple[Any, Tuple[str, Any, Any]]],
+        documents: List[Document]
+    ) -> Tuple[List[Document], List[Any], int]:
+        """
+        Compare stored (id, key) pairs with the new chunk set. Returns the
+        documents to add, the stored ids to remove and the number of chunks kept.
+        Duplicate copies of a stored chunk (left behind by retries) are removed.
+        """
+        stored_ids: Dict[Tuple[str, Any, Any], Any] = {}
+        stale_ids = []
+        for point_id, key in stored:
+            if key in stored_ids:
+                stale_ids.append(point_id)
+            else:
+                stored_ids[key] = point_id
+        
+        new_documents = []
+        kept_keys = set()
+        for doc in documents:
+            key = self._chunk_key(doc.page_content, doc.metadata)
+            if key in stored_ids and key not in kept_keys:
+                kept_keys.add(key)
+            else:
+                new_documents.append(doc)
+        
+        stale_ids.extend(point_id for key, point_id in stored_ids.items() if key not in kept_keys)
+        return new_documents, stale_ids, len(kept_keys)
+    
+    async def sync_file_documents(self, documents: List[Document], file_id: str) -> Dict[str, int]:
+        """
+        Incrementally re-index a file: chunks are compared with the stored ones
+        by hash and position, so only new chunks are inserted, chunks that
+        disappeared are deleted and unchanged vectors stay where they are.
+        Returns the added / removed / kept counts.
+        """
+        valid_documents = self._prepare_documents(documents, file_id)
+        if not valid_documents:
+            raise Exception(f"No valid documents after filtering for file {file_id}")
+        
+        result = None
+        if await self._supabase_ready():
+            try:
+                result = await self._sync_file(
+                    valid_documents, file_id,
+                    self._stored_chunks_supabase, self._add_documents_supabase,
+                    self._delete_supabase_ids, self._refresh_file_metadata_supabase
+                )
+            except Exception as e:
+                print(f"Failed to sync documents to Supabase: {e}")
+        
+        if result is None and self.qdrant_available:
+            try:
+                result = await self._sync_file(
+                    valid_documents, file_id,
+                    self._stored_chunks_qdrant, self._add_documents_qdrant,
+                    self._delete_qdrant_ids, self._refresh_file_metadata_qdrant
+                )
+            except Exception as e:
+                print(f"Failed to sync documents to Qdrant: {e}")
+        
+        if result is None:
+            raise Exception("Failed to sync documents to both Supabase and Qdrant")
+        
+        print(f"Re-indexed file {file_id}: {result['added']} added, {result['removed']} removed, {result['kept']} kept")
+        self._notify_change({doc.metadata["folder_id"] for doc in valid_documents if doc.metadata.get("folder_id")})
+        return result
+    
+    async def _sync_file(self, documents, file_id, load_stored, add, delete_ids, refresh_metadata) -> Dict[str, int]:
+        folder_id = documents[0].metadata.get("folder_id")
+        stored = await load_stored(file_id, folder_id)
+        new_documents, stale_ids, kept = self._diff_chunks(stored, documents)
+        
+        # Insert before deleting so the file never disappears from search mid-update
+        if new_documents:
+            await add(new_documents)
+        if stale_ids:
+            await delete_ids(stale_ids, folder_id)
+        if kept:
+            await refresh_metadata(file_id, documents[0].metadata)
+        
+        return {"chunk_count": len(documents), "added": len(new_documents), "removed": len(stale_ids), "kept": kept}
+    
+    async def _stored_chunks_supabase(self, file_id: str, folder_id: Optional[str] = None) -> List[Tuple[Any, Tuple[str, Any, Any]]]:
+        stored = []
+        page_size = 1000
+        offset = 0
+        while True:
+            response = await run_vector_io(
+                self.supabase.table('document_vectors').select('id, content, metadata').eq(
+                    'file_id', file_id
+                ).range(offset, offset + page_size - 1).execute
+            )
+            rows = response.data or []
+            for row in rows:
+                metadata = row.get('metadata') or {}
+                if isinstance(metadata, str):
+                    metadata = json.loads(metadata)
+                stored.append((row['id'], self._chunk_key(row.get('content') or "", metadata)))
+            if len(rows) < page_size:
+                return stored
+            offset += page_size
+    
+    async def _stored_chunks_qdrant(self, file_id: str, folder_id: Optional[str] = None) -> List[Tuple[Any, Tuple[str, Any, Any]]]:
+        stored = []
+        for collection_name in await self._read_collections(folder_id):
+            offset = None
+            while True:
+                points, offset = await self._qdrant(
+                    "scroll",
+                    collection_name=collection_name,
+                    scroll_filter=self._build_qdrant_filter({"file_id": file_id}),
+                    limit=1000,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    stored.append((point.id, self._chunk_key(payload.get("page_content", ""), payload.get("metadata") or {})))
+                if offset is None:
+                    break
+        return stored
+    
+    async def _delete_supabase_ids(self, ids: List[Any], folder_id: Optional[str] = None):
+        batch_size = 200
+        for i in range(0, len(ids), batch_size):
+            await run_vector_io(self.supabase.table('document_vectors').delete().in_('id', ids[i:i+batch_size]).execute)
+    
+    async def _delete_qdrant_ids(self, ids: List[Any], folder_id: Optional[str] = None):
+        for collection_name in await self._read_collections(folder_id):
+            await self._qdrant(
+                "delete",
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=ids)
+            )
+    
+    async def _refresh_file_metadata_supabase(self, file_id: str, metadata: Dict[str, Any]):
+        # Only the per-file columns; the metadata JSON of kept rows is left as stored
+        await run_vector_io(
+            self.supabase.table('document_vectors').update({
+                'total_pages': metadata.get('total_pages'),
+                'extraction_method': metadata.get('extraction_method', 'unknown')
+            }).eq('file_id', file_id).execute
+        )
+    
+    async def _refresh_file_metadata_qdrant(self, file_id: str, metadata: Dict[str, Any]):
+        # Merged into the nested metadata object of every point of the file in one call
+        for collection_name in await self._read_collections(metadata.get("folder_id")):
+            await self._qdrant(
+                "set_payload",
+                collection_name=collection_name,
+                payload={key: metadata[key] for key in FILE_LEVEL_METADATA if key in metadata},
+                key="metadata",
+                points=self._build_qdrant_filter({"file_id": file_id})
+            )
+    
     async def similarity_search(
         self, 
         query: str, 
@@ -285,7 +689,7 @@ class VectorStore:
         qdrant_success = False
         
         # Try Supabase first if available
-        if self.supabase_available and self._check_supabase_connection():
+        if await self._supabase_ready():
             try:
                 results = await self._search_supabase(query, k, filter_dict)
                 if results:
@@ -321,7 +725,7 @@ class VectorStore:
         qdrant_success = False
         
         # Try Supabase first if available
-        if self.supabase_available and self._check_supabase_connection():
+        if await self._supabase_ready():
             try:
                 results = await self._search_with_score_supabase(query, k, filter_dict)
                 if results:
@@ -352,50 +756,8 @@ class VectorStore:
         filter_dict: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
         """Search using Supabase pgvector"""
-        try:
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query)
-            
-            # Prepare parameters for the function call
-            params = {
-                'query_embedding': query_embedding,
-                'match_count': k
-            }
-            
-            if filter_dict:
-                if 'file_id' in filter_dict:
-                    params['filter_file_id'] = filter_dict['file_id']
-                if 'folder_id' in filter_dict:
-                    params['filter_folder_id'] = filter_dict['folder_id']
-            
-            # Call the vector_search function
-            response = self.supabase.rpc('vector_search', params).execute()
-            
-            if not response.data:
-                return []
-            
-            # Convert results to Document objects
-            documents = []
-            for row in response.data:
-                # Parse metadata if it's a string
-                metadata = row['metadata']
-                if isinstance(metadata, str):
-                    try:
-                        metadata = json.loads(metadata)
-                    except:
-                        metadata = {}
-                
-                doc = Document(
-                    page_content=row['content'],
-                    metadata=metadata
-                )
-                documents.append(doc)
-            
-            return documents
-            
-        except Exception as e:
-            print(f"Supabase search error: {e}")
-            raise
+        results = await self._search_with_score_supabase(query, k, filter_dict)
+        return [doc for doc, _ in results]
     
     async def _search_with_score_supabase(
         self,
@@ -406,7 +768,7 @@ class VectorStore:
         """Search with scores using Supabase pgvector"""
         try:
             # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query)
+            query_embedding = await self.embed_query(query)
             
             # Prepare parameters
             params = {
@@ -421,7 +783,7 @@ class VectorStore:
                     params['filter_folder_id'] = filter_dict['folder_id']
             
             # Call the vector_search function
-            response = self.supabase.rpc('vector_search', params).execute()
+            response = await run_vector_io(self.supabase.rpc('vector_search', params).execute)
             
             if not response.data:
                 return []
@@ -457,27 +819,8 @@ class VectorStore:
         filter_dict: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
         """Search using Qdrant"""
-        if filter_dict:
-            must_conditions = []
-            for key, value in filter_dict.items():
-                must_conditions.append({
-                    "key": f"metadata.{key}",
-                    "match": {"value": value}
-                })
-            
-            search_kwargs = {
-                "k": k,
-                "filter": {"must": must_conditions}
-            }
-        else:
-            search_kwargs = {"k": k}
-        
-        results = self.qdrant_vector_store.similarity_search(
-            query=query,
-            **search_kwargs
-        )
-        
-        return results
+        results = await self._search_with_score_qdrant(query, k, filter_dict)
+        return [doc for doc, _ in results]
     
     async def _search_with_score_qdrant(
         self,
@@ -486,34 +829,243 @@ class VectorStore:
         filter_dict: Optional[Dict[str, Any]] = None
     ) -> List[Tuple[Document, float]]:
         """Search with scores using Qdrant"""
-        if filter_dict:
-            must_conditions = []
-            for key, value in filter_dict.items():
-                must_conditions.append({
-                    "key": f"metadata.{key}",
-                    "match": {"value": value}
-                })
-            
-            search_kwargs = {
-                "k": k,
-                "filter": {"must": must_conditions}
-            }
-        else:
-            search_kwargs = {"k": k}
+        query_embedding = await self.embed_query(query)
+        
+        # A folder filter routes to that folder's partition; anything else searches every partition
+        collections = await self._read_collections((filter_dict or {}).get("folder_id"))
+        responses = await asyncio.gather(*[
+            self._qdrant(
+                "query_points",
+                collection_name=collection_name,
+                query=query_embedding,
+                query_filter=self._build_qdrant_filter(filter_dict),
+                search_params=self.search_params,
+                limit=k,
+                with_payload=True
+            )
+            for collection_name in collections
+        ])
+        
+        points = [point for response in responses for point in response.points]
+        if len(responses) > 1:
+            points = sorted(points, key=lambda point: point.score, reverse=True)[:k]
+        return [(self._point_to_document(point), point.score) for point in points]
+    
+    async def get_folder_vector_counts(self, folder_id: str) -> Dict[str, int]:
+        """Number of stored vectors per file in a folder, fetched with one grouped query"""
+        if await self._supabase_ready():
+            try:
+                return await self._folder_counts_supabase(folder_id)
+            except Exception as e:
+                print(f"Supabase folder count failed: {e}")
+        
+        if self.qdrant_available:
+            return await self._folder_counts_qdrant(folder_id)
+        
+        raise Exception("No vector store available for counting")
+    
+    async def _folder_counts_supabase(self, folder_id: str) -> Dict[str, int]:
+        """
+        Grouped counts from Supabase. Uses the folder_vector_counts RPC when
+        it is installed:
+        
+            create or replace function folder_vector_counts(filter_folder_id uuid)
+            returns table (file_id uuid, vector_count bigint) language sql stable as $$
+                select file_id, count(*) from document_vectors
+                where folder_id = filter_folder_id group by file_id
+            $$;
         
-        results = self.qdrant_vector_store.similarity_search_with_score(
-            query=query,
-            **search_kwargs
+        and otherwise counts a single paged select of file_id values.
+        """
+        try:
+            response = await run_vector_io(
+                self.supabase.rpc('folder_vector_counts', {'filter_folder_id': folder_id}).execute
+            )
+            return {str(row['file_id']): int(row['vector_count']) for row in (response.data or [])}
+        except Exception as e:
+            print(f"folder_vector_counts RPC unavailable, counting rows instead: {e}")
+        
+        counts = Counter()
+        page_size = 1000
+        offset = 0
+        while True:
+            response = await run_vector_io(
+                self.supabase.table('document_vectors').select('file_id').eq(
+                    'folder_id', folder_id
+                ).range(offset, offset + page_size - 1).execute
+            )
+            rows = response.data or []
+            counts.update(str(row['file_id']) for row in rows)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        return dict(counts)
+    
+    async def _folder_counts_qdrant(self, folder_id: str) -> Dict[str, int]:
+        """Grouped counts from Qdrant via the facet API, falling back to a payload-only scroll"""
+        folder_filter = Filter(
+            must=[FieldCondition(key="metadata.folder_id", match=MatchValue(value=folder_id))]
         )
+        collections = await self._read_collections(folder_id)
+        if not collections:
+            return {}
+        collection_name = collections[0]
         
-        return results
+        try:
+            response = await self._qdrant(
+                "facet",
+                collection_name=collection_name,
+                key="metadata.file_id",
+                facet_filter=folder_filter,
+                limit=100000,
+                exact=True
+            )
+            return {str(hit.value): int(hit.count) for hit in response.hits}
+        except Exception as e:
+            print(f"Qdrant facet unavailable, scrolling payloads instead: {e}")
+        
+        counts = Counter()
+        offset = None
+        while True:
+            points, offset = await self._qdrant(
+                "scroll",
+                collection_name=collection_name,
+                scroll_filter=folder_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=["metadata.file_id"],
+                with_vectors=False
+            )
+            counts.update(
+                str((point.payload or {}).get("metadata", {}).get("file_id")) for point in points
+            )
+            if offset is None:
+                break
+        return dict(counts)
     
-    async def delete_by_file_id(self, file_id: str):
+    async def clone_file_vectors(
+        self,
+        source_file_id: str,
+        target_file_id: str,
+        target_folder_id: str,
+        metadata_updates: Optional[Dict[str, Any]] = None,
+        source_folder_id: Optional[str] = None
+    ) -> int:
+        """
+        Copy every vector of source_file_id to a new file/folder without
+        re-embedding, re-tagging the payload metadata. Returns the number of
+        chunks copied (0 when the source has no vectors in either store).
+        """
+        updates = {**(metadata_updates or {}), "file_id": target_file_id, "folder_id": target_folder_id}
+        copied = 0
+        
+        if await self._supabase_ready():
+            copied = await self._clone_supabase_vectors(source_file_id, updates)
+        if not copied and self.qdrant_available:
+            copied = await self._clone_qdrant_vectors(source_file_id, updates, source_folder_id)
+        
+        if copied:
+            self._notify_change({target_folder_id})
+        return copied
+    
+    async def _clone_supabase_vectors(self, source_file_id: str, updates: Dict[str, Any]) -> int:
+        """Copy pgvector rows page by page; embeddings are passed through as stored"""
+        copied = 0
+        page_size = 500
+        offset = 0
+        while True:
+            response = await run_vector_io(
+                self.supabase.table('document_vectors').select(
+                    'content, metadata, embedding, chunk_index, chunk_id, page_number, total_pages, extraction_method'
+                ).eq('file_id', source_file_id).order('chunk_index').range(offset, offset + page_size - 1).execute
+            )
+            rows = response.data or []
+            if not rows:
+                break
+            
+            new_rows = []
+            for row in rows:
+                metadata = row.get('metadata') or {}
+                if isinstance(metadata, str):
+                    metadata = json.loads(metadata)
+                key = self._chunk_key(row.get('content') or "", metadata)
+                chunk_id = self.chunk_point_id(updates['file_id'], key)
+                new_rows.append({
+                    **row,
+                    'file_id': updates['file_id'],
+                    'folder_id': updates['folder_id'],
+                    'chunk_id': chunk_id,
+                    'metadata': json.dumps({**metadata, **updates, 'chunk_hash': key[0], 'chunk_id': chunk_id})
+                })
+            
+            await self._write_supabase_rows(new_rows)
+            copied += len(new_rows)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        return copied
+    
+    async def _clone_qdrant_vectors(
+        self,
+        source_file_id: str,
+        updates: Dict[str, Any],
+        source_folder_id: Optional[str] = None
+    ) -> int:
+        """Scroll the source points with their vectors and upsert re-tagged copies"""
+        source_filter = self._build_qdrant_filter({"file_id": source_file_id})
+        target_collection = await self._write_collection(updates["folder_id"])
+        copied = 0
+        for source_collection in await self._read_collections(source_folder_id):
+            copied += await self._copy_qdrant_points(source_collection, source_filter, target_collection, updates)
+        return copied
+    
+    async def _copy_qdrant_points(
+        self,
+        source_collection: str,
+        source_filter: Filter,
+        target_collection: str,
+        updates: Dict[str, Any]
+    ) -> int:
+        copied = 0
+        offset = None
+        while True:
+            points, offset = await self._qdrant(
+                "scroll",
+                collection_name=source_collection,
+                scroll_filter=source_filter,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                copies = []
+                for point in points:
+                    payload = point.payload or {}
+                    metadata = payload.get("metadata") or {}
+                    key = self._chunk_key(payload.get("page_content", ""), metadata)
+                    point_id = self.chunk_point_id(updates["file_id"], key)
+                    copies.append(PointStruct(
+                        id=point_id,
+                        vector=point.vector,
+                        payload={**payload, "metadata": {**metadata, **updates, "chunk_hash": key[0], "chunk_id": point_id}}
+                    ))
+                await self._qdrant(
+                    "upsert",
+                    collection_name=target_collection,
+                    points=copies
+                )
+                copied += len(copies)
+            if offset is None:
+                break
+        return copied
+    
+    async def delete_by_file_id(self, file_id: str, folder_id: Optional[str] = None):
         """Delete all vectors associated with a file from both stores"""
         errors = []
         
         # Try to delete from Supabase
-        if self.supabase_available and self._check_supabase_connection():
+        if await self._supabase_ready():
             try:
                 await self._delete_supabase_vectors(file_id)
                 print(f"Deleted vectors for file {file_id} from Supabase")
@@ -523,21 +1075,23 @@ class VectorStore:
         # Try to delete from Qdrant
         if self.qdrant_available:
             try:
-                await self._delete_qdrant_vectors(file_id)
+                await self._delete_qdrant_vectors(file_id, folder_id)
                 print(f"Deleted vectors for file {file_id} from Qdrant")
             except Exception as e:
                 errors.append(f"Qdrant deletion failed: {e}")
         
+        self._notify_change({folder_id} if folder_id else None)
+        
         if errors and len(errors) == 2:
             raise Exception(f"Failed to delete from both stores: {'; '.join(errors)}")
     
     async def _delete_supabase_vectors(self, file_id: str):
         """Delete vectors from Supabase"""
-        response = self.supabase.table('document_vectors').delete().eq('file_id', file_id).execute()
+        response = await run_vector_io(self.supabase.table('document_vectors').delete().eq('file_id', file_id).execute)
         if not response.data and hasattr(response, 'error') and response.error:
             raise Exception(f"Supabase deletion error: {response.error}")
     
-    async def _delete_qdrant_vectors(self, file_id: str):
+    async def _delete_qdrant_vectors(self, file_id: str, folder_id: Optional[str] = None):
         """Delete vectors from Qdrant"""
         filter_condition = Filter(
             must=[
@@ -548,11 +1102,47 @@ class VectorStore:
             ]
         )
         
-        self.qdrant_client.delete(
-            collection_name=config.QDRANT_COLLECTION_NAME,
-            points_selector=filter_condition
-        )
+        for collection_name in await self._read_collections(folder_id):
+            await self._qdrant(
+                "delete",
+                collection_name=collection_name,
+                points_selector=filter_condition
+            )
     
+    async def delete_folder(self, folder_id: str):
+        """
+        Delete every vector of a folder from both stores. With per-folder
+        collections this drops the folder's collection instead of filtering.
+        """
+        errors = []
+        
+        if await self._supabase_ready():
+            try:
+                await run_vector_io(self.supabase.table('document_vectors').delete().eq('folder_id', folder_id).execute)
+            except Exception as e:
+                errors.append(f"Supabase deletion failed: {e}")
+        
+        if self.qdrant_available:
+            try:
+                if config.QDRANT_PARTITIONING == "collection":
+                    collection_name = qdrant_admin.folder_collection_name(folder_id)
+                    await self._qdrant("delete_collection", collection_name)
+                    self._known_collections.discard(collection_name)
+                else:
+                    await self._qdrant(
+                        "delete",
+                        collection_name=config.QDRANT_COLLECTION_NAME,
+                        points_selector=self._build_qdrant_filter({"folder_id": folder_id})
+                    )
+            except Exception as e:
+                errors.append(f"Qdrant deletion failed: {e}")
+        
+        self._notify_change({folder_id})
+        print(f"Deleted vectors for folder {folder_id}")
+        
+        if errors and len(errors) == 2:
+            raise Exception(f"Failed to delete from both stores: {'; '.join(errors)}")
+
     
     def get_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None):
         """Get a retriever for the vector store"""
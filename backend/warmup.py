@@ -0,0 +1,109 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable
+
+from config import config
+
+
+# Readiness and per-step timings, reported by /api/ready
+warmup_state: Dict[str, Any] = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "total_ms": None,
+    "steps": {},
+    "errors": {}
+}
+
+
+def _run_step(name: str, step: Callable[[], Any]) -> Any:
+    """Run one warm-up step, recording its duration and any error"""
+    start = time.perf_counter()
+    try:
+        result = step()
+        return result
+    except Exception as e:
+        warmup_state["errors"][name] = str(e)
+        print(f"Warm-up step '{name}' failed: {e}")
+        return None
+    finally:
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        warmup_state["steps"][name] = elapsed_ms
+        print(f"Warm-up step '{name}' took {elapsed_ms} ms")
+
+
+def _verify_collection(vector_store) -> None:
+    """Make sure the Qdrant collection exists and answers, and report missing payload indexes"""
+    if vector_store is None or not vector_store.qdrant_available:
+        raise Exception("Qdrant is not available")
+    payload_indexes = vector_store.check_payload_indexes()
+    warmup_state["payload_indexes"] = payload_indexes
+    if payload_indexes["missing"]:
+        print(f"Qdrant payload indexes missing: {', '.join(payload_indexes['missing'])}")
+
+
+async def _prime_providers() -> Dict[str, bool]:
+    """Fill the provider health registry before the first chat request"""
+    from dependencies import _get_provider_registry
+    
+    registry = _get_provider_registry()
+    start = time.perf_counter()
+    try:
+        await registry.refresh()
+    except Exception as e:
+        warmup_state["errors"]["prime_providers"] = str(e)
+        print(f"Warm-up step 'prime_providers' failed: {e}")
+    finally:
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        warmup_state["steps"]["prime_providers"] = elapsed_ms
+        print(f"Warm-up step 'prime_providers' took {elapsed_ms} ms")
+    providers = {name: status["available"] for name, status in registry.snapshot().items()}
+    warmup_state["providers"] = providers
+    return providers
+
+
+def _warm_models() -> None:
+    """Blocking part of the warm-up: models, connections and the collection"""
+    from dependencies import _get_embeddings, _get_vector_store
+    
+    embeddings = _run_step("load_embedding_model", _get_embeddings)
+    if embeddings is not None:
+        # First forward pass triggers tokenizer loading and torch kernel selection
+        _run_step("embed_query", lambda: embeddings.embed_query("warm-up query"))
+        _run_step("embed_documents", lambda: embeddings.embed_documents(["warm-up document one", "warm-up document two"]))
+    
+    vector_store = _run_step("init_vector_store", _get_vector_store)
+    _run_step("verify_collection", lambda: _verify_collection(vector_store))
+
+
+async def run_warmup() -> Dict[str, Any]:
+    """
+    Preload everything the first chat request would otherwise pay for.
+    Model loading runs in a worker thread; provider probes run on the event
+    loop so they share the app's pooled HTTP clients.
+    Runs as a background task while the app already serves requests, so
+    /api/ready can hold traffic back until it has finished. Failed steps are
+    recorded but do not keep the app unready, since every path it warms up
+    has a lazy fallback.
+    """
+    warmup_state["ready"] = False
+    warmup_state["started_at"] = datetime.utcnow().isoformat()
+    start = time.perf_counter()
+    
+    await asyncio.to_thread(_warm_models)
+    
+    if config.WARMUP_CHECK_PROVIDERS:
+        await _prime_providers()
+    
+    warmup_state["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    warmup_state["finished_at"] = datetime.utcnow().isoformat()
+    warmup_state["ready"] = True
+    print(f"Warm-up complete in {warmup_state['total_ms']} ms")
+    return warmup_state
+
+
+def mark_ready_without_warmup() -> None:
+    """Report readiness immediately when warm-up is disabled"""
+    warmup_state["ready"] = True
+    warmup_state["finished_at"] = datetime.utcnow().isoformat()